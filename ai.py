@@ -0,0 +1,508 @@
+''' Placement search player for the tetris game.
+
+    For the current piece the player tries every orientation it can
+    rotate to and every column it can then slide to, drops
+    the piece there and scores the resulting board with a weighted sum
+    of aggregate height, cleared lines, holes and bumpiness. With
+    lookahead, each board is scored by the best placement of the
+    previewed piece on it instead.
+
+    The search works on row bitmasks (engine Board.rows), and keeps two
+    transposition caches: the score of every board it has seen, and the
+    best lookahead value of every (board, piece) pair, so positions that
+    are reached by several placements or several turns are scored once.
+    The features come from the features module; playing a game, the
+    player keeps a FeatureTracker on its board, so that a placement that
+    clears no rows is scored by measuring only the columns it covers.
+
+    A ParallelPlayer spreads the lookahead over a process pool: the
+    boards after each placement of the current piece are packed into one
+    int each and valued by the workers in chunks, the most promising
+    first. Given a deadline, it returns the best placement valued by then.
+
+    A BeamPlanner searches level by level instead, one level per piece,
+    keeping only the best few boards of each, and can be stopped at any
+    time with the best placement of the last complete level.
+'''
+import time
+
+import engine
+import features
+
+
+# PIECE_MASKS[kind][orientation] = (left, top, masks): the row bitmasks
+# of the piece, bit 0 being column left and masks[0] row top, relative
+# to the rotation block
+def build_masks(offsets):
+    left = min(x for x, y in offsets)
+    top = min(y for x, y in offsets)
+    masks = [0] * (max(y for x, y in offsets) - top + 1)
+    for x, y in offsets:
+        masks[y - top] |= 1 << (x - left)
+    return left, top, masks
+
+PIECE_MASKS = [[build_masks(offsets) for offsets in rotations]
+               for rotations in engine.ROTATIONS]
+
+
+def fits(rows, width, masks, x, y):
+    ''' Return value: type: bool
+
+        True if the piece masks fit with bit 0 on column x and
+        the first mask on row y of the board rows
+    '''
+    if x < 0 or y < 0 or y + len(masks) > len(rows):
+        return False
+    for dy, mask in enumerate(masks):
+        mask <<= x
+        if mask >> width or rows[y + dy] & mask:
+            return False
+    return True
+
+
+def drop(rows, width, masks, x, y):
+    ''' Return value: type: tuple (list, int)
+
+        the board rows after dropping the piece from row y in
+        column x and removing the complete rows, and the number
+        of rows removed
+    '''
+    while fits(rows, width, masks, x, y + 1):
+        y += 1
+    rows = list(rows)
+    for dy, mask in enumerate(masks):
+        rows[y + dy] |= mask << x
+    full = (1 << width) - 1
+    kept = [row for row in rows if row != full]
+    lines = len(rows) - len(kept)
+    if lines:
+        rows = [0] * lines + kept
+    return rows, lines
+
+
+def placements(rows, width, kind, orientation, x, y):
+    ''' Return value: type: list
+
+        every (moves, rows, lines) the piece of kind in orientation
+        with its rotation block on x, y can reach by rotating, sliding
+        sideways and dropping: the Game.do_move directions and 'Up' for
+        rotations that take it there, the board rows after the drop and
+        the number of rows it cleared. A piece that cannot rotate where
+        it is moves down until it can.
+    '''
+    rotations = PIECE_MASKS[kind]
+    found = []
+    turns = []
+    left, top, masks = rotations[orientation]
+    for turn in range(len(rotations)):
+        if turn:
+            orientation = (orientation + 1) % len(rotations)
+            new_left, new_top, new_masks = rotations[orientation]
+            while not fits(rows, width, new_masks, x + new_left, y + new_top):
+                if not fits(rows, width, masks, x + left, y + top + 1):
+                    return found
+                y += 1
+                turns.append('Down')
+            left, top, masks = new_left, new_top, new_masks
+            turns.append('Up')
+        elif not fits(rows, width, masks, x + left, y + top):
+            return found
+        for direction, step in (('Left', -1), ('Right', 1)):
+            dx = 0 if step < 0 else 1
+            while fits(rows, width, masks, x + left + dx, y + top):
+                board, lines = drop(rows, width, masks, x + left + dx, y + top)
+                found.append((tuple(turns) + (direction,) * abs(dx), board, lines))
+                dx += step
+    return found
+
+
+############################################################
+# PLAYER CLASS
+############################################################
+class Player():
+    ''' Player class: chooses where each piece goes
+        Attributes:
+            WEIGHTS - type: tuple - default weights of aggregate height,
+            cleared lines, holes and bumpiness
+            weights - type: tuple - the weights this player uses
+            lookahead - type: bool - whether to use the previewed piece
+            cache_size - type: int - entries each cache holds before it is emptied
+            scores - type: dictionary - board rows to their weighted features
+            values - type: dictionary - (board rows, kind) to the best value
+            of a placement of kind on that board
+    '''
+
+    WEIGHTS = (-0.510066, 0.760666, -0.35663, -0.184483)
+
+    def __init__(self, weights=None, lookahead=True, cache_size=200000):
+        self.weights = weights or self.WEIGHTS
+        self.lookahead = lookahead
+        self.cache_size = cache_size
+        self.scores = {}
+        self.values = {}
+
+    def score(self, rows, width, tracker=None):
+        ''' Parameters: tracker - type: features.FeatureTracker - the tracker
+                        of a board rows is that board with a piece locked on
+                        it and no rows cleared, if there is one
+            Return value: type: float
+
+            the weighted features of the board rows, cleared lines aside
+        '''
+        key = tuple(rows)
+        score = self.scores.get(key)
+        if score is None:
+            if tracker is None:
+                found = features.board_features(rows, width)
+                height, holes, bumpiness = found.height, found.holes, found.bumpiness
+            else:
+                height, holes, bumpiness = self.placed_features(tracker, rows)
+            a, b, c, d = self.weights
+            score = a * height + c * holes + d * bumpiness
+            if len(self.scores) >= self.cache_size:
+                self.scores.clear()
+            self.scores[key] = score
+        return score
+
+    def placed_features(self, tracker, rows):
+        ''' Return value: type: tuple (int, int, int)
+
+            the aggregate height, holes and bumpiness of the board rows,
+            the board of tracker with a piece locked on it and no rows
+            cleared: only the columns the piece covers are measured
+        '''
+        columns = {}
+        for y, row in enumerate(rows):
+            new = row ^ tracker.rows[y]
+            while new:
+                low = new & -new
+                x = low.bit_length() - 1
+                columns[x] = columns.get(x, tracker.columns[x]) | 1 << y
+                new ^= low
+        heights = list(tracker.heights)
+        holes = sum(tracker.holes)
+        for x, column in columns.items():
+            heights[x], column_holes = features.column_stats(column, tracker.height)
+            holes += column_holes - tracker.holes[x]
+        bumpiness = 0
+        for x in range(len(heights) - 1):
+            bumpiness += abs(heights[x] - heights[x + 1])
+        return sum(heights), holes, bumpiness
+
+    def value(self, rows, width, kind):
+        ''' Return value: type: float
+
+            the value of the best placement of a new piece of kind
+            on the board rows, or -inf if it cannot spawn
+        '''
+        key = (tuple(rows), kind)
+        value = self.values.get(key)
+        if value is None:
+            piece = engine.Piece(kind, width // 2, 0)
+            value = float('-inf')
+            for moves, board, lines in placements(rows, width, kind, 0, piece.x, piece.y):
+                value = max(value, self.weights[1] * lines + self.score(board, width))
+            if len(self.values) >= self.cache_size:
+                self.values.clear()
+            self.values[key] = value
+        return value
+
+    def choose(self, rows, width, piece, next_kind=None, tracker=None):
+        ''' Parameters: rows - type: list - the board as row bitmasks
+                        piece - type: engine.Piece - the piece to place
+                        next_kind - type: int - the previewed piece, if any
+                        tracker - type: features.FeatureTracker - the
+                        tracker of the board, if it has one
+            Return value: type: tuple or None
+
+            the moves that take piece to the best placement, 'Up' being
+            a rotation, or None if it has nowhere to go
+        '''
+        best = None
+        best_value = None
+        for moves, board, lines in placements(rows, width, piece.kind,
+                                              piece.orientation, piece.x, piece.y):
+            value = self.weights[1] * lines
+            if self.lookahead and next_kind is not None:
+                value += self.value(board, width, next_kind)
+            else:
+                value += self.score(board, width, None if lines else tracker)
+            if best_value is None or value > best_value:
+                best = moves
+                best_value = value
+        return best
+
+    def play(self, game):
+        ''' Parameters: game - type: engine.Game
+
+            moves the current piece of game to the best placement
+            and drops it
+        '''
+        move = self.choose(game.board.rows, game.width, game.current_piece, game.next_kind,
+                           tracker=features.tracker(game.board))
+        for direction in move or ():
+            if direction == 'Up':
+                game.do_rotate()
+            else:
+                game.do_move(direction)
+        game.hard_drop()
+
+
+def pack_rows(rows, width):
+    ''' Return value: type: int - the board rows in one int, top row highest '''
+    packed = 0
+    for row in rows:
+        packed = packed << width | row
+    return packed
+
+
+def unpack_rows(packed, width, height):
+    ''' Return value: type: list - the height rows packed by pack_rows '''
+    mask = (1 << width) - 1
+    rows = [0] * height
+    for y in range(height - 1, -1, -1):
+        rows[y] = packed & mask
+        packed >>= width
+    return rows
+
+
+# the players of a worker process, by weights, so that their caches
+# last from one task to the next
+WORKER_PLAYERS = {}
+
+
+def evaluate(task):
+    ''' Parameters: task - type: tuple - (start, boards, width, height, kind,
+                    weights, deadline): packed boards, the kind of the previewed
+                    piece and the time.time after which to stop
+        Return value: type: tuple (int, list)
+
+        start and the lookahead value of each board,
+        None for those not reached by the deadline
+    '''
+    start, boards, width, height, kind, weights, deadline = task
+    player = WORKER_PLAYERS.get(weights)
+    if player is None:
+        player = WORKER_PLAYERS[weights] = Player(weights)
+    values = []
+    for packed in boards:
+        if deadline is not None and time.time() > deadline:
+            values.append(None)
+        else:
+            values.append(player.value(unpack_rows(packed, width, height), width, kind))
+    return start, values
+
+
+############################################################
+# PARALLEL PLAYER CLASS
+############################################################
+class ParallelPlayer(Player):
+    ''' ParallelPlayer class: a lookahead Player whose search runs on a process pool
+        Attributes:
+            pool - type: multiprocessing.Pool - the workers, started on first use
+            workers - type: int - number of worker processes, None for one per CPU
+            chunk - type: int - boards valued per task
+            deadline - type: float - seconds a choice may take, None to wait
+            for every placement
+            timeouts - type: int - choices cut short by their deadline
+
+        Without a deadline it chooses the same placements as a Player.
+    '''
+
+    def __init__(self, weights=None, workers=None, chunk=4, deadline=None):
+        Player.__init__(self, weights, lookahead=True)
+        self.pool = None
+        self.workers = workers
+        self.chunk = chunk
+        self.deadline = deadline
+        self.timeouts = 0
+
+    def choose(self, rows, width, piece, next_kind=None, tracker=None, deadline=None):
+        ''' Parameters: deadline - type: float - seconds this choice may take,
+                        instead of self.deadline
+
+            as Player.choose. When time runs out, the best placement
+            valued so far is returned, or the best one on its own
+            score if none has been valued yet.
+        '''
+        import multiprocessing
+        if next_kind is None:
+            return Player.choose(self, rows, width, piece, tracker=tracker)
+        found = placements(rows, width, piece.kind, piece.orientation, piece.x, piece.y)
+        if not found:
+            return None
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.workers)
+        if deadline is None:
+            deadline = self.deadline
+        stop = None if deadline is None else time.time() + deadline
+        a_lines = self.weights[1]
+        # the placements in order of their own score, so a deadline
+        # leaves out the least promising ones
+        order = sorted(range(len(found)),
+                       key=lambda i: -(a_lines * found[i][2] +
+                                       self.score(found[i][1], width,
+                                                  None if found[i][2] else tracker)))
+        tasks = []
+        for start in range(0, len(order), self.chunk):
+            boards = [pack_rows(found[i][1], width) for i in order[start:start + self.chunk]]
+            tasks.append((start, boards, width, len(rows), next_kind, tuple(self.weights), stop))
+        best = order[0]
+        best_value = None
+        complete = True
+        results = self.pool.imap_unordered(evaluate, tasks)
+        try:
+            for count in range(len(tasks)):
+                timeout = None if stop is None else max(0.0, stop - time.time())
+                start, values = results.next(timeout)
+                for offset, value in enumerate(values):
+                    if value is None:
+                        complete = False
+                        continue
+                    i = order[start + offset]
+                    value += a_lines * found[i][2]
+                    # ties go to the first placement found, as in Player.choose
+                    if best_value is None or value > best_value or \
+                            (value == best_value and i < best):
+                        best = i
+                        best_value = value
+        except multiprocessing.TimeoutError:
+            complete = False
+        if not complete:
+            self.timeouts += 1
+        return found[best][0]
+
+    def close(self):
+        ''' stops the worker processes '''
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+
+############################################################
+# BEAM PLANNER CLASS
+############################################################
+class BeamPlanner():
+    ''' BeamPlanner class: a placement search with a best answer at any time
+        Attributes:
+            BUDGET - type: float - share of the gravity delay a plan may take
+            player - type: Player - scores the boards
+            beam - type: int - boards kept from one level to the next
+            clock - type: function - returns the time in seconds
+            key - type: object - what the current plan is for, given by the caller
+            width - type: int - width of the board in squares
+            kinds - type: list - the kinds of the pieces of the levels to come
+            frontier - type: list - (value, root, lines, rows) of the boards kept
+            at the last complete level, root being the index of the
+            first placement that leads there
+            children - type: list - the boards of the level in progress
+            expanded - type: int - the frontier boards it has been built from
+            roots - type: list - the moves of every first placement
+            best - type: tuple - the moves of the best first placement so far
+            deadline - type: float - clock time at which the plan stops
+            done - type: bool - whether the plan is finished
+
+        start places the current piece, so there is an answer at once,
+        and step places the previewed pieces on the boards kept until
+        the deadline, for as long as it is told. A board is valued by
+        the lines cleared on the way there and its own score; with a
+        beam wider than the placements of the first piece, the plan
+        ends on the placement a lookahead Player chooses.
+    '''
+
+    BUDGET = 0.5
+
+    def __init__(self, player=None, beam=4, clock=time.time):
+        self.player = player or Player()
+        self.beam = beam
+        self.clock = clock
+        self.key = None
+        self.best = None
+        self.done = True
+
+    def budget(self, delay):
+        ''' Parameters: delay - type: int - the gravity delay in ms
+            Return value: type: float - the seconds a plan may take
+        '''
+        return delay * self.BUDGET / 1000.0
+
+    def node(self, root, rows, lines, tracker=None):
+        ''' Return value: type: tuple - the frontier entry of the board rows,
+            tracker being as for Player.score
+        '''
+        score = self.player.weights[1] * lines + self.player.score(rows, self.width, tracker)
+        return score, root, lines, rows
+
+    def select(self, nodes):
+        ''' Return value: type: list - the beam best nodes, ties to the first root '''
+        return sorted(nodes, key=lambda node: (-node[0], node[1]))[:self.beam]
+
+    def start(self, rows, width, piece, kinds, budget=None, key=None, tracker=None):
+        ''' Parameters: rows - type: list - the board as row bitmasks
+                        piece - type: engine.Piece - the piece to place
+                        kinds - type: list - the previewed pieces, in order
+                        budget - type: float - seconds the plan may take,
+                        None for no limit
+                        key - type: object - kept as self.key
+                        tracker - type: features.FeatureTracker - the
+                        tracker of the board, if it has one
+
+            begins a plan for piece, forgetting the last one
+        '''
+        self.width = width
+        self.kinds = list(kinds)
+        self.key = key
+        self.deadline = None if budget is None else self.clock() + budget
+        found = placements(rows, width, piece.kind, piece.orientation, piece.x, piece.y)
+        self.roots = [moves for moves, board, lines in found]
+        self.frontier = self.select([self.node(root, board, lines, None if lines else tracker)
+                                     for root, (moves, board, lines) in enumerate(found)])
+        self.best = self.roots[self.frontier[0][1]] if self.frontier else None
+        self.children = []
+        self.expanded = 0
+        self.done = not self.frontier or not self.kinds
+
+    def step(self, until=None):
+        ''' Parameters: until - type: float - clock time to stop at, None
+                        to run to the end of the plan
+            Return value: type: bool - whether the plan is finished
+
+            places the next piece on the frontier boards, one board at a
+            time, until the clock passes until or the deadline
+        '''
+        while not self.done:
+            now = self.clock()
+            if self.deadline is not None and now >= self.deadline:
+                self.done = True
+                break
+            if until is not None and now >= until:
+                break
+            value, root, lines, rows = self.frontier[self.expanded]
+            self.expanded += 1
+            kind = self.kinds[0]
+            piece = engine.Piece(kind, self.width // 2, 0)
+            for moves, board, cleared in placements(rows, self.width, kind, 0,
+                                                    piece.x, piece.y):
+                self.children.append(self.node(root, board, lines + cleared))
+            if self.expanded == len(self.frontier):
+                # the level is complete; boards the piece cannot spawn
+                # on have no children, and if none has, the last
+                # level's best stands
+                self.kinds.pop(0)
+                if self.children:
+                    self.frontier = self.select(self.children)
+                    self.best = self.roots[self.frontier[0][1]]
+                self.done = not self.children or not self.kinds
+                self.children = []
+                self.expanded = 0
+        return self.done
+
+
+# the player farm.py workers use
+PLAYER = Player()
+
+
+def policy(game, rnd):
+    ''' a farm.py policy that plays every piece with PLAYER '''
+    PLAYER.play(game)
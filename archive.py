@@ -0,0 +1,268 @@
+''' Replay archives: many replay logs packed into one file, with keyframes.
+
+    Layout, all integers little endian:
+
+        MAGIC, VERSION byte
+        for every game: its replay log, as written by replay.Recorder,
+            then its keyframes, then its keyframe table
+        the index: GAME entries, one per game
+        the footer: FOOTER
+
+    A keyframe is the position of a game after some number of pieces
+    locked: the time, the current piece, the previewed kind, the score,
+    whether the game was over and the board rows, as varints. The table
+    of a game has a KEYFRAME entry per keyframe, in piece order: the
+    number of pieces, the offset in the log of the first event after
+    the keyframe and the offset of the keyframe in the archive.
+
+    The reader maps the file into memory and reads the tables in place.
+    To get to a piece number it restores the keyframe before it and
+    replays only the events from there, so whole games are never
+    copied out of the archive.
+'''
+from __future__ import print_function
+import bisect
+import mmap
+import struct
+
+import engine
+import replay
+
+MAGIC = b'TTRA'
+VERSION = 1
+
+# log offset, log length, keyframe table offset, number of keyframes
+GAME = struct.Struct('<QQQI')
+# pieces, offset of the next event in the log, keyframe offset
+KEYFRAME = struct.Struct('<IQQ')
+# index offset, number of games, MAGIC
+FOOTER = struct.Struct('<QI4s')
+
+
+def keyframe_bytes(ms, game):
+    ''' Return value: type: bytearray - the keyframe of the position of game '''
+    snapshot = game.snapshot()
+    buf = bytearray()
+    for value in (ms, snapshot.kind, snapshot.orientation, snapshot.x, snapshot.y,
+                  snapshot.next_kind, snapshot.your_score, snapshot.pieces,
+                  int(snapshot.over)):
+        replay.write_varint(buf, value)
+    for row in snapshot.rows:
+        replay.write_varint(buf, row)
+    return buf
+
+
+def read_keyframe(data, offset, height):
+    ''' Return value: type: tuple (int, engine.Snapshot)
+
+        the time and position of the keyframe at offset of data
+    '''
+    values = []
+    for i in range(9 + height):
+        value, offset = replay.read_varint(data, offset)
+        values.append(value)
+    ms, kind, orientation, x, y, next_kind, your_score, pieces, over = values[:9]
+    return ms, engine.Snapshot(tuple(values[9:]), kind, orientation, x, y, next_kind,
+                               your_score, pieces, bool(over))
+
+
+class ByteView():
+    ''' ByteView class: a slice of a memory map indexed as ints
+        Used where memoryview cannot wrap an mmap (Python 2).
+    '''
+
+    def __init__(self, data, start, end):
+        self.data = data
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            return bytearray(self.data[self.start + start:self.start + stop])
+        return ord(self.data[self.start + index])
+
+
+############################################################
+# WRITER CLASS
+############################################################
+class Writer():
+    ''' Writer class: builds an archive, one game at a time
+        Attributes:
+            out - type: file - the archive being written
+            every - type: int - pieces between keyframes
+            games - type: list - the GAME entry of every game written
+    '''
+
+    def __init__(self, path, every=100):
+        self.out = open(path, 'wb')
+        self.out.write(MAGIC + bytearray([VERSION]))
+        self.every = every
+        self.games = []
+
+    def add(self, log):
+        ''' Parameters: log - type: bytearray - a replay log
+
+            replays log to find its keyframes and appends both to the archive
+        '''
+        log_offset = self.out.tell()
+        self.out.write(bytes(log))
+        width, height, seed, offset = replay.read_header(log)
+        game = engine.Game(width, height, board_class=engine.BitBoard,
+                           generator=replay.Spawns(log, offset))
+        table = []
+        keyframes = bytearray()
+        keyframe_offset = self.out.tell()
+        pending = True
+        ms = 0
+        try:
+            for opcode, event_ms, next_offset in replay.read_events(log, offset):
+                # spawns that follow a lock belong to the position before it
+                if pending and opcode < replay.SPAWN:
+                    table.append((game.pieces, offset, keyframe_offset + len(keyframes)))
+                    keyframes += keyframe_bytes(ms, game)
+                    pending = False
+                pieces = game.pieces
+                replay.play(game, opcode)
+                if game.pieces != pieces and game.pieces % self.every == 0:
+                    pending = True
+                offset = next_offset
+                ms = event_ms
+        except EOFError:
+            pass
+        # a log that ends on a keyframe, or before any input, still has it
+        if pending:
+            table.append((game.pieces, len(log), keyframe_offset + len(keyframes)))
+            keyframes += keyframe_bytes(ms, game)
+        self.out.write(bytes(keyframes))
+        table_offset = self.out.tell()
+        for entry in table:
+            self.out.write(KEYFRAME.pack(*entry))
+        self.games.append((log_offset, len(log), table_offset, len(table)))
+
+    def close(self):
+        index_offset = self.out.tell()
+        for entry in self.games:
+            self.out.write(GAME.pack(*entry))
+        self.out.write(FOOTER.pack(index_offset, len(self.games), MAGIC))
+        self.out.close()
+
+
+############################################################
+# ARCHIVE CLASS
+############################################################
+class Archive():
+    ''' Archive class: an archive mapped into memory for reading
+        Attributes:
+            data - type: mmap - the whole archive file
+            index - type: int - offset of the GAME entries
+            count - type: int - the number of games
+    '''
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError("not a replay archive")
+        self.index, self.count, magic = FOOTER.unpack_from(self.data, len(self.data) - FOOTER.size)
+        if magic != MAGIC:
+            raise ValueError("replay archive has no index")
+
+    def __len__(self):
+        return self.count
+
+    def entry(self, number):
+        if not 0 <= number < self.count:
+            raise IndexError("no game %d in the archive" % number)
+        return GAME.unpack_from(self.data, self.index + number * GAME.size)
+
+    def view(self, start, end):
+        ''' Return value: the bytes start to end of the archive, without copying them '''
+        try:
+            return memoryview(self.data)[start:end]
+        except TypeError:
+            return ByteView(self.data, start, end)
+
+    def log(self, number):
+        ''' Return value: the replay log of game number, without copying it '''
+        log_offset, log_length, table_offset, keyframes = self.entry(number)
+        return self.view(log_offset, log_offset + log_length)
+
+    def keyframe(self, number, pieces):
+        ''' Return value: type: tuple (int, int, int)
+
+            the pieces, log offset and archive offset of the last
+            keyframe of game number at or before pieces
+        '''
+        log_offset, log_length, table_offset, keyframes = self.entry(number)
+        counts = KeyframePieces(self.data, table_offset, keyframes)
+        index = bisect.bisect_right(counts, pieces) - 1
+        if index < 0:
+            raise ValueError("game %d has no keyframes" % number)
+        return KEYFRAME.unpack_from(self.data, table_offset + index * KEYFRAME.size)
+
+    def seek(self, number, pieces, board_class=engine.BitBoard):
+        ''' Return value: type: engine.Game
+
+            game number in its position once pieces pieces have locked,
+            or its last position if it ended before that. The game goes
+            on with the pieces the recorder would have drawn, and holds
+            nothing of the archive.
+        '''
+        log = self.log(number)
+        width, height, seed, offset = replay.read_header(log)
+        found, offset, keyframe_offset = self.keyframe(number, pieces)
+        ms, snapshot = read_keyframe(self.view(keyframe_offset, len(self.data)), 0, height)
+        game = engine.Game(width, height, board_class=board_class, seed=0)
+        game.restore(snapshot)
+        game.random = replay.Spawns(log, offset)
+        try:
+            for opcode, ms, offset in replay.read_events(log, offset, ms):
+                if game.pieces >= pieces:
+                    break
+                replay.play(game, opcode)
+        except EOFError:
+            pass
+        # a game that has not lost draws a kind at the start and one
+        # per locked piece on top of the one it shows as next
+        game.random = replay.generator(seed, game.pieces + 2)
+        return game
+
+    def close(self):
+        self.data.close()
+
+
+class KeyframePieces():
+    ''' KeyframePieces class: the piece counts of a keyframe table,
+        read in place so bisect can search them
+    '''
+
+    def __init__(self, data, offset, count):
+        self.data = data
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return KEYFRAME.unpack_from(self.data, self.offset + index * KEYFRAME.size)[0]
+
+
+def main():
+    import sys
+    if len(sys.argv) < 3:
+        print('usage: python archive.py ARCHIVE LOG...')
+        return
+    writer = Writer(sys.argv[1])
+    for path in sys.argv[2:]:
+        writer.add(replay.load(path))
+    writer.close()
+    print('%s: %d games' % (sys.argv[1], len(sys.argv) - 2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+''' NumPy batch engine: many tetris games simulated in lockstep.
+
+    BatchGame keeps N boards in one (N, height, width) bool array and
+    applies moves, collision tests, locks and line clears to all of them
+    with vectorized operations. The rules are the ones of engine.Game:
+    the same shapes, rotations and spawn position, one point per cleared
+    row and the level and gravity delay of engine.Score.set_score.
+
+    Requires numpy, which the rest of the game does not need.
+'''
+import numpy as np
+
+import engine
+
+
+############################################################
+# SHAPE TABLES
+############################################################
+# MAX_ORIENTATIONS orientations per shape; shapes with fewer repeat theirs
+MAX_ORIENTATIONS = max(len(rotations) for rotations in engine.ROTATIONS)
+ORIENTATIONS = np.array([len(rotations) for rotations in engine.ROTATIONS])
+# OFFSETS[kind, orientation, block] = (dx, dy) from the rotation block
+OFFSETS = np.array([[rotations[o % len(rotations)] for o in range(MAX_ORIENTATIONS)]
+                    for rotations in engine.ROTATIONS])
+# square of the rotation block relative to the spawn centre
+PIVOTS = np.array([offsets[1] for offsets in engine.SHAPE_OFFSETS])
+
+# the level and delay engine.Score.set_score gives each score range
+LEVEL_SCORES = np.array([25, 50, 100, 150, 200])
+LEVEL_DELAYS = np.array([975, 950, 900, 850, 750, 500])
+
+# actions for BatchGame.step
+NOTHING, LEFT, RIGHT, DOWN, ROTATE, DROP = range(6)
+
+
+class BatchGame():
+    ''' BatchGame class: N games of the same board size in lockstep
+
+        Attributes: boards - type: numpy array (n, height, width) - locked squares
+                    kind, orientation, x, y - type: numpy array (n,) - the
+                    current piece of each game, x, y being its rotation block
+                    next_kind - type: numpy array (n,) - the previewed pieces
+                    score - type: numpy array (n,) - rows cleared
+                    level - type: numpy array (n,) - the current levels
+                    delay - type: numpy array (n,) - gravity delays in ms
+                    pieces - type: numpy array (n,) - pieces locked
+                    cleared - type: numpy array (n,) - rows cleared by each game's last lock
+                    over - type: numpy array (n,) - games that have ended
+    '''
+
+    def __init__(self, n, width=10, height=20, seed=None):
+        if width < 4 or height < 2:
+            raise ValueError("the board must be at least 4 squares wide and 2 high")
+        self.n = n
+        self.width = width
+        self.height = height
+        self.random = np.random.RandomState(seed)
+        self.boards = np.zeros((n, height, width), dtype=bool)
+        self.kind = np.zeros(n, dtype=np.int64)
+        self.orientation = np.zeros(n, dtype=np.int64)
+        self.x = np.zeros(n, dtype=np.int64)
+        self.y = np.zeros(n, dtype=np.int64)
+        self.next_kind = self.random.randint(0, len(engine.ROTATIONS), n)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.level = np.ones(n, dtype=np.int64)
+        self.delay = np.full(n, 1000, dtype=np.int64)
+        self.pieces = np.zeros(n, dtype=np.int64)
+        self.cleared = np.zeros(n, dtype=np.int64)
+        self.over = np.zeros(n, dtype=bool)
+        self.games = np.arange(n)
+        self.spawn(np.ones(n, dtype=bool))
+
+    def cells(self, kind, orientation, x, y):
+        ''' Return value: type: tuple of two numpy arrays (m, 4)
+
+            the columns and rows of the squares of m pieces
+        '''
+        offsets = OFFSETS[kind, orientation]
+        return x[:, None] + offsets[:, :, 0], y[:, None] + offsets[:, :, 1]
+
+    def fits(self, games, kind, orientation, x, y):
+        ''' Return value: type: numpy array (m,) of bool
+
+            for each of the games, whether the piece fits: all its
+            squares inside the board and free, as in Board.can_move
+        '''
+        xs, ys = self.cells(kind, orientation, x, y)
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        taken = self.boards[games[:, None],
+                            np.clip(ys, 0, self.height - 1),
+                            np.clip(xs, 0, self.width - 1)]
+        return (inside & ~taken).all(axis=1)
+
+    def spawn(self, mask):
+        ''' spawns the previewed piece in the games of mask, draws their
+            next kinds and ends the games whose new piece does not fit
+        '''
+        games = self.games[mask]
+        kind = self.next_kind[games]
+        self.kind[games] = kind
+        self.orientation[games] = 0
+        self.x[games] = self.width // 2 + PIVOTS[kind, 0]
+        self.y[games] = PIVOTS[kind, 1]
+        self.next_kind[games] = self.random.randint(0, len(engine.ROTATIONS), len(games))
+        fits = self.fits(games, kind, self.orientation[games], self.x[games], self.y[games])
+        self.over[games[~fits]] = True
+
+    def move(self, mask, dx, dy):
+        ''' Return value: type: numpy array (n,) of bool
+
+            moves the pieces of the games in mask that can move dx, dy.
+            Pieces that cannot move down are locked.
+        '''
+        mask = mask & ~self.over
+        games = self.games[mask]
+        x = self.x[games] + dx
+        y = self.y[games] + dy
+        fits = self.fits(games, self.kind[games], self.orientation[games], x, y)
+        self.x[games[fits]] = x[fits]
+        self.y[games[fits]] = y[fits]
+        moved = np.zeros(self.n, dtype=bool)
+        moved[games[fits]] = True
+        if dy > 0:
+            self.lock(mask & ~moved)
+        return moved
+
+    def rotate(self, mask):
+        ''' Return value: type: numpy array (n,) of bool
+
+            rotates the pieces of the games in mask that can rotate
+        '''
+        mask = mask & ~self.over
+        games = self.games[mask]
+        kind = self.kind[games]
+        orientation = (self.orientation[games] + 1) % ORIENTATIONS[kind]
+        fits = self.fits(games, kind, orientation, self.x[games], self.y[games])
+        self.orientation[games[fits]] = orientation[fits]
+        rotated = np.zeros(self.n, dtype=bool)
+        rotated[games[fits]] = True
+        return rotated
+
+    def hard_drop(self, mask):
+        ''' moves the pieces of the games in mask down until they lock '''
+        falling = mask & ~self.over
+        while falling.any():
+            falling = self.move(falling, 0, 1)
+
+    def place(self, mask, orientation, x):
+        ''' Parameters: orientation, x - type: numpy array (n,)
+
+            turns the pieces of the games in mask to orientation, puts
+            their rotation block in column x and hard drops them. Games
+            where that position does not fit at the current height do
+            nothing.
+        '''
+        mask = mask & ~self.over
+        games = self.games[mask]
+        kind = self.kind[games]
+        orientation = orientation[games] % ORIENTATIONS[kind]
+        fits = self.fits(games, kind, orientation, x[games], self.y[games])
+        games = games[fits]
+        self.orientation[games] = orientation[fits]
+        self.x[games] = x[games]
+        dropping = np.zeros(self.n, dtype=bool)
+        dropping[games] = True
+        self.hard_drop(dropping)
+
+    def step(self, actions):
+        ''' Parameters: actions - type: numpy array (n,) - one of NOTHING,
+                        LEFT, RIGHT, DOWN, ROTATE or DROP for every game
+
+            applies one action to every game that is not over
+        '''
+        self.move(actions == LEFT, -1, 0)
+        self.move(actions == RIGHT, 1, 0)
+        self.move(actions == DOWN, 0, 1)
+        self.rotate(actions == ROTATE)
+        self.hard_drop(actions == DROP)
+
+    def lock(self, mask):
+        ''' adds the pieces of the games in mask to their boards, removes
+            the complete rows, scores them and spawns the next pieces
+        '''
+        games = self.games[mask]
+        if not len(games):
+            return
+        xs, ys = self.cells(self.kind[games], self.orientation[games],
+                            self.x[games], self.y[games])
+        self.boards[games[:, None], ys, xs] = True
+
+        boards = self.boards[games]
+        full = boards.all(axis=2)
+        cleared = full.sum(axis=1)
+        if cleared.any():
+            # a stable sort moves the full rows to the top and keeps the
+            # order of the others, then the full rows are emptied
+            key = np.where(full, -1, np.arange(self.height))
+            order = np.argsort(key, axis=1, kind='stable')
+            boards = np.take_along_axis(boards, order[:, :, None], axis=1)
+            boards[np.arange(self.height) < cleared[:, None]] = False
+            self.boards[games] = boards
+
+        self.cleared[games] = cleared
+        score = self.score[games] + cleared
+        self.score[games] = score
+        scored = games[score > 0]
+        level = np.searchsorted(LEVEL_SCORES, self.score[scored], side='right')
+        self.level[scored] = level + 1
+        self.delay[scored] = LEVEL_DELAYS[level]
+        self.pieces[games] += 1
+        self.spawn(mask)
@@ -0,0 +1,626 @@
+''' Benchmarks for the tetris game.
+
+    Run:  python bench.py [--out RESULTS.json] [--baseline BASELINE.json]
+                          [--threshold 0.25]
+
+    Measures how collision checks and line clears scale with the
+    board size, for both engine board backends, what the ghost piece
+    costs per frame on a near-full board, board features computed from
+    scratch and kept up to date, the board and shape methods
+    of the Tk front end, how many pieces a second seeded headless games
+    play, how many canvas calls each kind of frame makes, and how long
+    the modules take to import.
+
+    The front end runs against a virtual canvas that only counts the Tk
+    calls made to it, so no display is needed. Every number is also kept
+    under a name such as engine/BitBoard/10x20/fits_ns: --out writes them
+    to a JSON file, and --baseline compares them with the file of an
+    earlier run and exits with status 1 when one got worse by more than
+    the threshold. Names ending in _ns (times) and _calls (canvas calls)
+    are better lower, those ending in _per_s better higher.
+'''
+from __future__ import print_function
+import argparse
+import collections
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import ai
+import engine
+import farm
+import features
+import graphics
+import scores
+import tetris
+
+SIZES = [(10, 20), (20, 40), (40, 200), (100, 400)]
+BACKENDS = [engine.Board, engine.BitBoard]
+VIEWS = [tetris.Board, tetris.RetainedBoard]
+# the modules whose import is timed, each in a new interpreter
+IMPORTS = ['engine', 'ai', 'replay', 'graphics', 'tetris']
+
+
+def timed(func, number, repeat=3):
+    ''' Return value: type: float
+
+        the best time in seconds of one call to func,
+        over repeat runs of number calls each
+    '''
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        for j in range(number):
+            func()
+        elapsed = (time.time() - start) / number
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def timed_each(setup, func, number, repeat=3):
+    ''' Return value: type: float
+
+        like timed, for a func that changes what it runs on: every call
+        gets the arguments of a new call to setup, which is not timed
+    '''
+    best = None
+    for i in range(repeat):
+        total = 0.0
+        for j in range(number):
+            args = setup()
+            start = time.time()
+            func(*args)
+            total += time.time() - start
+        if best is None or total / number < best:
+            best = total / number
+    return best
+
+
+def stack_cells(width, height, full_rows=4, seed=0, stack=None):
+    ''' Return value: type: list
+
+        the squares of a random stack over the lower stack rows of a
+        board, half of them by default, with full_rows complete rows
+        spread through it
+    '''
+    rnd = random.Random(seed)
+    stack = range(height - (stack or height // 2), height)
+    complete = set(rnd.sample(stack, full_rows))
+    cells = []
+    for y in stack:
+        for x in range(width):
+            if y in complete or rnd.random() < 0.6:
+                cells.append((x, y))
+    return cells
+
+
+def filled_board(board_class, width, height, full_rows=4, seed=0, stack=None):
+    ''' Return value: type: Board or BitBoard
+
+        a board holding the stack_cells of the same arguments
+    '''
+    board = board_class(width, height)
+    piece = engine.Piece(0, 2, 0)
+    piece.cells = stack_cells(width, height, full_rows, seed, stack)
+    board.add_shape(piece)
+    return board
+
+
+############################################################
+# VIRTUAL CANVAS CLASSES
+############################################################
+class VirtualCanvas():
+    ''' VirtualCanvas class: stands in for a Tk canvas
+        Attributes:
+            calls - type: Counter - the calls made to it, by method name
+            items - type: int - the items created so far
+    '''
+
+    def __init__(self):
+        self.calls = collections.Counter()
+        self.items = 0
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls[name] += 1
+            if name.startswith('create_'):
+                self.items += 1
+                return self.items
+        return call
+
+
+class VirtualFrame(graphics.CanvasFrame):
+    ''' VirtualFrame class: a CanvasFrame drawing on a VirtualCanvas,
+        with the moves batching of the real one and no Tk window
+    '''
+
+    def __init__(self, parent, width=200, height=200):
+        self.parent = parent
+        self.canvas = VirtualCanvas()
+        self.width = width
+        self.height = height
+        self.trans = None
+        self.closed = False
+        self.pendingMoves = {}
+        self.movesScheduled = False
+        parent.frames.append(self)
+
+    def after(self, ms, func):
+        self.parent.after(ms, func)
+
+    def after_idle(self, func):
+        self.parent.after_idle(func)
+
+
+class VirtualWindow():
+    ''' VirtualWindow class: stands in for the game window
+        Attributes:
+            frames - type: list - the VirtualFrames in the window
+            timers - type: list - the (ms, function) of every after call
+            idle - type: list - the functions waiting for Tk to be idle
+    '''
+
+    def __init__(self):
+        self.frames = []
+        self.timers = []
+        self.idle = []
+
+    def bind_all(self, sequence, func):
+        pass
+
+    def after(self, ms, func):
+        self.timers.append((ms, func))
+        return func
+
+    def after_cancel(self, timer):
+        self.timers = [(ms, func) for ms, func in self.timers if func is not timer]
+
+    def after_idle(self, func):
+        self.idle.append(func)
+
+    def run_idle(self):
+        ''' runs what waits for idle time, as Tk does after a frame '''
+        while self.idle:
+            self.idle.pop(0)()
+
+    def calls(self):
+        ''' Return value: type: int - canvas calls made in the window so far '''
+        return sum(sum(frame.canvas.calls.values()) for frame in self.frames)
+
+
+def virtual(make, *args, **kwargs):
+    ''' Return value: what make returns, called with every CanvasFrame
+        the front end creates meanwhile being a VirtualFrame
+    '''
+    real = tetris.CanvasFrame
+    tetris.CanvasFrame = VirtualFrame
+    try:
+        return make(*args, **kwargs)
+    finally:
+        tetris.CanvasFrame = real
+
+
+def virtual_game(board_class, seed=0):
+    ''' Return value: type: tuple (tetris.Tetris, VirtualWindow)
+
+        a seeded 10x20 game drawn by board_class in a virtual window,
+        with its scores kept in memory
+    '''
+    window = VirtualWindow()
+    store = scores.ScoreStore(':memory:', legacy=None)
+    game = virtual(tetris.Tetris, window, board_class=board_class, seed=seed, store=store)
+    window.run_idle()
+    return game, window
+
+
+def view_board(board_class, width=10, height=20, full_rows=0, seed=0):
+    ''' Return value: type: tuple (tetris.Board, VirtualWindow)
+
+        a front end board of board_class in a virtual window, showing
+        the stack_cells of the same arguments
+    '''
+    window = VirtualWindow()
+    state = engine.Board(width, height)
+    board = virtual(board_class, window, width, height, state)
+    piece = engine.Piece(0, 0, 0)
+    piece.cells = stack_cells(width, height, full_rows, seed)
+    shape = tetris.I_shape(piece)
+    if not isinstance(board, tetris.RetainedBoard):
+        shape.draw(board.canvas)
+    board.update_shape(shape)
+    board.add_shape(shape)
+    state.add_shape(piece)
+    window.run_idle()
+    return board, window
+
+
+def bench_board_sizes(sizes=SIZES, number=2000):
+    ''' Return value: type: list
+
+        one dictionary per board size and backend with the time in ns of
+            fits - a collision test of a piece just above the stack
+            row_scan - is_row_complete over every row of the board
+            clear - remove_complete_rows with four complete rows
+    '''
+    results = []
+    for width, height in sizes:
+        for board_class in BACKENDS:
+            board = filled_board(board_class, width, height)
+            cells = engine.Piece(5, width // 2, height // 2 - 2).cells
+
+            def fits():
+                board.fits(cells)
+
+            def row_scan():
+                for y in range(height):
+                    board.is_row_complete(y)
+
+            def copy():
+                board.copy()
+
+            def clear():
+                board.copy().remove_complete_rows()
+
+            copy_time = timed(copy, number // 10)
+            results.append({'backend': board_class.__name__,
+                            'size': '%dx%d' % (width, height),
+                            'fits': timed(fits, number) * 1e9,
+                            'row_scan': timed(row_scan, number // 10) * 1e9,
+                            'clear': (timed(clear, number // 10) - copy_time) * 1e9})
+    return results
+
+
+def bench_ghost(number=20000):
+    ''' Return value: type: list
+
+        one dictionary per backend with the time in ns, on a 10x20 board
+        stacked 16 rows high, of
+            tick - the check Tetris.update_ghost makes when the piece only fell
+            drop_distance - finding the landing row from the column tops,
+            done when the piece turns or changes column
+            step_drop - finding it by moving down a row at a time, as a
+            ghost computed every frame without the column tops would
+    '''
+    results = []
+    for board_class in BACKENDS:
+        game = engine.Game(10, 20, seed=0, board_class=board_class)
+        game.board = filled_board(board_class, 10, 20, full_rows=0, stack=16)
+        piece = game.current_piece
+        key = (piece.kind, piece.orientation, piece.x, game.pieces)
+
+        def tick():
+            return (piece.kind, piece.orientation, piece.x, game.pieces) == key
+
+        def step_drop():
+            cells = piece.cells
+            distance = 0
+            while game.board.fits([(x, y + distance + 1) for x, y in cells]):
+                distance += 1
+            return distance
+
+        assert game.drop_distance() == step_drop()
+        results.append({'backend': board_class.__name__,
+                        'tick': timed(tick, number) * 1e9,
+                        'drop_distance': timed(game.drop_distance, number) * 1e9,
+                        'step_drop': timed(step_drop, number) * 1e9})
+    return results
+
+
+def bench_features(number=2000):
+    ''' Return value: type: list
+
+        one dictionary per backend with the time in ns, on a 10x20 board
+        stacked 10 rows high, of
+            scratch - features.board_features of the board
+            tracked - a FeatureTracker updated for a locked piece,
+            and its features read
+    '''
+    results = []
+    for board_class in BACKENDS:
+        board = filled_board(board_class, 10, 20, full_rows=0)
+        tracker = features.FeatureTracker(board)
+        cells = engine.Piece(5, 5, 2).cells
+
+        def scratch():
+            features.board_features(board.rows, 10)
+
+        def tracked():
+            tracker.add(cells)
+            tracker.features()
+
+        results.append({'backend': board_class.__name__,
+                        'scratch': timed(scratch, number) * 1e9,
+                        'tracked': timed(tracked, number) * 1e9})
+    return results
+
+
+def bench_view(number=2000):
+    ''' Return value: type: list
+
+        one dictionary per front end board with the time in ns, on a
+        10x20 board stacked 10 rows high, of
+            can_move - one square checked
+            is_row_complete - one row checked
+            move_down_rows - the stack moved down into a cleared row,
+            and the frame drawn
+            rotate - Shape.rotate of a T shape above the stack, and the
+            frame drawn
+    '''
+    results = []
+    for board_class in VIEWS:
+        board, window = view_board(board_class)
+        shape = tetris.T_shape(engine.Piece(5, 5, 2))
+        board.draw_shape(shape)
+        window.run_idle()
+
+        def can_move():
+            board.can_move(5, 12)
+
+        def row_scan():
+            for y in range(20):
+                board.is_row_complete(y)
+
+        def rotate():
+            shape.rotate(board)
+            board.update_shape(shape)
+            window.run_idle()
+
+        def cleared_row():
+            board, window = view_board(board_class, full_rows=1)
+            y = [y for y in range(20) if board.is_row_complete(y)][0]
+            board.delete_row(y)
+            window.run_idle()
+            return board, window, y
+
+        def move_down_rows(board, window, y):
+            board.move_down_rows(y - 1)
+            window.run_idle()
+
+        results.append({'view': board_class.__name__,
+                        'can_move': timed(can_move, number) * 1e9,
+                        'is_row_complete': timed(row_scan, number // 10) / 20 * 1e9,
+                        'move_down_rows': timed_each(cleared_row, move_down_rows,
+                                                     number // 40) * 1e9,
+                        'rotate': timed(rotate, number) * 1e9})
+    return results
+
+
+def ai_policy():
+    ''' Return value: a farm policy playing with a new ai.Player, so no
+        run starts with the positions an earlier one cached
+    '''
+    player = ai.Player()
+    return lambda game, rnd: player.play(game)
+
+# the seeded headless games: policy name, function returning the
+# policy, number of games, most pieces a game
+GAMES = [('random', lambda: farm.random_policy, 20, 500),
+         ('ai', ai_policy, 2, 50)]
+
+
+def bench_games(games=GAMES):
+    ''' Return value: type: list
+
+        one dictionary per backend and policy with the pieces played
+        per second over the seeded headless games of farm.play_game
+    '''
+    results = []
+    for board_class in BACKENDS:
+        for name, make_policy, count, max_pieces in games:
+            policy = make_policy()
+            pieces = 0
+            start = time.time()
+            for index in range(count):
+                game = farm.play_game(farm.game_seed(0, index), policy=policy,
+                                      max_pieces=max_pieces, board_class=board_class)
+                pieces += game.pieces
+            results.append({'backend': board_class.__name__,
+                            'policy': name,
+                            'pieces': pieces / (time.time() - start)})
+    return results
+
+
+def bench_frames(pieces=100):
+    ''' Return value: type: list
+
+        one dictionary per front end board with the canvas calls of
+            fall - a frame where the shape falls a row
+            shift - one where it moves sideways
+            rotate - one where it rotates
+            drop - a hard drop that locks it and shows the next shape
+            piece - the mean of a piece played by the ai in a seeded
+            game, line clears included
+        and pieces, the pieces a second of that game
+    '''
+    results = []
+    for board_class in VIEWS:
+        game, window = virtual_game(board_class)
+
+        def frame(action, *args):
+            before = window.calls()
+            action(*args)
+            window.run_idle()
+            return window.calls() - before
+
+        while not game.game.current_piece.can_rotate(game.game.board):
+            game.do_move('Down')
+        window.run_idle()
+        result = {'view': board_class.__name__,
+                  'fall': frame(game.do_move, 'Down'),
+                  'shift': frame(game.do_move, 'Left'),
+                  'rotate': frame(game.do_rotate),
+                  'drop': frame(game.hard_drop)}
+        # a narrow plan, finished at once so the moves do not
+        # depend on the time it got
+        game.player = ai.BeamPlanner(beam=1)
+        played = game.game.pieces
+        before = window.calls()
+        start = time.time()
+        while game.game.pieces < played + pieces and not game.game.over:
+            game.autoplay()
+            game.player.step()
+            window.run_idle()
+        elapsed = time.time() - start
+        played = game.game.pieces - played
+        result['piece'] = (window.calls() - before) / float(played)
+        result['pieces'] = played / elapsed
+        results.append(result)
+    return results
+
+
+def bench_imports(modules=IMPORTS, repeat=5):
+    ''' Return value: type: list
+
+        one dictionary per module with
+            time - the best time in ns a new interpreter takes to import
+            the module; it includes compiling it when Python writes no
+            bytecode (PYTHONDONTWRITEBYTECODE)
+            tk - True if importing it loaded Tk
+    '''
+    script = ('import sys, time\n'
+              'start = time.time()\n'
+              'import %s\n'
+              'print(time.time() - start)\n'
+              'print("Tkinter" in sys.modules or "tkinter" in sys.modules)\n')
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for module in modules:
+        best = None
+        for i in range(repeat):
+            output = subprocess.check_output([sys.executable, '-c', script % module], cwd=here)
+            seconds, tk = output.decode().split()
+            if best is None or float(seconds) < best:
+                best = float(seconds)
+        results.append({'module': module, 'time': best * 1e9, 'tk': tk == 'True'})
+    return results
+
+
+def named(results, prefix, keys, suffix, numbers):
+    ''' adds the numbers of results to the dictionary numbers, each under
+        prefix, the values of keys and its own field name plus suffix
+    '''
+    for result in results:
+        name = '/'.join([prefix] + [result[key] for key in keys])
+        for field, value in result.items():
+            if field not in keys:
+                numbers['%s/%s%s' % (name, field, suffix)] = value
+
+
+def compare(numbers, baseline, threshold):
+    ''' Return value: type: list
+
+        (name, baseline value, value) of the numbers that got worse than
+        in baseline by more than the threshold fraction
+    '''
+    worse = []
+    for name in sorted(baseline):
+        if name not in numbers:
+            continue
+        old, new = baseline[name], numbers[name]
+        if name.endswith('_per_s'):
+            slower = old > new * (1 + threshold)
+        else:
+            slower = new > old * (1 + threshold)
+        if slower:
+            worse.append((name, old, new))
+    return worse
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the tetris engine and front end.')
+    parser.add_argument('--out', help='write every number to this JSON file')
+    parser.add_argument('--baseline', help='compare with the JSON file of an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='how much worse than the baseline is a regression, 0.25 is 25%%')
+    args = parser.parse_args()
+    numbers = {}
+
+    results = bench_board_sizes()
+    named(results, 'engine', ('backend', 'size'), '_ns', numbers)
+    print('%-8s %9s %12s %14s %14s' % ('backend', 'size', 'fits ns', 'row scan ns', 'clear ns'))
+    for result in results:
+        print('%-8s %9s %12.0f %14.0f %14.0f' % (result['backend'], result['size'],
+              result['fits'], result['row_scan'], result['clear']))
+    print()
+
+    results = bench_ghost()
+    named(results, 'ghost', ('backend',), '_ns', numbers)
+    print('ghost piece on a near-full 10x20 board')
+    print('%-8s %10s %18s %14s' % ('backend', 'tick ns', 'drop_distance ns', 'step drop ns'))
+    for result in results:
+        print('%-8s %10.0f %18.0f %14.0f' % (result['backend'], result['tick'],
+              result['drop_distance'], result['step_drop']))
+    print()
+
+    results = bench_features()
+    named(results, 'features', ('backend',), '_ns', numbers)
+    print('board features after a lock, 10x20 stacked 10 rows high')
+    print('%-8s %12s %12s' % ('backend', 'scratch ns', 'tracked ns'))
+    for result in results:
+        print('%-8s %12.0f %12.0f' % (result['backend'], result['scratch'], result['tracked']))
+    print()
+
+    results = bench_view()
+    named(results, 'view', ('view',), '_ns', numbers)
+    print('front end boards, 10x20 stacked 10 rows high')
+    print('%-14s %12s %18s %18s %10s' % ('board', 'can_move ns', 'is_row_complete ns',
+                                         'move_down_rows ns', 'rotate ns'))
+    for result in results:
+        print('%-14s %12.0f %18.0f %18.0f %10.0f' % (result['view'], result['can_move'],
+              result['is_row_complete'], result['move_down_rows'], result['rotate']))
+    print()
+
+    results = bench_games()
+    named(results, 'game', ('backend', 'policy'), '_per_s', numbers)
+    print('seeded headless games')
+    print('%-8s %8s %10s' % ('backend', 'policy', 'pieces/s'))
+    for result in results:
+        print('%-8s %8s %10.0f' % (result['backend'], result['policy'], result['pieces']))
+    print()
+
+    results = bench_frames()
+    for result in results:
+        numbers['frame/%s/pieces_per_s' % result['view']] = result.pop('pieces')
+    named(results, 'frame', ('view',), '_calls', numbers)
+    print('canvas calls per frame')
+    print('%-14s %6s %6s %7s %6s %7s' % ('board', 'fall', 'shift', 'rotate', 'drop', 'piece'))
+    for result in results:
+        print('%-14s %6d %6d %7d %6d %7.1f' % (result['view'], result['fall'], result['shift'],
+              result['rotate'], result['drop'], result['piece']))
+    print()
+
+    results = bench_imports()
+    print('imports, in a new interpreter')
+    print('%-10s %8s %10s' % ('module', 'ms', 'loads Tk'))
+    for result in results:
+        numbers['import/%s/time_ns' % result['module']] = result['time']
+        print('%-10s %8.1f %10s' % (result['module'], result['time'] / 1e6,
+                                    'yes' if result['tk'] else 'no'))
+
+    if args.out:
+        with open(args.out, 'w') as out:
+            json.dump({'python': sys.version.split()[0], 'numbers': numbers},
+                      out, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('python') != sys.version.split()[0]:
+            print()
+            print('note: the baseline was taken with Python %s' % baseline.get('python'))
+        worse = compare(numbers, baseline['numbers'], args.threshold)
+        print()
+        if not worse:
+            print('no regressions against %s' % args.baseline)
+            return
+        print('%d regressions against %s:' % (len(worse), args.baseline))
+        for name, old, new in worse:
+            print('  %-44s %12.1f -> %12.1f' % (name, old, new))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+''' Keyboard input for the game loop.
+
+    The Tk key events only change the state of the keys: which are held
+    and for how long. Once per logic tick the game asks for the moves
+    that are due, so a frame sees one input state however many events
+    piled up in the Tk queue, and movement speed does not depend on the
+    desktop's key repeat:
+
+        Left, Right - one move on the press; held for das ms, one more
+                      and then one every arr ms (arr 0: to the wall)
+        Down        - one move on the press, then one every soft_drop ms
+        Up, space   - once per press
+
+    The key repeat of the desktop shows up as more presses of a held key,
+    or as a release followed by a press before the next tick; both are
+    ignored, so holding Up rotates once.
+
+    The time from a key press to the first frame drawn after its move is
+    kept, so input latency can be watched.
+'''
+import loop
+
+# keys that move the shape sideways and the one that moves it down
+SHIFT_KEYS = ('Left', 'Right')
+SOFT_DROP_KEY = 'Down'
+# keys that act once per press
+PRESS_KEYS = ('Up', 'space')
+KEYS = SHIFT_KEYS + (SOFT_DROP_KEY,) + PRESS_KEYS
+
+# moves that stand for "as far as it goes"
+ALL_THE_WAY = 1 << 16
+
+
+############################################################
+# CONTROLS CLASS
+############################################################
+class Controls():
+    ''' Controls class: key state and auto repeat
+        Attributes:
+            das - type: int - ms a sideways key is held before it repeats
+            arr - type: int - ms between sideways repeats, 0 to go to the wall
+            soft_drop - type: int - ms between moves down while Down is held
+            clock - type: function - returns the time in seconds
+            held - type: dictionary - each held key to the ms it has been held,
+            None if it was pressed after the last tick
+            shift - type: str - the sideways key pressed last
+            releases - type: set - held keys released after the last tick
+            press_times - type: dictionary - clock time of the presses not
+            acted on yet
+            pressed_at - type: list - clock time of the presses whose moves
+            were made after the last frame
+            latency - type: list - count, total and largest ms from a key
+            press to the frame that showed its move
+    '''
+
+    def __init__(self, das=167, arr=33, soft_drop=33, clock=loop.monotonic):
+        self.das = das
+        self.arr = arr
+        self.soft_drop = soft_drop
+        self.clock = clock
+        self.held = {}
+        self.shift = None
+        self.releases = set()
+        self.press_times = {}
+        self.pressed_at = []
+        self.latency = [0, 0.0, 0.0]
+
+    def press(self, key):
+        ''' records a key press from Tk, key being one of KEYS '''
+        if key in self.held:
+            # a repeat of a key that is still down
+            self.releases.discard(key)
+            return
+        self.held[key] = None
+        if key in SHIFT_KEYS:
+            self.shift = key
+        self.press_times[key] = self.clock()
+
+    def release(self, key):
+        ''' records a key release from Tk '''
+        if key in self.held:
+            self.releases.add(key)
+
+    def moves_made(self, key, held):
+        ''' Return value: type: int
+
+            the moves key has made once it has been held for held ms
+        '''
+        if held < 0:
+            return 0
+        if key in PRESS_KEYS:
+            return 1
+        if key == SOFT_DROP_KEY:
+            return 1 + held // self.soft_drop
+        if held < self.das:
+            return 1
+        if self.arr == 0:
+            return ALL_THE_WAY
+        return 2 + (held - self.das) // self.arr
+
+    def update(self, ms):
+        ''' Parameters: ms - type: int - game time since the last update
+            Return value: type: list
+
+            the (key, moves) due this tick, in the order of KEYS:
+            sideways first, then down, rotate and drop
+        '''
+        moves = []
+        # of two sideways keys held, the one pressed last moves the shape
+        shift = self.shift
+        if shift not in self.held:
+            shift = 'Right' if shift == 'Left' else 'Left'
+        for key, held in list(self.held.items()):
+            if held is None:
+                before, after = -1, 0
+                self.pressed_at.append(self.press_times.pop(key, None))
+            elif key in self.releases:
+                # let go at some time since the last tick: no more repeats
+                continue
+            else:
+                before, after = held, held + ms
+            self.held[key] = after
+            if key in SHIFT_KEYS and key != shift:
+                continue
+            count = self.moves_made(key, after) - self.moves_made(key, before)
+            if count:
+                moves.append((key, count))
+        for key in self.releases:
+            del self.held[key]
+        self.releases = set()
+        moves.sort(key=lambda move: KEYS.index(move[0]))
+        return moves
+
+    def rendered(self):
+        ''' notes that a frame was drawn: the presses whose moves were
+            made since the last one have reached the screen
+        '''
+        now = self.clock()
+        for pressed in self.pressed_at:
+            if pressed is not None:
+                ms = (now - pressed) * 1000
+                self.latency[0] += 1
+                self.latency[1] += ms
+                self.latency[2] = max(self.latency[2], ms)
+        self.pressed_at = []
+
+    def mean_latency(self):
+        ''' Return value: type: float - mean ms from a press to its frame '''
+        count, total, largest = self.latency
+        return total / count if count else 0.0
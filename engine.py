@@ -0,0 +1,843 @@
+''' Headless rules engine for the tetris game.
+
+    Nothing in this module imports graphics or Tkinter, so importing it
+    has no side effects and games can run without a display (batch jobs,
+    AI search, replays). The Tk front end in tetris.py drives these classes
+    and only mirrors their state on the screen.
+
+    Importing it takes well under a millisecond: the random module,
+    which costs more to import than the rest of the engine, is only
+    imported by the first Game that deals its own pieces.
+'''
+
+
+############################################################
+# SHAPE TABLES
+############################################################
+# One entry per shape, in the order of Tetris.SHAPES.
+# SHAPE_OFFSETS are the block positions relative to the spawn centre;
+# the block at index 1 is the one the shape rotates around.
+SHAPE_NAMES = ['I', 'J', 'L', 'O', 'S', 'T', 'Z']
+SHAPE_COLORS = ['blue', 'orange', 'cyan', 'red', 'green', 'yellow', 'magenta']
+SHAPE_OFFSETS = [[(-2, 0), (-1, 0), (0, 0), (1, 0)],
+                 [(-1, 0), (0, 0), (1, 0), (1, 1)],
+                 [(-1, 0), (0, 0), (1, 0), (-1, 1)],
+                 [(0, 0), (-1, 0), (0, 1), (-1, 1)],
+                 [(0, 0), (0, 1), (1, 0), (-1, 1)],
+                 [(-1, 0), (0, 0), (1, 0), (0, 1)],
+                 [(-1, 0), (0, 0), (0, 1), (1, 1)]]
+### The O shape does not rotate, and only I, S and Z shift their
+### rotation direction after every rotation.
+SHAPE_ROTATES = [True, True, True, False, True, True, True]
+SHAPE_SHIFTS = [True, False, False, False, True, False, True]
+
+
+def build_rotations(offsets, rotates, shifts):
+    ''' Return value: type: list
+
+        the orientations a shape goes through when it is rotated over
+        and over, each a list of block offsets from the block at index 1.
+        A rotation in direction d takes offset (dx, dy) to (d*dy, -d*dx);
+        the direction starts at -1 and flips after every rotation of the
+        shapes that shift it, which brings them back after two turns.
+    '''
+    pivot_x, pivot_y = offsets[1]
+    orientation = [(x - pivot_x, y - pivot_y) for x, y in offsets]
+    if not rotates:
+        return [orientation]
+    orientations = []
+    direction = -1
+    while orientation not in orientations:
+        orientations.append(orientation)
+        orientation = [(direction*dy, -direction*dx) for dx, dy in orientation]
+        if shifts:
+            direction *= -1
+    return orientations
+
+# ROTATIONS[kind][orientation] is the list of block offsets of a shape,
+# built once here so rotating is a table lookup
+ROTATIONS = [build_rotations(SHAPE_OFFSETS[kind], SHAPE_ROTATES[kind], SHAPE_SHIFTS[kind])
+             for kind in range(len(SHAPE_OFFSETS))]
+
+
+def row_drops(height, cleared):
+    ''' Parameters: height - type:int - the number of rows on the board
+                    cleared - type:list - the complete rows, top row first
+        Return value: type: list
+
+        for each row, how many rows it moves down once the cleared
+        rows are removed, or -1 for the cleared rows themselves
+    '''
+    drops = [0] * height
+    drop = 0
+    index = len(cleared) - 1
+    for y in range(height - 1, -1, -1):
+        if index >= 0 and cleared[index] == y:
+            drops[y] = -1
+            drop += 1
+            index -= 1
+        else:
+            drops[y] = drop
+    return drops
+
+
+def column_tops(rows, width):
+    ''' Parameters: rows - type: list - the board as row bitmasks, top row first
+        Return value: type: list
+
+        for each column, the row of its highest square, or the
+        number of rows if it is empty
+    '''
+    tops = [len(rows)] * width
+    seen = 0
+    full = (1 << width) - 1
+    for y, row in enumerate(rows):
+        new = row & ~seen
+        while new:
+            low = new & -new
+            tops[low.bit_length() - 1] = y
+            new ^= low
+        seen |= row
+        if seen == full:
+            break
+    return tops
+
+
+def drop_distance(board, cells):
+    ''' Parameters: board - type: Board or BitBoard
+                    cells - type: list - the squares of a piece that fits
+        Return value: type: int
+
+        how many rows the piece can fall. When every square is above the
+        top of its column this comes straight from the column tops; a
+        piece under an overhang is moved down one row at a time.
+    '''
+    tops = board.tops
+    distance = board.height
+    for x, y in cells:
+        if y >= tops[x]:
+            distance = 0
+            while board.fits([(x, y + distance + 1) for x, y in cells]):
+                distance += 1
+            return distance
+        if tops[x] - 1 - y < distance:
+            distance = tops[x] - 1 - y
+    return distance
+
+
+############################################################
+# ZOBRIST KEYS
+############################################################
+# A board is fingerprinted by the XOR of a 64 bit key per occupied
+# square, so locking or removing a square changes the fingerprint with
+# one XOR, whatever the number of squares on the board.
+MASK64 = (1 << 64) - 1
+
+
+def zobrist_key(index):
+    ''' Return value: type: int
+
+        a random looking 64 bit key for the number index, the same
+        in every run: the output function of splitmix64
+    '''
+    z = (index + 1) * 0x9E3779B97F4A7C15 & MASK64
+    z = (z ^ z >> 30) * 0xBF58476D1CE4E5B9 & MASK64
+    z = (z ^ z >> 27) * 0x94D049BB133111EB & MASK64
+    return z ^ z >> 31
+
+
+def square_key(x, y):
+    ''' Return value: type: int - the key of square x, y '''
+    return zobrist_key(y << 16 | x)
+
+# PIECE_KEYS[kind][orientation] is the key of the falling piece
+PIECE_KEYS = [[zobrist_key(1 << 40 | kind << 8 | orientation)
+               for orientation in range(len(ROTATIONS[kind]))]
+              for kind in range(len(ROTATIONS))]
+
+# the row_keys tables of every board size made so far
+ROW_KEYS = {}
+
+
+def row_keys(width, height):
+    ''' Return value: type: list
+
+        tables whose entry [y][c][bits] is the XOR of the keys of the
+        squares of row y set in bits, the c-th group of 4 bits of a row
+        bitmask, so the key of a whole row takes one lookup per 4
+        squares, and square x, y has the key [y][x >> 2][1 << (x & 3)].
+        They are made the first time a board of the size is, and shared.
+    '''
+    tables = ROW_KEYS.get((width, height))
+    if tables is None:
+        tables = []
+        for y in range(height):
+            row = []
+            for c in range(0, width, 4):
+                keys = [square_key(x, y) for x in range(c, min(c + 4, width))]
+                table = [0] * (1 << len(keys))
+                for bits in range(1, len(table)):
+                    low = bits & -bits
+                    table[bits] = table[bits ^ low] ^ keys[low.bit_length() - 1]
+                row.append(table)
+            tables.append(row)
+        ROW_KEYS[width, height] = tables
+    return tables
+
+
+def row_key(tables, row):
+    ''' Parameters: tables - type: list - the row_keys tables of one row
+                    row - type: int - the bitmask of the row
+        Return value: type: int - the XOR of the keys of its squares
+    '''
+    key = 0
+    for table in tables:
+        key ^= table[row & 15]
+        row >>= 4
+    return key
+
+
+def rows_key(keys, rows):
+    ''' Return value: type: int - the Zobrist key of a board given as rows '''
+    key = 0
+    for y, row in enumerate(rows):
+        if row:
+            key ^= row_key(keys[y], row)
+    return key
+
+
+############################################################
+# PIECE CLASS
+############################################################
+class Piece(object):
+    ''' Piece class:
+        The logical state of a falling tetris shape
+        Attributes: kind - type: int - index into the shape tables
+                    orientation - type: int - index into ROTATIONS[kind]
+                    x, y - type: int - the square of the block it rotates around
+                    cells - type: list - the (x, y) squares the piece covers
+    '''
+    __slots__ = ('kind', 'orientation', 'x', 'y', 'cells')
+
+    def __init__(self, kind, x, y):
+        self.kind = kind
+        self.orientation = 0
+        pivot_x, pivot_y = SHAPE_OFFSETS[kind][1]
+        self.x = x + pivot_x
+        self.y = y + pivot_y
+        self.cells = self.moved(0, 0)
+
+    @property
+    def rotation_dir(self):
+        ''' the direction the next rotation turns: I, S and Z alternate
+            between -1 and 1, the other shapes always turn with -1
+        '''
+        if SHAPE_SHIFTS[self.kind] and self.orientation == 1:
+            return 1
+        return -1
+
+    def moved(self, dx, dy):
+        ''' Return value: type: list
+
+            the cells the piece would cover after moving dx, dy squares
+        '''
+        x = self.x + dx
+        y = self.y + dy
+        return [(x + ox, y + oy) for ox, oy in ROTATIONS[self.kind][self.orientation]]
+
+    def rotated(self):
+        ''' Return value: type: list
+
+            the cells the piece would cover in its next orientation
+        '''
+        rotations = ROTATIONS[self.kind]
+        x = self.x
+        y = self.y
+        return [(x + ox, y + oy)
+                for ox, oy in rotations[(self.orientation + 1) % len(rotations)]]
+
+    def place(self, orientation, x, y):
+        ''' puts the piece in the given orientation with its
+            rotation block on square x, y
+        '''
+        self.orientation = orientation
+        self.x = x
+        self.y = y
+        self.cells = self.moved(0, 0)
+
+    def can_move(self, board, dx, dy):
+        return board.fits(self.moved(dx, dy))
+
+    def can_rotate(self, board):
+        return board.fits(self.rotated())
+
+    def move(self, dx, dy):
+        self.x += dx
+        self.y += dy
+        self.cells = self.moved(0, 0)
+
+    def rotate(self):
+        self.orientation = (self.orientation + 1) % len(ROTATIONS[self.kind])
+        self.cells = self.moved(0, 0)
+
+
+############################################################
+# BOARD CLASS
+############################################################
+class Board(object):
+    ''' Board class: the logical tetris board
+
+        Attributes: width - type:int - width of the board in squares
+                    height - type:int - height of the board in squares
+                    grid - type:Dictionary - maps the (x, y) position of every
+                    locked square to the kind of the shape it came from
+                    tops - type:list - the row of the highest square of each
+                    column, height for empty columns
+                    keys - type:list - the row_keys tables of the board size
+                    zobrist - type:int - the XOR of the keys of the occupied
+                    squares, kept up to date by every change: two boards with
+                    the same squares have the same zobrist, so it can stand
+                    for the board as a dictionary key
+                    features - type:features.FeatureTracker - told of every
+                    change once one is attached, None otherwise; copies of
+                    the board have none
+    '''
+    __slots__ = ('width', 'height', 'grid', 'tops', 'keys', 'zobrist', 'features')
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.grid = {}
+        self.tops = [height] * width
+        self.keys = row_keys(width, height)
+        self.zobrist = 0
+        self.features = None
+
+    def copy(self):
+        ''' Return value: type: Board
+
+            a new board with the same squares
+        '''
+        board = Board(self.width, self.height)
+        board.grid = dict(self.grid)
+        board.tops = list(self.tops)
+        board.zobrist = self.zobrist
+        return board
+
+    def square_key(self, x, y):
+        return self.keys[y][x >> 2][1 << (x & 3)]
+
+    def update_tops(self):
+        ''' finds the column tops again after squares were removed or moved '''
+        tops = [self.height] * self.width
+        for x, y in self.grid:
+            if y < tops[x]:
+                tops[x] = y
+        self.tops = tops
+
+    def can_move(self, x, y):
+        ''' Return value: type: bool
+
+            True if square x, y is inside the board and not occupied
+        '''
+        if x < 0 or x >= self.width or y < 0 or y >= self.height:
+            return False
+        return (x, y) not in self.grid
+
+    def fits(self, cells):
+        ''' Return value: type: bool
+
+            True if every (x, y) square in cells is free
+        '''
+        for x, y in cells:
+            if not self.can_move(x, y):
+                return False
+        return True
+
+    def drop_distance(self, cells):
+        return drop_distance(self, cells)
+
+    def add_shape(self, piece):
+        ''' locks the squares of piece into the grid '''
+        tops = self.tops
+        for cell in piece.cells:
+            x, y = cell
+            if cell not in self.grid:
+                self.zobrist ^= self.keys[y][x >> 2][1 << (x & 3)]
+            self.grid[cell] = piece.kind
+            if y < tops[x]:
+                tops[x] = y
+        if self.features is not None:
+            self.features.add(piece.cells)
+
+    def is_row_complete(self, y):
+        for x in range(self.width):
+            if (x, y) not in self.grid:
+                return False
+        return True
+
+    @property
+    def rows(self):
+        ''' the board as a list of row bitmasks, top row first,
+            with bit x set when square x of the row is occupied
+        '''
+        rows = [0] * self.height
+        for x, y in self.grid:
+            rows[y] |= 1 << x
+        return rows
+
+    def set_rows(self, rows):
+        ''' Parameters: rows - type: list - one bitmask per row, top row first
+
+            replaces the squares of the board; the shapes they
+            came from are not known, so their kind is None
+        '''
+        self.grid = {}
+        for y, row in enumerate(rows):
+            x = 0
+            while row:
+                if row & 1:
+                    self.grid[x, y] = None
+                row >>= 1
+                x += 1
+        self.tops = column_tops(rows, self.width)
+        self.zobrist = rows_key(self.keys, rows)
+        if self.features is not None:
+            self.features.reset(rows)
+
+    def can_place(self, masks, x, y):
+        ''' Parameters: masks - type: list - row bitmasks of a piece,
+                                 bit 0 being its leftmost column
+                        x - type:int - board column of bit 0
+                        y - type:int - board row of the first mask
+            Return value: type: bool
+
+            True if the piece fits at x, y
+        '''
+        cells = []
+        for dy, mask in enumerate(masks):
+            dx = 0
+            while mask:
+                if mask & 1:
+                    cells.append((x + dx, y + dy))
+                mask >>= 1
+                dx += 1
+        return self.fits(cells)
+
+    def delete_row(self, y):
+        for x in range(self.width):
+            del self.grid[x, y]
+        self.zobrist ^= row_key(self.keys[y], (1 << self.width) - 1)
+        self.update_tops()
+        if self.features is not None:
+            self.features.reset(self.rows)
+
+    def move_down_rows(self, y_start):
+        ''' moves every square from row y_start up to the top one row
+            down. A square of row y_start + 1 stays unless one lands on
+            it, and squares moved below the bottom row are lost.
+        '''
+        grid = self.grid
+        zobrist = self.zobrist
+        for y in range(min(y_start, self.height - 1), -1, -1):
+            for x in range(self.width):
+                if (x, y) in grid:
+                    zobrist ^= self.square_key(x, y)
+                    square = grid.pop((x, y))
+                    if y + 1 == self.height:
+                        continue
+                    if (x, y + 1) in grid:
+                        # a square the one above lands on is lost
+                        zobrist ^= self.square_key(x, y + 1)
+                    zobrist ^= self.square_key(x, y + 1)
+                    grid[x, y + 1] = square
+        self.zobrist = zobrist
+        self.update_tops()
+        if self.features is not None:
+            self.features.reset(self.rows)
+
+    def remove_complete_rows(self):
+        ''' Return value: type: list
+
+            removes all the complete rows and returns their numbers,
+            top row first. The complete rows are found in one scan and
+            every square left is moved once, straight to its final row.
+        '''
+        cleared = [y for y in range(self.height) if self.is_row_complete(y)]
+        if cleared:
+            drops = row_drops(self.height, cleared)
+            grid = {}
+            for (x, y), kind in self.grid.items():
+                if drops[y] >= 0:
+                    grid[x, y + drops[y]] = kind
+            self.grid = grid
+            self.update_tops()
+            self.zobrist = rows_key(self.keys, self.rows)
+            if self.features is not None:
+                self.features.clear(cleared)
+        return cleared
+
+
+class BitBoard(object):
+    ''' BitBoard class: the logical tetris board stored as row bitmasks
+
+        Same interface as Board, but each row is an int with bit x set
+        when square x is occupied, so a row is complete when it equals
+        the full mask and a piece fits when its row masks AND to zero.
+        It does not remember which shape a square came from.
+
+        Attributes: width - type:int - width of the board in squares
+                    height - type:int - height of the board in squares
+                    rows - type:list - one bitmask per row, top row first
+                    full - type:int - the mask of a complete row
+                    tops - type:list - the row of the highest square of each
+                    column, height for empty columns
+                    keys - type:list - the row_keys tables of the board size
+                    zobrist - type:int - the XOR of the keys of the occupied
+                    squares, the same as a Board with the same squares has
+                    features - type:features.FeatureTracker - as for Board
+    '''
+    __slots__ = ('width', 'height', 'rows', 'full', 'tops', 'keys', 'zobrist', 'features')
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.rows = [0] * height
+        self.full = (1 << width) - 1
+        self.tops = [height] * width
+        self.keys = row_keys(width, height)
+        self.zobrist = 0
+        self.features = None
+
+    def copy(self):
+        board = BitBoard(self.width, self.height)
+        board.rows = list(self.rows)
+        board.tops = list(self.tops)
+        board.zobrist = self.zobrist
+        return board
+
+    def set_rows(self, rows):
+        self.rows = list(rows)
+        self.tops = column_tops(self.rows, self.width)
+        self.zobrist = rows_key(self.keys, self.rows)
+        if self.features is not None:
+            self.features.reset(self.rows)
+
+    def can_move(self, x, y):
+        if x < 0 or x >= self.width or y < 0 or y >= self.height:
+            return False
+        return not self.rows[y] >> x & 1
+
+    def fits(self, cells):
+        width = self.width
+        height = self.height
+        rows = self.rows
+        for x, y in cells:
+            if x < 0 or x >= width or y < 0 or y >= height or rows[y] >> x & 1:
+                return False
+        return True
+
+    def can_place(self, masks, x, y):
+        if x < 0 or y < 0 or y + len(masks) > self.height:
+            return False
+        rows = self.rows
+        full = self.full
+        for dy, mask in enumerate(masks):
+            mask <<= x
+            if mask & ~full or rows[y + dy] & mask:
+                return False
+        return True
+
+    def drop_distance(self, cells):
+        return drop_distance(self, cells)
+
+    def add_shape(self, piece):
+        rows = self.rows
+        tops = self.tops
+        keys = self.keys
+        for x, y in piece.cells:
+            if not rows[y] >> x & 1:
+                rows[y] |= 1 << x
+                self.zobrist ^= keys[y][x >> 2][1 << (x & 3)]
+            if y < tops[x]:
+                tops[x] = y
+        if self.features is not None:
+            self.features.add(piece.cells)
+
+    def is_row_complete(self, y):
+        return self.rows[y] == self.full
+
+    def delete_row(self, y):
+        self.zobrist ^= row_key(self.keys[y], self.rows[y])
+        self.rows[y] = 0
+        self.tops = column_tops(self.rows, self.width)
+        if self.features is not None:
+            self.features.reset(self.rows)
+
+    def move_down_rows(self, y_start):
+        if y_start < 0:
+            return
+        y_start = min(y_start, self.height - 1)
+        rows = self.rows
+        keys = self.keys
+        # row y_start lands on the one below, keeping its squares as
+        # Board does; below the bottom row it is lost
+        moved = [0] + rows[:y_start]
+        if y_start + 1 < self.height:
+            moved.append(rows[y_start + 1] | rows[y_start])
+        zobrist = self.zobrist
+        for y, row in enumerate(moved):
+            if row != rows[y]:
+                zobrist ^= row_key(keys[y], rows[y]) ^ row_key(keys[y], row)
+        self.zobrist = zobrist
+        rows[:len(moved)] = moved
+        self.tops = column_tops(rows, self.width)
+        if self.features is not None:
+            self.features.reset(rows)
+
+    def remove_complete_rows(self):
+        full = self.full
+        rows = self.rows
+        cleared = [y for y in range(self.height) if rows[y] == full]
+        if cleared:
+            self.rows = [0] * len(cleared) + [row for row in rows if row != full]
+            self.tops = column_tops(self.rows, self.width)
+            self.zobrist = rows_key(self.keys, self.rows)
+            if self.features is not None:
+                self.features.clear(cleared)
+        return cleared
+
+
+############################################################
+# SCORE CLASS
+############################################################
+class Score(object):
+    ''' Score class: score, level and gravity delay of a game
+
+        Attributes: your_score - type:int - number of rows cleared
+                    level - type:int - the current level
+                    new_delay - type:int - gravity delay in ms for the level
+    '''
+    __slots__ = ('your_score', 'level', 'new_delay')
+
+    def __init__(self):
+        self.your_score = 0
+        self.level = 1
+        self.new_delay = 1000
+
+    def set_score(self):
+        ''' Return value: type: int
+
+            counts one cleared row and returns the gravity delay
+            of the resulting level
+        '''
+        self.your_score += 1
+        if self.your_score < 25:
+            self.new_delay = 975
+            self.level = 1
+        elif self.your_score < 50:
+            self.new_delay = 950
+            self.level = 2
+        elif self.your_score < 100:
+            self.new_delay = 900
+            self.level = 3
+        elif self.your_score < 150:
+            self.new_delay = 850
+            self.level = 4
+        elif self.your_score < 200:
+            self.new_delay = 750
+            self.level = 5
+        else:
+            self.new_delay = 500
+            self.level = 6
+        return self.new_delay
+
+    def restore(self, your_score):
+        ''' sets the score to your_score rows, with the level and
+            delay set_score would have reached
+        '''
+        self.__init__()
+        if your_score:
+            self.your_score = your_score - 1
+            self.set_score()
+
+
+############################################################
+# SNAPSHOT CLASS
+############################################################
+class Snapshot(object):
+    ''' Snapshot class: a compact copy of the position of a game
+
+        Attributes: rows - type:tuple - the board as row bitmasks, top row first
+                    kind, orientation, x, y - type:int - the current piece
+                    next_kind - type:int - the previewed piece
+                    your_score - type:int - rows cleared so far
+                    pieces - type:int - pieces locked so far
+                    over - type:bool - whether the game has ended
+        The state of the piece generator is not part of a snapshot.
+    '''
+    __slots__ = ('rows', 'kind', 'orientation', 'x', 'y', 'next_kind',
+                 'your_score', 'pieces', 'over')
+
+    def __init__(self, rows, kind, orientation, x, y, next_kind, your_score,
+                 pieces, over):
+        self.rows = rows
+        self.kind = kind
+        self.orientation = orientation
+        self.x = x
+        self.y = y
+        self.next_kind = next_kind
+        self.your_score = your_score
+        self.pieces = pieces
+        self.over = over
+
+
+############################################################
+# GAME CLASS
+############################################################
+class Game():
+    ''' Game class: the rules of a single tetris game, without any display
+        Attributes:
+            DIRECTION - type: dictionary - converts string direction to (dx, dy)
+            board - type: Board or BitBoard - the locked squares
+            score - type: Score - score, level and gravity delay
+            random - type: random.Random - the game's own piece generator, or
+            the generator given to the game: any object with a randint method
+            current_piece - type: Piece - the falling piece
+            next_kind - type: int - the kind of the piece shown in the preview
+            cleared - type: list - the rows removed by the last lock
+            pieces - type: int - the number of pieces locked so far
+            over - type: bool - True once a new piece could not be placed
+    '''
+
+    DIRECTION = {'Left': (-1, 0), 'Right': (1, 0), 'Down': (0, 1)}
+
+    def __init__(self, width=10, height=20, seed=None, board_class=Board, generator=None):
+        if width < 4 or height < 2:
+            raise ValueError("the board must be at least 4 squares wide and 2 high")
+        self.width = width
+        self.height = height
+        self.board = board_class(width, height)
+        self.score = Score()
+        if generator is None:
+            import random
+            generator = random.Random(seed)
+        self.random = generator
+        self.next_kind = self.random.randint(0, len(SHAPE_OFFSETS) - 1)
+        self.cleared = []
+        self.pieces = 0
+        self.over = False
+        self.current_piece = self.create_new_piece()
+
+    @property
+    def delay(self):
+        ''' the gravity delay in ms for the current level '''
+        return self.score.new_delay
+
+    @property
+    def zobrist(self):
+        ''' the position as a 64 bit key: the zobrist of the board with
+            the key of the kind and orientation of the falling piece
+        '''
+        piece = self.current_piece
+        return self.board.zobrist ^ PIECE_KEYS[piece.kind][piece.orientation]
+
+    def snapshot(self):
+        ''' Return value: type: Snapshot
+
+            a compact copy of the current position
+        '''
+        piece = self.current_piece
+        return Snapshot(tuple(self.board.rows), piece.kind, piece.orientation,
+                        piece.x, piece.y, self.next_kind, self.score.your_score,
+                        self.pieces, self.over)
+
+    def restore(self, snapshot):
+        ''' Parameters: snapshot - type: Snapshot
+
+            puts the game back in the position of snapshot
+        '''
+        self.board.set_rows(snapshot.rows)
+        self.current_piece = Piece(snapshot.kind, 0, 0)
+        self.current_piece.place(snapshot.orientation, snapshot.x, snapshot.y)
+        self.next_kind = snapshot.next_kind
+        self.score.restore(snapshot.your_score)
+        self.pieces = snapshot.pieces
+        self.over = snapshot.over
+        self.cleared = []
+
+    def create_new_piece(self):
+        ''' Return value: type: Piece
+
+            spawns the previewed piece centered at y = 0 and
+            x = width // 2, and draws the kind of the next one
+        '''
+        kind = self.next_kind
+        self.next_kind = self.random.randint(0, len(SHAPE_OFFSETS) - 1)
+        return Piece(kind, self.width // 2, 0)
+
+    def do_move(self, direction):
+        ''' Parameters: direction - type: string
+            Return value: type: bool
+
+            moves the current piece if it can. If it cannot and the
+            direction was 'Down', the piece is locked instead.
+        '''
+        if self.over:
+            return False
+        dx, dy = self.DIRECTION[direction]
+        piece = self.current_piece
+        cells = piece.moved(dx, dy)
+        if self.board.fits(cells):
+            # the cells that were checked are the new cells of the piece
+            piece.x += dx
+            piece.y += dy
+            piece.cells = cells
+            return True
+        if direction == 'Down':
+            self.lock()
+        return False
+
+    def do_rotate(self):
+        ''' Return value: type: bool
+
+            rotates the current piece if it can
+        '''
+        if self.over:
+            return False
+        piece = self.current_piece
+        cells = piece.rotated()
+        if not self.board.fits(cells):
+            return False
+        piece.orientation = (piece.orientation + 1) % len(ROTATIONS[piece.kind])
+        piece.cells = cells
+        return True
+
+    def drop_distance(self):
+        ''' Return value: type: int - how many rows the current piece can fall '''
+        return self.board.drop_distance(self.current_piece.cells)
+
+    def hard_drop(self):
+        ''' moves the current piece straight down to where it lands
+            and locks it
+        '''
+        if self.over:
+            return
+        distance = self.drop_distance()
+        if distance:
+            self.current_piece.move(0, distance)
+        self.lock()
+
+    def lock(self):
+        ''' adds the current piece to the board, removes the complete
+            rows and spawns the next piece. The game is over if the
+            new piece does not fit.
+        '''
+        self.board.add_shape(self.current_piece)
+        self.cleared = self.board.remove_complete_rows()
+        for y in self.cleared:
+            self.score.set_score()
+        self.pieces += 1
+        self.current_piece = self.create_new_piece()
+        if not self.board.fits(self.current_piece.cells):
+            self.over = True
@@ -0,0 +1,125 @@
+''' Game farm: headless tetris games spread over a process pool.
+
+    Run:  python farm.py GAMES [--seed SEED] [--workers N]
+
+    Every game gets its own seed, derived from the farm seed and the
+    game's index, and its own piece generator and policy generator
+    built from it. The results come back in game order, so for a given
+    seed they are the same whatever the number of workers.
+'''
+from __future__ import print_function
+import argparse
+import collections
+import multiprocessing
+import random
+import time
+
+import engine
+
+# one finished game: the numbers a farm run keeps of it
+GameRecord = collections.namedtuple('GameRecord',
+                                    ['index', 'seed', 'pieces', 'score', 'level', 'over'])
+
+
+def game_seed(seed, index):
+    ''' Return value: type: int
+
+        the seed of game number index of a farm run with seed: the
+        two are mixed with splitmix64 (engine.zobrist_key), so games of
+        different farm seeds only share a seed by chance
+    '''
+    return engine.zobrist_key(engine.zobrist_key(seed & engine.MASK64) ^ index)
+
+
+def random_policy(game, rnd):
+    ''' Parameters: game - type: engine.Game
+                    rnd - type: random.Random - the policy's own generator
+
+        plays the current piece: a random number of rotations,
+        a random shift sideways, then a hard drop
+    '''
+    for i in range(rnd.randint(0, 3)):
+        game.do_rotate()
+    shift = rnd.randint(-game.width // 2, game.width // 2)
+    direction = 'Left' if shift < 0 else 'Right'
+    for i in range(abs(shift)):
+        if not game.do_move(direction):
+            break
+    game.hard_drop()
+
+
+def play_game(seed, width=10, height=20, policy=random_policy, max_pieces=10000,
+              board_class=engine.BitBoard):
+    ''' Return value: type: engine.Game
+
+        plays one headless game with seed until it is over or
+        max_pieces pieces have been locked
+    '''
+    game = engine.Game(width, height, seed=seed, board_class=board_class)
+    rnd = random.Random('policy %d' % seed)
+    while not game.over and game.pieces < max_pieces:
+        policy(game, rnd)
+    return game
+
+
+def play_task(task):
+    ''' runs one game of a farm in a worker and returns its GameRecord '''
+    index, seed, width, height, policy, max_pieces = task
+    game = play_game(seed, width, height, policy, max_pieces)
+    return GameRecord(index, seed, game.pieces, game.score.your_score,
+                      game.score.level, game.over)
+
+
+def run_farm(games, seed=0, workers=None, width=10, height=20, policy=random_policy,
+             max_pieces=10000, chunksize=None):
+    ''' Parameters: games - type: int - number of games to play
+                    seed - type: int - the farm seed
+                    workers - type: int - processes to use, default one per core;
+                    with 1 the games run in this process
+                    policy - a top level function(game, rnd) that plays one piece
+        Return value: type: list - one GameRecord per game, in game order
+    '''
+    tasks = [(index, game_seed(seed, index), width, height, policy, max_pieces)
+             for index in range(games)]
+    if workers == 1:
+        return [play_task(task) for task in tasks]
+    pool = multiprocessing.Pool(workers)
+    try:
+        if chunksize is None:
+            chunksize = max(1, games // (4 * (workers or multiprocessing.cpu_count())))
+        return list(pool.imap(play_task, tasks, chunksize))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play headless tetris games in parallel.')
+    parser.add_argument('games', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--width', type=int, default=10)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--max-pieces', type=int, default=10000)
+    parser.add_argument('--out', help='write one line per game to this CSV file')
+    args = parser.parse_args()
+
+    start = time.time()
+    records = run_farm(args.games, args.seed, args.workers, args.width, args.height,
+                       max_pieces=args.max_pieces)
+    elapsed = max(time.time() - start, 1e-9)
+    pieces = sum(record.pieces for record in records)
+    print('%d games, %d pieces in %.2fs: %.0f games/s, %.0f pieces/s'
+          % (len(records), pieces, elapsed, len(records) / elapsed, pieces / elapsed))
+    if records:
+        print('mean score %.2f, best %d' % (sum(record.score for record in records) / float(len(records)),
+                                             max(record.score for record in records)))
+    if args.out:
+        with open(args.out, 'w') as out:
+            out.write(','.join(GameRecord._fields) + '\n')
+            for record in records:
+                out.write(','.join(str(int(value)) for value in record) + '\n')
+
+
+if __name__ == '__main__':
+    main()
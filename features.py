@@ -0,0 +1,215 @@
+''' Board evaluation features for heuristic players and analytics.
+
+    The features of a board, its rows counted from the top:
+
+        height              - the sum of the column heights
+        max_height          - the height of the highest column
+        holes               - empty squares with an occupied one above them
+        wells               - the sum of the well depths: how far each column
+                              is below the lower of its neighbours, a wall
+                              counting as a column of the board's height
+        row_transitions     - occupied/empty changes along the rows that hold
+                              squares, the walls counting as occupied
+        column_transitions  - occupied/empty changes down the columns, the
+                              floor counting as occupied
+        bumpiness           - the sum of the height differences of
+                              neighbouring columns
+
+    board_features computes them from scratch, working on every column
+    at once through the row bitmasks. A FeatureTracker attached to an
+    engine board keeps them up to date as the board changes: a locked
+    piece only updates its columns and rows, and a line clear shifts the
+    row statistics and compacts each column's bitmask in place.
+'''
+import collections
+
+Features = collections.namedtuple('Features',
+                                  ['height', 'max_height', 'holes', 'wells',
+                                   'row_transitions', 'column_transitions', 'bumpiness'])
+
+
+def bit_count(mask):
+    ''' Return value: type: int - the number of bits set in mask '''
+    return bin(mask).count('1')
+
+
+def row_transitions(row, width):
+    ''' Return value: type: int
+
+        the occupied/empty changes along the row bitmask row, with
+        occupied walls on both sides, or 0 for an empty row
+    '''
+    if not row:
+        return 0
+    walled = row << 1 | 1 | 1 << width + 1
+    return bit_count((walled ^ walled >> 1) & (1 << width + 1) - 1)
+
+
+def column_stats(column, height):
+    ''' Return value: type: tuple (int, int)
+
+        the height and holes of a column of a board of height rows,
+        given as a bitmask with bit y set for an occupied row y
+    '''
+    if not column:
+        return 0, 0
+    top = height - (column & -column).bit_length() + 1
+    return top, top - bit_count(column)
+
+
+def surface(heights, height):
+    ''' Return value: type: tuple (int, int)
+
+        the wells and bumpiness of a board of height rows
+        whose columns have heights
+    '''
+    wells = 0
+    bumpiness = 0
+    left = height
+    for x, column in enumerate(heights):
+        right = heights[x + 1] if x + 1 < len(heights) else height
+        depth = min(left, right) - column
+        if depth > 0:
+            wells += depth
+        if x + 1 < len(heights):
+            bumpiness += abs(column - right)
+        left = column
+    return wells, bumpiness
+
+
+def board_features(rows, width):
+    ''' Parameters: rows - type: list - the board as row bitmasks, top row first
+        Return value: type: Features
+
+        the features of the board, computed from scratch
+    '''
+    height = len(rows)
+    full = (1 << width) - 1
+    heights = [0] * width
+    holes = 0
+    rows_changes = 0
+    columns_changes = 0
+    seen = 0
+    for y, row in enumerate(rows):
+        # the squares of all the columns are handled together, one bit each
+        holes += bit_count(seen & ~row)
+        new = row & ~seen
+        while new:
+            low = new & -new
+            heights[low.bit_length() - 1] = height - y
+            new ^= low
+        seen |= row
+        rows_changes += row_transitions(row, width)
+        if y + 1 < height:
+            columns_changes += bit_count(row ^ rows[y + 1])
+    if rows:
+        columns_changes += bit_count(full & ~rows[-1])
+    wells, bumpiness = surface(heights, height)
+    return Features(sum(heights), max(heights), holes, wells,
+                    rows_changes, columns_changes, bumpiness)
+
+
+############################################################
+# FEATURE TRACKER CLASS
+############################################################
+class FeatureTracker():
+    ''' FeatureTracker class: the features of an engine board, kept up to date
+        Attributes:
+            width - type: int - width of the board in squares
+            height - type: int - height of the board in squares
+            rows - type: list - the board as row bitmasks, top row first
+            columns - type: list - the board as column bitmasks, bit y of
+            columns[x] set when square x, y is occupied
+            heights - type: list - the height of each column
+            holes - type: list - the holes of each column
+            column_transitions - type: list - the transitions of each column
+            row_transitions - type: list - the transitions of each row
+
+        It attaches itself to the board, whose add_shape and row
+        methods then report every change to it.
+    '''
+
+    def __init__(self, board):
+        self.width = board.width
+        self.height = board.height
+        self.reset(board.rows)
+        board.features = self
+
+    def reset(self, rows):
+        ''' computes everything again for the board rows '''
+        self.rows = list(rows)
+        self.columns = [0] * self.width
+        for y, row in enumerate(self.rows):
+            x = 0
+            while row:
+                if row & 1:
+                    self.columns[x] |= 1 << y
+                row >>= 1
+                x += 1
+        self.heights = [0] * self.width
+        self.holes = [0] * self.width
+        self.column_transitions = [0] * self.width
+        for x in range(self.width):
+            self.update_column(x)
+        self.row_transitions = [row_transitions(row, self.width) for row in self.rows]
+
+    def update_column(self, x):
+        ''' computes the statistics of column x from its bitmask '''
+        column = self.columns[x]
+        self.heights[x], self.holes[x] = column_stats(column, self.height)
+        # the floor is an occupied square below the last row
+        floored = column | 1 << self.height
+        self.column_transitions[x] = bit_count((floored ^ floored >> 1) & (1 << self.height) - 1)
+
+    def add(self, cells):
+        ''' Parameters: cells - type: list - the squares of a locked piece
+
+            updates the columns and rows the piece covers
+        '''
+        rows = self.rows
+        columns = self.columns
+        for x, y in cells:
+            rows[y] |= 1 << x
+            columns[x] |= 1 << y
+        for x in set(x for x, y in cells):
+            self.update_column(x)
+        for y in set(y for x, y in cells):
+            self.row_transitions[y] = row_transitions(rows[y], self.width)
+
+    def clear(self, cleared):
+        ''' Parameters: cleared - type: list - the removed rows, top row first
+
+            the rows above the cleared ones move down with their
+            transitions unchanged; each column loses the bits of the
+            cleared rows and is measured again
+        '''
+        removed = set(cleared)
+        kept = [y for y in range(self.height) if y not in removed]
+        count = len(cleared)
+        self.rows = [0] * count + [self.rows[y] for y in kept]
+        self.row_transitions = [0] * count + [self.row_transitions[y] for y in kept]
+        for x in range(self.width):
+            column = self.columns[x]
+            # every cleared row moves the bits above it one down; going top
+            # down, the rows still to remove keep their bit positions
+            for y in cleared:
+                below = column & ~((1 << y + 1) - 1)
+                column = below | (column & (1 << y) - 1) << 1
+            self.columns[x] = column
+            self.update_column(x)
+
+    def features(self):
+        ''' Return value: type: Features - the features of the board now '''
+        wells, bumpiness = surface(self.heights, self.height)
+        return Features(sum(self.heights), max(self.heights), sum(self.holes), wells,
+                        sum(self.row_transitions), sum(self.column_transitions), bumpiness)
+
+
+def tracker(board):
+    ''' Return value: type: FeatureTracker
+
+        the tracker of the engine board, attaching one if it has none
+    '''
+    if board.features is None:
+        FeatureTracker(board)
+    return board.features
@@ -127,16 +127,27 @@ http://mcsp.wartburg.edu/zelle/python for a quick reference"""
 #     Added Entry boxes.
 
 import time, os, sys
-import Tkinter
-tk = Tkinter
+
+# the Tkinter module, imported by load_tk when the first window or Tk
+# image is made: importing graphics needs no display and does not pay
+# for loading Tk, so the drawing classes can be used without one
+tk = None
+
+def load_tk():
+    """Import Tkinter (tkinter on Python 3) unless it is imported already"""
+    global tk
+    if tk is None:
+        try:
+            import tkinter as tk
+        except ImportError:
+            import Tkinter as tk
+    return tk
 
 
 ##########################################################################
 # Module Exceptions
 
-import exceptions
-
-class GraphicsError(exceptions.Exception):
+class GraphicsError(Exception):
     """Generic error class for graphics module exceptions."""
     #def __init__(self, *args):
         #self.args=args
@@ -152,13 +163,16 @@ BAD_OPTION = "Illegal option value"
 ############################################################################
 # Graphics classes start here
         
-class CanvasFrame(tk.Frame):
+class CanvasFrame:
 
-    """A CanvasFrame is a frame for displaying graphics."""
+    """A CanvasFrame is a frame for displaying graphics: a Tk canvas
+    packed in parent, a Tk widget or a Window."""
 
     def __init__(self, parent, width=200, height=200):
         
-        tk.Frame.__init__(self, parent)
+        load_tk()
+        # a Window is not a Tk widget itself, its root is
+        parent = getattr(parent, 'root', parent)
 
         self.parent = parent
         self.canvas = tk.Canvas(parent, width = width, height = height)
@@ -175,11 +189,27 @@ class CanvasFrame(tk.Frame):
         self._keyboardCallback = None
         self.trans = None
         self.closed = False
+        self.pendingMoves = {}
+        self.movesScheduled = False
         parent.lift()
 
     def __checkOpen(self):
         if self.closed:
-            raise GraphicsError, "window is closed"
+            raise GraphicsError("window is closed")
+
+    def after(self, ms, func, *args):
+        """Call func after ms milliseconds, from the Tk event loop"""
+        return self.canvas.after(ms, func, *args)
+
+    def after_idle(self, func, *args):
+        """Call func when Tk is next idle"""
+        return self.canvas.after_idle(func, *args)
+
+    def update(self):
+        self.canvas.update()
+
+    def update_idletasks(self):
+        self.canvas.update_idletasks()
 
     def setBackground(self, color):
         """Set background color of the window"""
@@ -218,7 +248,45 @@ class CanvasFrame(tk.Frame):
     def flush(self):
         """Update drawing to the window"""        
         self.__checkOpen()
+        self.flushMoves()
         self.update_idletasks()
+
+    def moveTag(self, tag, dx, dy):
+        """Move every canvas item carrying tag by dx, dy screen units.
+        Moves are collected per tag and sent to Tk by flushMoves, which
+        runs once when Tk is next idle, so a frame's worth of moves
+        costs one Tk call per tag."""
+        pending = self.pendingMoves.get(tag)
+        if pending:
+            pending[0] = pending[0] + dx
+            pending[1] = pending[1] + dy
+        else:
+            self.pendingMoves[tag] = [dx, dy]
+        if not self.movesScheduled:
+            self.movesScheduled = True
+            self.after_idle(self.flushMoves)
+
+    def flushTag(self, tag):
+        """Send the move collected for tag to Tk now, before items
+        that must not take it are given the tag"""
+        pending = self.pendingMoves.pop(tag, None)
+        if pending and (pending[0] or pending[1]) and not self.closed:
+            self.canvas.move(tag, pending[0], pending[1])
+
+    def cancelTag(self, tag):
+        """Forget the move collected for tag, for items that are about
+        to be put in place with absolute coordinates"""
+        self.pendingMoves.pop(tag, None)
+
+    def flushMoves(self):
+        """Send the moves collected by moveTag to Tk"""
+        self.movesScheduled = False
+        pending = self.pendingMoves
+        self.pendingMoves = {}
+        if self.closed: return
+        for tag, (dx, dy) in pending.items():
+            if dx or dy:
+                self.canvas.move(tag, dx, dy)
         
     def getMouse(self):
         """Wait for mouse click and return Point object representing
@@ -227,7 +295,7 @@ class CanvasFrame(tk.Frame):
         self.mouseY = None
         while self.mouseX == None or self.mouseY == None:
             self.update()
-            if self.isClosed(): raise GraphicsError, "getMouse in closed window"
+            if self.isClosed(): raise GraphicsError("getMouse in closed window")
             time.sleep(.1) # give up thread
         x,y = self.toWorld(self.mouseX, self.mouseY)
         self.mouseX = None
@@ -238,7 +306,7 @@ class CanvasFrame(tk.Frame):
         """Return last mouse click or None if mouse has
         not been clicked since last call"""
         if self.isClosed():
-            raise GraphicsError, "checkMouse in closed window"
+            raise GraphicsError("checkMouse in closed window")
         self.update()
         if self.mouseX != None and self.mouseY != None:
             x,y = self.toWorld(self.mouseX, self.mouseY)
@@ -352,17 +420,21 @@ class GraphicsObject:
         """Set line weight to width"""
         self._reconfig("width", width)
 
-    def draw(self, canvas_frame):
+    def draw(self, canvas_frame, tag=None):
 
         """Draw the object in CanvasFrame, which should be a CanvasFrame
         object.  A GraphicsObject may only be drawn into one
         window. Raises an error if attempt made to draw an object that
-        is already visible."""
+        is already visible. The canvas item gets the optional tag."""
 
-        if self.canvas_frame and not self.canvas_frame.isClosed(): raise GraphicsError, OBJ_ALREADY_DRAWN
-        if canvas_frame.isClosed(): raise GraphicsError, "Can't draw to closed window"
+        if self.canvas_frame and not self.canvas_frame.isClosed(): raise GraphicsError(OBJ_ALREADY_DRAWN)
+        if canvas_frame.isClosed(): raise GraphicsError("Can't draw to closed window")
         self.canvas_frame = canvas_frame
-        self.id = self._draw(canvas_frame, self.config)
+        options = self.config
+        if tag:
+            options = options.copy()
+            options["tags"] = tag
+        self.id = self._draw(canvas_frame, options)
 
     def undraw(self):
 
@@ -392,12 +464,22 @@ class GraphicsObject:
                 y = dy
             self.canvas_frame.canvas.move(self.id, x, y)
            
+    def setOptions(self, **options):
+        """Set several item options with a single Tk call. Options kept
+        in the object's config are remembered; others, such as
+        state="hidden", are only passed on to Tk."""
+        for option, setting in options.items():
+            if option in self.config:
+                self.config[option] = setting
+        if self.canvas_frame and not self.canvas_frame.isClosed():
+            self.canvas_frame.canvas.itemconfig(self.id, options)
+
     def _reconfig(self, option, setting):
         # Internal method for changing configuration of the object
         # Raises an error if the option does not exist in the config
         #    dictionary for this object
-        if not self.config.has_key(option):
-            raise GraphicsError, UNSUPPORTED_METHOD
+        if option not in self.config:
+            raise GraphicsError(UNSUPPORTED_METHOD)
         options = self.config
         options[option] = setting
         if self.canvas_frame and not self.canvas_frame.isClosed():
@@ -412,6 +494,76 @@ class GraphicsObject:
         """updates internal state of object to move it dx,dy units"""
         pass # must override in subclass
          
+class Group:
+
+    """A Group is a set of GraphicsObjects whose canvas items share a
+    tag, so the whole set is moved or undrawn with a single Tk call.
+    Moves go through CanvasFrame.moveTag and are sent once per frame."""
+
+    count = 0
+
+    def __init__(self, objects=None):
+        Group.count = Group.count + 1
+        self.tag = "group%d" % Group.count
+        self.objects = []
+        self.canvas_frame = None
+        for obj in list(objects or ()):
+            self.add(obj)
+
+    def add(self, obj):
+        """Add obj to the group, tagging its canvas item if it is drawn.
+        A move of the group still waiting for idle time is sent first,
+        as it was made before obj joined."""
+        self.objects.append(obj)
+        canvas_frame = obj.canvas_frame
+        if canvas_frame and not canvas_frame.isClosed():
+            canvas_frame.flushTag(self.tag)
+            canvas_frame.canvas.addtag_withtag(self.tag, obj.id)
+            self.canvas_frame = canvas_frame
+
+    def draw(self, canvas_frame):
+        """Draw every object of the group in canvas_frame"""
+        for obj in self.objects:
+            obj.draw(canvas_frame, self.tag)
+        self.canvas_frame = canvas_frame
+
+    def undraw(self):
+        """Undraw every object of the group with one canvas delete"""
+        canvas_frame = self.canvas_frame
+        if canvas_frame and not canvas_frame.isClosed():
+            canvas_frame.canvas.delete(self.tag)
+        for obj in self.objects:
+            obj.canvas_frame = None
+            obj.id = None
+        self.canvas_frame = None
+
+    def setOptions(self, **options):
+        """Set item options of every object of the group with one canvas
+        call, remembering those kept in the objects' config"""
+        for obj in self.objects:
+            for option, setting in options.items():
+                if option in obj.config:
+                    obj.config[option] = setting
+        canvas_frame = self.canvas_frame
+        if canvas_frame and not canvas_frame.isClosed():
+            canvas_frame.canvas.itemconfig(self.tag, options)
+
+    def move(self, dx, dy):
+        """move every object dx units in x direction and dy units in y
+        direction"""
+        for obj in self.objects:
+            obj._move(dx, dy)
+        canvas_frame = self.canvas_frame
+        if canvas_frame and not canvas_frame.isClosed():
+            trans = canvas_frame.trans
+            if trans:
+                x = dx/ trans.xscale
+                y = -dy / trans.yscale
+            else:
+                x = dx
+                y = dy
+            canvas_frame.moveTag(self.tag, x, y)
+
 class Point(GraphicsObject):
     def __init__(self, x, y):
         GraphicsObject.__init__(self, ["outline", "fill"])
@@ -450,6 +602,16 @@ class _BBox(GraphicsObject):
         self.p2.x = self.p2.x + dx
         self.p2.y = self.p2.y  + dy
                 
+    def setPoints(self, p1, p2):
+        """Move the corners to p1 and p2, reusing the canvas item"""
+        self.p1 = p1.clone()
+        self.p2 = p2.clone()
+        canvas_frame = self.canvas_frame
+        if canvas_frame and not canvas_frame.isClosed():
+            x1,y1 = canvas_frame.toScreen(p1.x,p1.y)
+            x2,y2 = canvas_frame.toScreen(p2.x,p2.y)
+            canvas_frame.canvas.coords(self.id, x1, y1, x2, y2)
+
     def getP1(self): return self.p1.clone()
 
     def getP2(self): return self.p2.clone()
@@ -530,7 +692,7 @@ class Line(_BBox):
         
     def setArrow(self, option):
         if not option in ["first","last","both","none"]:
-            raise GraphicsError, BAD_OPTION
+            raise GraphicsError(BAD_OPTION)
         self._reconfig("arrow", option)
         
 
@@ -538,31 +700,31 @@ class Polygon(GraphicsObject):
     
     def __init__(self, *points):
         # if points passed as a list, extract it
-        if len(points) == 1 and type(points[0] == type([])):
+        if len(points) == 1 and isinstance(points[0], list):
             points = points[0]
-        self.points = map(Point.clone, points)
+        self.points = [p.clone() for p in points]
         GraphicsObject.__init__(self, ["outline", "width", "fill"])
         
     def clone(self):
-        other = apply(Polygon, self.points)
+        other = Polygon(*self.points)
         other.config = self.config.copy()
         return other
 
     def getPoints(self):
-        return map(Point.clone, self.points)
+        return [p.clone() for p in self.points]
 
     def _move(self, dx, dy):
         for p in self.points:
             p.move(dx,dy)
    
     def _draw(self, canvas_frame, options):
-        args = [canvas_frame.canvas]
+        args = []
         for p in self.points:
             x,y = canvas_frame.toScreen(p.x,p.y)
             args.append(x)
             args.append(y)
         args.append(options)
-        return apply(tk.Canvas.create_polygon, args) 
+        return canvas_frame.canvas.create_polygon(*args)
 
 class Text(GraphicsObject):
     
@@ -600,22 +762,19 @@ class Text(GraphicsObject):
                 f,s,b = self.config['font']
                 self._reconfig("font",(face,s,b))
             else:
-                raise GraphicsError, BAD_OPTION
-
+                raise GraphicsError(BAD_OPTION)
         def setSize(self, size):
             if 5 <= size <= 72:
                 f,s,b = self.config['font']
                 self._reconfig("font", (f,size,b))
             else:
-                raise GraphicsError, BAD_OPTION
-
+                raise GraphicsError(BAD_OPTION)
         def setStyle(self, style):
             if style in ['bold','normal','italic', 'bold italic']:
                 f,s,b = self.config['font']
                 self._reconfig("font", (f,s,style))
             else:
-                raise GraphicsError, BAD_OPTION
-
+                raise GraphicsError(BAD_OPTION)
         def setTextColor(self, color):
             #self.config['fg'] = color;
             self.setFill(color)
@@ -625,6 +784,7 @@ class Entry(GraphicsObject):
 
     def __init__(self, canvas_frame, p, width):
         GraphicsObject.__init__(self, [])
+        load_tk()
         self.anchor = p.clone()
         #print self.anchor
         self.width = width
@@ -688,20 +848,17 @@ class Entry(GraphicsObject):
         if face in ['helvetica','arial','courier','times roman']:
             self._setFontComponent(0, face)
         else:
-            raise GraphicsError, BAD_OPTION
-
+            raise GraphicsError(BAD_OPTION)
     def setSize(self, size):
         if 5 <= size <= 36:
             self._setFontComponent(1,size)
         else:
-            raise GraphicsError, BAD_OPTION
-
+            raise GraphicsError(BAD_OPTION)
     def setStyle(self, style):
         if style in ['bold','normal','italic', 'bold italic']:
             self._setFontComponent(2,style)
         else:
-            raise GraphicsError, BAD_OPTION
-
+            raise GraphicsError(BAD_OPTION)
     def setTextColor(self, color):
         self.color=color
         if self.entry:
@@ -715,6 +872,7 @@ class Image(GraphicsObject):
     
     def __init__(self, p, pixmap):
         GraphicsObject.__init__(self, [])
+        load_tk()
         self.anchor = p.clone()
         self.imageId = Image.idCount
         Image.idCount = Image.idCount + 1
@@ -760,6 +918,7 @@ class Pixmap:
     """
 
     def __init__(self, *args):
+        load_tk()
         if len(args) == 1: # a file name or pixmap
             if type(args[0]) == type(""):
                 self.image = tk.PhotoImage( file=args[0], master=_root)
@@ -788,14 +947,14 @@ class Pixmap:
         if type(value) ==  int:
             return [value, value, value]
         else:
-            return map(int, value.split()) 
+            return [int(v) for v in value.split()]
 
-    def setPixel(self, x, y, (r,g,b)):
-        """Sets pixel (x,y) to the color given by RGB values r, g, and b.
+    def setPixel(self, x, y, rgb):
+        """Sets pixel (x,y) to the color given by RGB values rgb = (r, g, b).
         r,g,b should be in range(256)
 
         """
-        
+        r, g, b = rgb
         self.image.put( "{%s}"%color_rgb(r,g,b), (x, y))
 
     def clone(self):
@@ -820,7 +979,7 @@ def color_rgb(r,g,b):
 
 class GraphWin(CanvasFrame):
     def __init__(self, title, width=200, height=200):
-        self.root = tk.Tk()
+        self.root = load_tk().Tk()
         self.root.title(title)
         CanvasFrame.__init__(self, self.root, width, height)
         self.root.protocol("WM_DELETE_WINDOW", self.__close_help)
@@ -833,16 +992,25 @@ class GraphWin(CanvasFrame):
         """Close the window"""        
         self.root.destroy()
 
-class Window(tk.Tk):
+class Window:
+    """A top level window the CanvasFrames are packed in. The Tk root
+    is only made, and Tk loaded, when the Window is; every method of
+    the root (after, bind_all, mainloop ...) can be called on it."""
+
     def __init__(self, title):
-        tk.Tk.__init__(self)
-        self.title(title)
-        self.config(bg = "dark gray")
-        self.protocol("WM_DELETE_WINDOW", self.__close_help)
+        self.root = load_tk().Tk()
+        self.root.title(title)
+        self.root.config(bg = "dark gray")
+        self.root.protocol("WM_DELETE_WINDOW", self.__close_help)
+
+    def __getattr__(self, name):
+        if name == 'root':
+            raise AttributeError(name)
+        return getattr(self.root, name)
 
     def __close_help(self):
         """Close the window"""        
-        self.destroy()
+        self.root.destroy()
 
         
 def test():
@@ -0,0 +1,93 @@
+''' Fixed timestep scheduling for the game loop.
+
+    The game logic runs in ticks of a fixed length, counted against a
+    monotonic clock: tick n is due at start + n * step, whatever time the
+    previous ticks took, so the work done in a tick and the lateness of
+    the Tk timer do not add up to drift. Ticks missed while the loop was
+    busy are run on the next wake up, up to a limit. Gravity counts the
+    ticks and drops the piece once every delay ms of them.
+
+    The clock is a function returning seconds and can be replaced,
+    e.g. by a fake clock in tests.
+'''
+import math
+import time
+
+# time.monotonic where there is one (Python 3), time.time otherwise
+monotonic = getattr(time, 'monotonic', time.time)
+
+
+############################################################
+# FIXED TIMESTEP CLASS
+############################################################
+class FixedTimestep():
+    ''' FixedTimestep class: counts the logic ticks that are due
+        Attributes:
+            step - type: int - the length of a tick in ms
+            clock - type: function - returns the time in seconds
+            max_ticks - type: int - the most ticks run on one wake up;
+            a longer backlog is skipped rather than run
+            start - type: float - the time of tick 0
+            ticks - type: int - the ticks run or skipped so far
+            skipped - type: int - the ticks skipped so far
+    '''
+
+    def __init__(self, step, clock=monotonic, max_ticks=40):
+        self.step = step
+        self.clock = clock
+        self.max_ticks = max_ticks
+        self.skipped = 0
+        self.reset()
+
+    def reset(self):
+        ''' starts counting ticks from now '''
+        self.start = self.clock()
+        self.ticks = 0
+
+    def due(self):
+        ''' Return value: type: int
+
+            the number of ticks whose time has come since the last call
+        '''
+        elapsed = int(self.elapsed() // self.step)
+        count = elapsed - self.ticks
+        if count > self.max_ticks:
+            self.skipped += count - self.max_ticks
+            count = self.max_ticks
+        self.ticks = elapsed
+        return max(count, 0)
+
+    def elapsed(self):
+        ''' Return value: type: float
+
+            ms since tick 0, rounded to a ns so that the error of
+            the float seconds does not move a tick by a ms
+        '''
+        return round((self.clock() - self.start) * 1000, 6)
+
+    def wait(self):
+        ''' Return value: type: int - ms until the next tick is due '''
+        return max(0, int(math.ceil((self.ticks + 1) * self.step - self.elapsed())))
+
+
+############################################################
+# GRAVITY CLASS
+############################################################
+class Gravity():
+    ''' Gravity class: turns elapsed game time into drops
+        Attributes:
+            elapsed - type: int - ms since the last drop
+    '''
+
+    def __init__(self):
+        self.elapsed = 0
+
+    def advance(self, ms, delay):
+        ''' Parameters: ms - type: int - game time that passed
+                        delay - type: int - ms between drops at the current level
+            Return value: type: int - the number of drops due
+        '''
+        self.elapsed += ms
+        drops = self.elapsed // delay
+        self.elapsed -= drops * delay
+        return drops
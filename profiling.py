@@ -0,0 +1,177 @@
+''' Optional profiling of the game's hot paths.
+
+    enable() replaces the methods it is given by wrappers that count the
+    calls and keep a histogram of their times, in power of two buckets
+    of microseconds; disable() puts the methods back. Nothing is wrapped
+    until enable is called, so a game that does not profile runs the
+    plain methods and pays nothing.
+
+    The numbers can be watched while playing with an Overlay, and are
+    written to a JSON file when the program exits.
+
+        TETRIS_PROFILE=profile.json python tetris.py
+'''
+from __future__ import print_function
+import atexit
+import time
+
+# the most precise clock there is, time.time on Python 2
+timer = getattr(time, 'perf_counter', time.time)
+
+# the Stats of every wrapped method, by name
+STATS = {}
+# (class, method name, original function) of every wrapped method
+WRAPPED = []
+# the file the stats are written to at exit, None for none
+DUMP_PATH = None
+# whether dump_at_exit is registered with atexit
+HOOKED = False
+
+
+############################################################
+# STATS CLASS
+############################################################
+class Stats():
+    ''' Stats class: the calls of one method
+        Attributes:
+            count - type: int - number of calls
+            total - type: float - seconds spent in them
+            largest - type: float - seconds of the longest
+            buckets - type: list - buckets[k] counts the calls that took
+            less than 2**k microseconds, and at least half that
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.largest = 0.0
+        self.buckets = [0] * 32
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.largest:
+            self.largest = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), 31)] += 1
+
+    def mean(self):
+        ''' Return value: type: float - mean time of a call in microseconds '''
+        return self.total / self.count * 1e6 if self.count else 0.0
+
+    def as_dict(self):
+        return {'count': self.count,
+                'total_ms': self.total * 1e3,
+                'mean_us': self.mean(),
+                'max_us': self.largest * 1e6,
+                'histogram_us': dict(('<%d' % (1 << k), n)
+                                     for k, n in enumerate(self.buckets) if n)}
+
+
+def wrap(func, stats):
+    ''' Return value: type: function - func, timed into stats '''
+    def timed(*args, **kwargs):
+        start = timer()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.add(timer() - start)
+    timed.__name__ = func.__name__
+    timed.__doc__ = func.__doc__
+    return timed
+
+
+def enable(targets, dump_path=None):
+    ''' Parameters: targets - type: list - (class, method name) pairs
+                    dump_path - type: str - file to write the stats to at exit
+
+            wraps every target that is not wrapped yet. A method a
+            class inherits is wrapped on that class only. The stats are
+            written once at exit, to the last dump_path given.
+    '''
+    global DUMP_PATH, HOOKED
+    for cls, name in targets:
+        if any(wrapped_cls is cls and wrapped_name == name
+               for wrapped_cls, wrapped_name, func in WRAPPED):
+            continue
+        func = getattr(cls, name)
+        func = getattr(func, '__func__', func)
+        label = '%s.%s' % (cls.__name__, name)
+        stats = STATS.setdefault(label, Stats())
+        WRAPPED.append((cls, name, cls.__dict__.get(name)))
+        setattr(cls, name, wrap(func, stats))
+    if dump_path is not None:
+        DUMP_PATH = dump_path
+        if not HOOKED:
+            atexit.register(dump_at_exit)
+            HOOKED = True
+
+
+def disable():
+    ''' puts back every wrapped method, and writes no stats at exit '''
+    global DUMP_PATH, HOOKED
+    DUMP_PATH = None
+    if HOOKED and hasattr(atexit, 'unregister'):
+        # Python 2 has no unregister: the hook stays, with nothing to write
+        atexit.unregister(dump_at_exit)
+        HOOKED = False
+    while WRAPPED:
+        cls, name, func = WRAPPED.pop()
+        if func is None:
+            delattr(cls, name)
+        else:
+            setattr(cls, name, func)
+
+
+def report(limit=None):
+    ''' Return value: type: list
+
+        (name, Stats) of the wrapped methods that were called,
+        the most time first
+    '''
+    stats = sorted([item for item in STATS.items() if item[1].count],
+                   key=lambda item: -item[1].total)
+    return stats[:limit]
+
+
+def dump_at_exit():
+    ''' writes the stats to DUMP_PATH, if there is one '''
+    if DUMP_PATH is not None:
+        dump(DUMP_PATH)
+
+
+def dump(path):
+    ''' writes the stats of every method to path as JSON '''
+    import json
+    with open(path, 'w') as f:
+        json.dump(dict((name, stats.as_dict()) for name, stats in STATS.items()),
+                  f, indent=2, sort_keys=True)
+
+
+############################################################
+# OVERLAY CLASS
+############################################################
+class Overlay():
+    ''' Overlay class: the stats drawn over a canvas, updated every period ms
+        Attributes:
+            canvas - type: CanvasFrame - the canvas it is drawn on
+            text - type: Text - the lines of stats
+            period - type: int - ms between updates
+            lines - type: int - the methods shown, the slowest in total first
+    '''
+
+    def __init__(self, canvas, period=500, lines=8):
+        from graphics import Point, Text
+        self.canvas = canvas
+        self.period = period
+        self.lines = lines
+        self.text = Text(Point(canvas.width / 2, 12 * lines), '')
+        self.text.setFace('courier')
+        self.text.setSize(9)
+        self.text.draw(canvas)
+        self.update()
+
+    def update(self):
+        lines = ['%-28s %7d %9.1fus' % (name, stats.count, stats.mean())
+                 for name, stats in report(self.lines)]
+        self.text.setText('\n'.join(lines))
+        self.canvas.after(self.period, self.update)
@@ -0,0 +1,242 @@
+''' Binary replay logs of tetris games.
+
+    A log is a header followed by events, and is only ever appended to:
+
+        header: MAGIC, VERSION byte, then width, height and seed as varints
+        event:  one opcode byte, then the ms since the previous event as a varint
+
+    The opcodes are the inputs (LEFT, RIGHT, DOWN, ROTATE, DROP), the
+    GRAVITY ticks, and SPAWN + kind every time the game draws a piece
+    kind. An event takes two bytes unless more than 127 ms passed since
+    the previous one. The recorder writes every event as it happens, so
+    the log of a session that crashed is still a readable prefix.
+
+    Replaying feeds the recorded kinds to engine.Game in place of its
+    random generator and applies the inputs and gravity ticks in order,
+    without any display or waiting.
+'''
+from __future__ import print_function
+import random
+import time
+
+import engine
+
+MAGIC = b'TTRP'
+VERSION = 1
+
+GRAVITY, LEFT, RIGHT, DOWN, ROTATE, DROP = range(6)
+SPAWN = 8
+
+# the opcode of each key of Tetris.key_pressed
+KEYS = {'Left': LEFT, 'Right': RIGHT, 'Down': DOWN, 'Up': ROTATE, 'space': DROP}
+
+
+def write_varint(buf, value):
+    ''' appends value to the bytearray buf, seven bits a byte,
+        low bits first, with the top bit set on all but the last byte
+    '''
+    while value > 0x7f:
+        buf.append(value & 0x7f | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def read_varint(data, offset):
+    ''' Return value: type: tuple (int, int)
+
+        the varint at offset of the bytearray data and the offset after it.
+        Raises EOFError if data ends inside it.
+    '''
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise EOFError("replay log ends inside a number")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+############################################################
+# RECORDER CLASS
+############################################################
+class Recorder():
+    ''' Recorder class: writes the log of one game
+        It is also the game's piece generator, so every kind the game
+        draws is logged: pass it to engine.Game as generator.
+        Attributes:
+            out - type: file - the binary file the log is written to
+            seed - type: int - the seed of the piece generator
+            random - type: random.Random - the piece generator
+            clock - type: function - returns the time in seconds
+            last - type: int - the time of the last event in ms
+    '''
+
+    def __init__(self, out, width, height, seed=None, clock=time.time):
+        if seed is None:
+            seed = random.randrange(1 << 32)
+        self.out = out
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.clock = clock
+        self.last = int(clock() * 1000)
+        header = bytearray(MAGIC)
+        header.append(VERSION)
+        write_varint(header, width)
+        write_varint(header, height)
+        write_varint(header, seed)
+        self.write(header)
+
+    def write(self, buf):
+        self.out.write(bytes(buf))
+        self.out.flush()
+
+    def event(self, opcode):
+        ''' logs opcode with the time since the previous event '''
+        now = int(self.clock() * 1000)
+        buf = bytearray([opcode])
+        write_varint(buf, max(0, now - self.last))
+        self.last = now
+        self.write(buf)
+
+    def randint(self, a, b):
+        ''' draws a piece kind and logs its spawn '''
+        kind = self.random.randint(a, b)
+        self.event(SPAWN + kind)
+        return kind
+
+    def close(self):
+        self.out.close()
+
+
+############################################################
+# READING AND REPLAYING
+############################################################
+def read_header(data):
+    ''' Parameters: data - type: bytearray - a replay log
+        Return value: type: tuple (int, int, int, int)
+
+        the width, height and seed of the game and the offset
+        of the first event. Raises EOFError if data ends inside it.
+    '''
+    if len(data) <= len(MAGIC) and MAGIC.startswith(bytes(data)):
+        raise EOFError("replay log ends inside its header")
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError("not a replay log")
+    if data[len(MAGIC)] != VERSION:
+        raise ValueError("unknown replay log version %d" % data[len(MAGIC)])
+    offset = len(MAGIC) + 1
+    width, offset = read_varint(data, offset)
+    height, offset = read_varint(data, offset)
+    seed, offset = read_varint(data, offset)
+    return width, height, seed, offset
+
+
+def read_events(data, offset, ms=0):
+    ''' yields (opcode, ms, offset) for every whole event of the log
+        data from offset on: ms is the time of the event, counted from
+        ms at offset, and offset is where the event after it starts.
+        A last event cut short is ignored.
+    '''
+    end = len(data)
+    while offset < end:
+        opcode = data[offset]
+        try:
+            delta, offset = read_varint(data, offset + 1)
+        except EOFError:
+            return
+        ms += delta
+        yield opcode, ms, offset
+
+
+class Spawns():
+    ''' Spawns class: a piece generator that hands out the kinds
+        recorded in a log, in order
+    '''
+
+    def __init__(self, data, offset):
+        self.events = read_events(data, offset)
+
+    def randint(self, a, b):
+        for opcode, ms, offset in self.events:
+            if opcode >= SPAWN:
+                return opcode - SPAWN
+        raise EOFError("replay log has no more spawns")
+
+
+def generator(seed, draws):
+    ''' Return value: type: random.Random
+
+        the piece generator of a Recorder of seed, once it
+        has drawn draws kinds
+    '''
+    generator = random.Random(seed)
+    for i in range(draws):
+        generator.randint(0, len(engine.SHAPE_OFFSETS) - 1)
+    return generator
+
+
+def load(path):
+    ''' Return value: type: bytearray - the replay log in the file path '''
+    with open(path, 'rb') as f:
+        return bytearray(f.read())
+
+
+def play(game, opcode):
+    ''' applies the input or gravity tick opcode to game;
+        spawns are left to the game's generator
+    '''
+    if opcode == GRAVITY or opcode == DOWN:
+        game.do_move('Down')
+    elif opcode == LEFT:
+        game.do_move('Left')
+    elif opcode == RIGHT:
+        game.do_move('Right')
+    elif opcode == ROTATE:
+        game.do_rotate()
+    elif opcode == DROP:
+        game.hard_drop()
+
+
+def replay(data, board_class=engine.BitBoard):
+    ''' Parameters: data - type: bytearray - a replay log
+        Return value: type: engine.Game
+
+        replays the log and returns the game in its final position.
+        A log that ends while a piece was locking leaves that piece
+        on the board without a new one; one that ends before the
+        first two spawns has no game, and returns None.
+    '''
+    try:
+        width, height, seed, offset = read_header(data)
+        game = engine.Game(width, height, board_class=board_class,
+                           generator=Spawns(data, offset))
+    except EOFError:
+        return None
+    try:
+        for opcode, ms, offset in read_events(data, offset):
+            play(game, opcode)
+    except EOFError:
+        pass
+    return game
+
+
+def main():
+    import sys
+    for path in sys.argv[1:]:
+        start = time.time()
+        data = load(path)
+        game = replay(data)
+        if game is None:
+            print('%s: %d bytes, ends before the first piece' % (path, len(data)))
+            continue
+        print('%s: %d bytes, %d pieces, score %d, level %d%s in %.2fs'
+              % (path, len(data), game.pieces, game.score.your_score, game.score.level,
+                 ', game over' if game.over else '', time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+''' High score store for the tetris game.
+
+    Every finished game is kept in a small sqlite database, with indexes
+    on the score and on (player, score), so the best score, a player's
+    top games and the rank of a score are index seeks that do not slow
+    down as the history grows. Each update runs in its own immediate
+    transaction, so several games on one host can write to the same
+    database without losing each other's scores.
+
+    The single score of the old highscore.txt file is imported the
+    first time a database is opened next to it.
+'''
+import sqlite3
+import time
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    played REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score);
+CREATE INDEX IF NOT EXISTS scores_by_player ON scores (player, score);
+CREATE TABLE IF NOT EXISTS score_ranks (
+    score INTEGER PRIMARY KEY,
+    games INTEGER NOT NULL,
+    better INTEGER NOT NULL
+);
+DROP TABLE IF EXISTS score_counts;
+CREATE TABLE IF NOT EXISTS imports (
+    path TEXT PRIMARY KEY
+);
+'''
+
+
+def default_player():
+    ''' Return value: type: str - the name of the logged in user '''
+    import getpass
+    try:
+        return getpass.getuser()
+    except Exception:
+        return 'player'
+
+
+############################################################
+# SCORE STORE CLASS
+############################################################
+class ScoreStore():
+    ''' ScoreStore class: the scores of all the games played on this host
+        Attributes:
+            db - type: sqlite3.Connection - the database, in autocommit
+            mode: every update opens its own transaction
+    '''
+
+    def __init__(self, path='scores.db', legacy='highscore.txt', timeout=10.0):
+        self.db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        try:
+            # readers do not wait for writers with a write-ahead log
+            self.db.execute('PRAGMA journal_mode=WAL')
+        except sqlite3.DatabaseError:
+            pass
+        # created under the write lock, as other games may be creating it too
+        self.transaction(self.create)
+        if legacy is not None:
+            self.import_file(legacy)
+
+    def transaction(self, updates):
+        ''' Parameters: updates - type: function - takes the cursor and
+                        makes the changes
+
+            runs updates in one transaction that holds the write lock
+            from its start, so concurrent writers go one after the other
+        '''
+        cursor = self.db.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            result = updates(cursor)
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        cursor.execute('COMMIT')
+        return result
+
+    def create(self, cursor):
+        for statement in SCHEMA.split(';'):
+            cursor.execute(statement)
+        # a database from before score_ranks has its scores counted once
+        cursor.execute('SELECT 1 FROM score_ranks LIMIT 1')
+        if cursor.fetchone() is None:
+            cursor.execute('INSERT INTO score_ranks (score, games, better) '
+                           'SELECT score, COUNT(*), (SELECT COUNT(*) FROM scores AS b '
+                           'WHERE b.score > a.score) FROM scores AS a GROUP BY score')
+
+    def insert(self, cursor, player, score, level, played):
+        cursor.execute('INSERT INTO scores (player, score, level, played) VALUES (?, ?, ?, ?)',
+                       (player, score, level, played))
+        cursor.execute('UPDATE score_ranks SET games = games + 1 WHERE score = ?', (score,))
+        if cursor.rowcount == 0:
+            cursor.execute('INSERT INTO score_ranks (score, games, better) VALUES (?, 1, ?)',
+                           (score, self.better(cursor, score)))
+        cursor.execute('UPDATE score_ranks SET better = better + 1 WHERE score < ?', (score,))
+
+    def better(self, cursor, score):
+        ''' Return value: type: int - the number of games with a better score
+
+            one seek of the score_ranks key: the next better score
+            counts the games above it and its own
+        '''
+        cursor.execute('SELECT better + games FROM score_ranks WHERE score > ? '
+                       'ORDER BY score LIMIT 1', (score,))
+        row = cursor.fetchone()
+        return row[0] if row is not None else 0
+
+    def add(self, score, level=1, player=None, played=None):
+        ''' Parameters: score - type: int - rows cleared in the game
+                        level - type: int - the level it ended on
+                        player - type: str - default the logged in user
+                        played - type: float - when it ended, default now
+
+            records a finished game
+        '''
+        if player is None:
+            player = default_player()
+        if played is None:
+            played = time.time()
+        self.transaction(lambda cursor: self.insert(cursor, player, score, level, played))
+
+    def import_file(self, path):
+        ''' imports the score of an old highscore.txt file once;
+            a missing, empty or unreadable file imports nothing
+        '''
+        try:
+            with open(path) as f:
+                text = f.read().strip()
+        except IOError:
+            return
+        def updates(cursor):
+            cursor.execute('SELECT 1 FROM imports WHERE path = ?', (path,))
+            if cursor.fetchone() is not None:
+                return
+            cursor.execute('INSERT INTO imports (path) VALUES (?)', (path,))
+            if text.isdigit():
+                self.insert(cursor, default_player(), int(text), 1, time.time())
+        self.transaction(updates)
+
+    def high_score(self):
+        ''' Return value: type: int - the best score, 0 if there is none '''
+        row = self.db.execute('SELECT MAX(score) FROM scores').fetchone()
+        return row[0] or 0
+
+    def top(self, count=10, player=None):
+        ''' Return value: type: list
+
+            the best count games as (player, score, level, played),
+            of player only if given, best first
+        '''
+        if player is None:
+            return self.db.execute('SELECT player, score, level, played FROM scores '
+                                   'ORDER BY score DESC LIMIT ?', (count,)).fetchall()
+        return self.db.execute('SELECT player, score, level, played FROM scores '
+                               'WHERE player = ? ORDER BY score DESC LIMIT ?',
+                               (player, count)).fetchall()
+
+    def rank(self, score):
+        ''' Return value: type: int
+
+            the place score takes among all the games: 1 plus the number
+            of games with a better score. Every distinct score keeps the
+            count of the games above it, so this is a single seek; adding
+            a game updates the counts of the scores below it instead.
+        '''
+        return self.better(self.db.cursor(), score) + 1
+
+    def close(self):
+        self.db.close()
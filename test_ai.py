@@ -0,0 +1,145 @@
+''' Tests of the players: the parallel search against the serial one,
+    and the beam planner cut short by its budget on a fake clock.
+
+        python -m unittest test_ai
+'''
+import unittest
+
+import ai
+import engine
+
+
+class TickingClock():
+    ''' TickingClock class: a clock that moves on by tick seconds
+        every time it is read
+    '''
+
+    def __init__(self, tick):
+        self.tick = tick
+        self.now = 100.0
+
+    def __call__(self):
+        self.now += self.tick
+        return self.now
+
+
+class Key():
+    ''' Key class: a key event of keysym '''
+
+    def __init__(self, keysym):
+        self.keysym = keysym
+
+
+def positions(seed, count=12):
+    ''' yields (rows, width, piece, next_kind) of count positions
+        of a seeded game played by a Player
+    '''
+    player = ai.Player()
+    game = engine.Game(10, 20, seed=seed)
+    while not game.over and game.pieces < count:
+        yield list(game.board.rows), game.width, game.current_piece, game.next_kind
+        player.play(game)
+
+
+def legal(rows, width, piece):
+    ''' Return value: type: list - the moves of every placement of piece '''
+    return [moves for moves, board, lines in
+            ai.placements(rows, width, piece.kind, piece.orientation, piece.x, piece.y)]
+
+
+class ParallelPlayerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parallel = ai.ParallelPlayer(workers=2, chunk=3)
+        self.addCleanup(self.parallel.close)
+
+    def test_matches_player_without_deadline(self):
+        player = ai.Player()
+        for seed in range(2):
+            for rows, width, piece, next_kind in positions(seed):
+                self.assertEqual(self.parallel.choose(rows, width, piece, next_kind),
+                                 player.choose(rows, width, piece, next_kind))
+                self.assertEqual(self.parallel.choose(rows, width, piece),
+                                 player.choose(rows, width, piece))
+        self.assertEqual(self.parallel.timeouts, 0)
+
+    def test_tiny_deadline_still_places(self):
+        for rows, width, piece, next_kind in positions(4):
+            moves = self.parallel.choose(rows, width, piece, next_kind, deadline=1e-9)
+            self.assertIn(moves, legal(rows, width, piece))
+        self.assertTrue(self.parallel.timeouts > 0)
+
+    def test_nowhere_to_go(self):
+        rows = [(1 << 10) - 1] * 20
+        piece = engine.Piece(0, 5, 0)
+        self.assertEqual(self.parallel.choose(rows, 10, piece, 1), None)
+
+
+class BeamPlannerTest(unittest.TestCase):
+
+    def test_without_budget_ends_on_the_player_choice(self):
+        player = ai.Player()
+        planner = ai.BeamPlanner(player, beam=100)
+        for rows, width, piece, next_kind in positions(5):
+            planner.start(rows, width, piece, [next_kind])
+            self.assertTrue(planner.step())
+            self.assertEqual(planner.best, player.choose(rows, width, piece, next_kind))
+
+    def test_budget_cuts_the_plan_short(self):
+        # 1 ms a clock read: a 40 ms plan of five previews stops in the
+        # middle of a level with the best of the level before it
+        for rows, width, piece, next_kind in positions(6):
+            clock = TickingClock(0.001)
+            planner = ai.BeamPlanner(beam=6, clock=clock)
+            planner.start(rows, width, piece, [next_kind, 0, 3, 5, 6], 0.04)
+            moves = legal(rows, width, piece)
+            self.assertIn(planner.best, moves)
+            slices = 0
+            while not planner.step(clock() + 0.005):
+                slices += 1
+                self.assertIn(planner.best, moves)
+            self.assertIn(planner.best, moves)
+            self.assertTrue(planner.kinds)
+            self.assertTrue(planner.deadline <= clock.now < planner.deadline + 0.002)
+            self.assertTrue(slices > 3)
+
+    def test_plan_slices_in_the_event_loop(self):
+        import bench
+        clock = TickingClock(0.001)
+        window = bench.VirtualWindow()
+        game = bench.virtual(bench.tetris.Tetris, window, clock=clock, seed=2,
+                             store=bench.scores.ScoreStore(':memory:', legacy=None))
+        window.timers = []
+        game.player = ai.BeamPlanner(beam=100, clock=clock)
+        game.player.BUDGET = 0.02
+        game.plan()
+        piece = game.game.current_piece
+        moves = legal(game.game.board.rows, game.width, piece)
+        slices = 0
+        while window.timers:
+            # one chain of slices, each coming back after 1 ms
+            self.assertEqual(window.timers, [(1, game.plan_slice)])
+            self.assertIn(game.player.best, moves)
+            window.timers.pop()[1]()
+            slices += 1
+        self.assertTrue(slices > 2)
+        self.assertTrue(game.player.done and game.player.kinds)
+        self.assertEqual(game.plan_after, None)
+        self.assertIn(game.player.best, moves)
+        self.assertEqual(game.player.key, game.plan_key())
+        # the plan is played, and a new one starts for the next piece
+        pieces = game.game.pieces
+        game.autoplay()
+        self.assertEqual(game.game.pieces, pieces + 1)
+        self.assertEqual(window.timers, [(1, game.plan_slice)])
+        # turning autoplay off stops the slices
+        game.key_pressed(Key('A'))
+        self.assertEqual(game.player, None)
+        self.assertEqual(window.timers, [])
+        self.assertEqual(game.plan_after, None)
+        game.plan_slice()
+        self.assertEqual(window.timers, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+''' Tests of the replay archives: seeking to a piece restores the same
+    position as replaying the log from its start.
+
+        python -m unittest test_archive
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+import archive
+import engine
+import replay
+from test_replay import record_game
+
+
+def linear(log, pieces):
+    ''' Return value: type: engine.Game
+
+        the game of log replayed from its start until pieces pieces
+        have locked, or to its end
+    '''
+    width, height, seed, offset = replay.read_header(log)
+    game = engine.Game(width, height, board_class=engine.BitBoard,
+                       generator=replay.Spawns(log, offset))
+    try:
+        for opcode, ms, offset in replay.read_events(log, offset):
+            if game.pieces >= pieces:
+                break
+            replay.play(game, opcode)
+    except EOFError:
+        pass
+    return game
+
+
+def position(game):
+    ''' Return value: type: tuple - the fields of a snapshot of game '''
+    snapshot = game.snapshot()
+    return tuple(getattr(snapshot, name) for name in engine.Snapshot.__slots__)
+
+
+class ArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'games.ttra')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def pack(self, logs, every):
+        writer = archive.Writer(self.path, every)
+        for log in logs:
+            writer.add(log)
+        writer.close()
+        packed = archive.Archive(self.path)
+        self.addCleanup(packed.close)
+        return packed
+
+    def test_seek_matches_linear_replay(self):
+        # the start, pieces before the first keyframe after it, pieces
+        # on and between keyframes, and pieces past the end of the game
+        logs = [record_game(seed)[0] for seed in range(5)]
+        packed = self.pack(logs, every=5)
+        self.assertEqual(len(packed), len(logs))
+        for number, log in enumerate(logs):
+            self.assertEqual(bytes(bytearray(packed.log(number)[:])), bytes(log))
+            total = replay.replay(log).pieces
+            for pieces in range(total + 4):
+                game = packed.seek(number, pieces)
+                expected = linear(log, pieces)
+                self.assertEqual(position(game), position(expected), (number, pieces))
+                found = packed.keyframe(number, pieces)[0]
+                self.assertTrue(found <= pieces and found % 5 == 0)
+                # the seeked game goes on with the pieces the recorder drew
+                if not game.over and expected.pieces < total:
+                    game.hard_drop()
+                    expected.hard_drop()
+                    self.assertEqual((game.over, game.next_kind),
+                                     (expected.over, expected.next_kind))
+            self.assertRaises(ValueError, packed.seek, number, -1)
+        self.assertRaises(IndexError, packed.seek, len(logs), 0)
+
+    def test_logs_without_inputs_and_cut_logs(self):
+        log = record_game(3)[0]
+        start = record_game(3, steps=0)[0]
+        cut = log[:len(log) * 2 // 3]
+        packed = self.pack([start, cut, log], every=4)
+        self.assertEqual(position(packed.seek(0, 5)), position(linear(start, 5)))
+        for pieces in range(0, linear(cut, 1000).pieces + 2):
+            self.assertEqual(position(packed.seek(1, pieces)), position(linear(cut, pieces)))
+            self.assertEqual(position(packed.seek(2, pieces)), position(linear(log, pieces)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+''' Tests of the NumPy batch engine against engine.Game, game by game.
+
+        python -m unittest test_batch
+'''
+import random
+import unittest
+
+import ai
+import engine
+
+try:
+    import numpy as np
+    import batch
+except ImportError:
+    np = None
+
+
+class Kinds():
+    ''' Kinds class: a piece generator handing out the kinds it is given '''
+
+    def __init__(self, kinds):
+        self.kinds = list(kinds)
+
+    def randint(self, a, b):
+        return self.kinds.pop(0)
+
+
+@unittest.skipIf(np is None, "requires numpy")
+class BatchTest(unittest.TestCase):
+
+    def check(self, games, batch_game):
+        for i, game in enumerate(games):
+            rows = [int(sum(1 << x for x in np.flatnonzero(row)))
+                    for row in batch_game.boards[i]]
+            self.assertEqual(game.board.rows, rows)
+            self.assertEqual(game.over, batch_game.over[i])
+            self.assertEqual(game.pieces, batch_game.pieces[i])
+            self.assertEqual(game.score.your_score, batch_game.score[i])
+            self.assertEqual(game.score.level, batch_game.level[i])
+            self.assertEqual(game.score.new_delay, batch_game.delay[i])
+            if not game.over:
+                piece = game.current_piece
+                xs, ys = batch_game.cells(batch_game.kind[i:i + 1], batch_game.orientation[i:i + 1],
+                                          batch_game.x[i:i + 1], batch_game.y[i:i + 1])
+                self.assertEqual(sorted(piece.cells), sorted(zip(xs[0].tolist(), ys[0].tolist())))
+                self.assertEqual(game.next_kind, batch_game.next_kind[i])
+
+    def test_random_actions_match_the_engine(self):
+        # every engine game is dealt the kinds its batch game drew
+        for width, height in ((10, 20), (6, 8)):
+            rnd = random.Random(width)
+            batch_game = batch.BatchGame(16, width, height, seed=width)
+            kinds = [Kinds([batch_game.kind[i], batch_game.next_kind[i]])
+                     for i in range(batch_game.n)]
+            games = [engine.Game(width, height, board_class=engine.BitBoard, generator=kinds[i])
+                     for i in range(batch_game.n)]
+            self.check(games, batch_game)
+            for step in range(400):
+                actions = np.array([rnd.choice([batch.NOTHING, batch.LEFT, batch.RIGHT,
+                                                batch.DOWN, batch.DOWN, batch.ROTATE,
+                                                batch.ROTATE, batch.DROP])
+                                    for i in range(batch_game.n)])
+                pieces = batch_game.pieces.copy()
+                batch_game.step(actions)
+                for i, game in enumerate(games):
+                    if batch_game.pieces[i] != pieces[i]:
+                        kinds[i].kinds.append(batch_game.next_kind[i])
+                    action = actions[i]
+                    if action == batch.LEFT:
+                        game.do_move('Left')
+                    elif action == batch.RIGHT:
+                        game.do_move('Right')
+                    elif action == batch.DOWN:
+                        game.do_move('Down')
+                    elif action == batch.ROTATE:
+                        game.do_rotate()
+                    elif action == batch.DROP:
+                        game.hard_drop()
+                self.check(games, batch_game)
+
+    def test_placements_clear_rows_as_the_engine(self):
+        # the search player clears rows and goes up levels, which
+        # random actions hardly ever do
+        player = ai.Player(lookahead=False)
+        batch_game = batch.BatchGame(4, seed=3)
+        kinds = [Kinds([batch_game.kind[i], batch_game.next_kind[i]]) for i in range(4)]
+        games = [engine.Game(board_class=engine.BitBoard, generator=kinds[i]) for i in range(4)]
+        for step in range(150):
+            orientation = np.zeros(4, dtype=np.int64)
+            x = np.zeros(4, dtype=np.int64)
+            downs = np.zeros(4, dtype=np.int64)
+            for i, game in enumerate(games):
+                if game.over:
+                    continue
+                for move in player.choose(game.board.rows, game.width, game.current_piece) or ():
+                    if move == 'Up':
+                        game.do_rotate()
+                    else:
+                        game.do_move(move)
+                        downs[i] += move == 'Down'
+                orientation[i] = game.current_piece.orientation
+                x[i] = game.current_piece.x
+            # place turns and slides a piece at its height, so the
+            # pieces that had to move down first do so
+            for down in range(downs.max()):
+                batch_game.move(downs > down, 0, 1)
+            pieces = batch_game.pieces.copy()
+            batch_game.place(np.ones(4, dtype=bool), orientation, x)
+            for i, game in enumerate(games):
+                if batch_game.pieces[i] != pieces[i]:
+                    kinds[i].kinds.append(batch_game.next_kind[i])
+                game.hard_drop()
+            self.check(games, batch_game)
+        self.assertTrue(batch_game.level.max() > 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+''' Tests of the key state and auto repeat, on a fake clock.
+
+        python -m unittest test_controls
+'''
+import unittest
+
+import controls
+from test_loop import FakeClock
+
+TICK = 25
+
+
+class ControlsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.controls = controls.Controls(das=167, arr=33, soft_drop=33, clock=self.clock)
+
+    def tick(self, ms=TICK):
+        self.clock.advance(ms)
+        return self.controls.update(ms)
+
+    def hold(self, key, ms, tick=TICK):
+        ''' Return value: type: list - the moves of key made in each tick
+            of the ms it is held after its press tick
+        '''
+        counts = []
+        for i in range(ms // tick):
+            counts.append(dict(self.tick(tick)).get(key, 0))
+        return counts
+
+    def test_one_move_on_press(self):
+        self.controls.press('Left')
+        self.assertEqual(self.tick(), [('Left', 1)])
+        self.assertEqual(self.tick(), [])
+
+    def test_first_repeat_after_das_then_every_arr(self):
+        self.controls.press('Right')
+        self.assertEqual(self.tick(), [('Right', 1)])
+        counts = self.hold('Right', 400)
+        # held 175 ms at the seventh tick: the first that passes das
+        self.assertEqual(counts[:7], [0] * 6 + [1])
+        # then one more for every arr ms it is held
+        total = 1
+        for i, count in enumerate(counts):
+            total += count
+            held = (i + 1) * TICK
+            self.assertEqual(total, 1 if held < 167 else 2 + (held - 167) // 33)
+
+    def test_repeats_do_not_depend_on_the_tick(self):
+        totals = []
+        for tick in (1, 5, 25):
+            keys = controls.Controls(das=150, arr=25, clock=self.clock)
+            keys.press('Left')
+            total = 0
+            for i in range(500 // tick + 1):
+                total += dict(keys.update(0 if i == 0 else tick)).get('Left', 0)
+            totals.append(total)
+        self.assertEqual(totals, [2 + (500 - 150) // 25] * 3)
+
+    def test_arr_zero_goes_to_the_wall(self):
+        self.controls.arr = 0
+        self.controls.press('Left')
+        self.assertEqual(self.tick(), [('Left', 1)])
+        counts = self.hold('Left', 200)
+        self.assertEqual(counts[6], controls.ALL_THE_WAY - 1)
+        self.assertEqual(counts[:6] + counts[7:], [0] * 7)
+
+    def test_tap_shorter_than_a_tick(self):
+        self.controls.press('Left')
+        self.controls.release('Left')
+        self.controls.press('space')
+        self.controls.release('space')
+        self.assertEqual(self.tick(), [('Left', 1), ('space', 1)])
+        self.assertEqual(self.tick(), [])
+        self.assertEqual(self.controls.held, {})
+
+    def test_repeated_presses_of_a_held_key_are_ignored(self):
+        self.controls.press('Up')
+        self.controls.press('Up')
+        self.assertEqual(self.tick(), [('Up', 1)])
+        for i in range(10):
+            # the desktop's key repeat: more presses, or a release and a
+            # press before the next tick
+            self.controls.press('Up')
+            self.controls.release('Up')
+            self.controls.press('Up')
+            self.assertEqual(self.tick(), [])
+        # a held sideways key keeps its own repeat timing
+        self.controls.press('Left')
+        self.tick()
+        for i in range(6):
+            self.controls.release('Left')
+            self.controls.press('Left')
+            self.assertEqual(self.tick(), [])
+        self.assertEqual(self.tick(), [('Left', 1)])
+        self.controls.release('Up')
+        self.controls.release('Left')
+        self.tick()
+        self.controls.press('Up')
+        self.assertEqual(self.tick(), [('Up', 1)])
+
+    def test_last_sideways_key_wins(self):
+        self.controls.press('Left')
+        self.assertEqual(self.tick(), [('Left', 1)])
+        self.controls.press('Right')
+        self.assertEqual(self.tick(), [('Right', 1)])
+        self.assertEqual(sum(dict(self.tick()).get('Left', 0) for i in range(10)), 0)
+        # letting go of Right hands the shape back to Left, held all along
+        self.controls.release('Right')
+        self.assertEqual(self.tick(), [])
+        moves = [self.tick() for i in range(4)]
+        self.assertEqual(set(key for tick in moves for key, count in tick), set(['Left']))
+        # and pressing Right again takes it over again
+        self.controls.press('Right')
+        self.assertEqual(self.tick(), [('Right', 1)])
+        self.controls.release('Left')
+        self.assertEqual(self.tick(), [])
+
+    def test_soft_drop(self):
+        self.controls.press('Down')
+        self.assertEqual(self.tick(), [('Down', 1)])
+        counts = self.hold('Down', 330, tick=5)
+        self.assertEqual(sum(counts), 330 // 33)
+        self.controls.release('Down')
+        self.assertEqual(self.tick(), [])
+        self.assertEqual(self.tick(), [])
+
+    def test_moves_come_in_key_order(self):
+        for key in ('space', 'Up', 'Down', 'Right'):
+            self.controls.press(key)
+        self.assertEqual([key for key, count in self.tick()], ['Right', 'Down', 'Up', 'space'])
+
+    def test_latency_from_press_to_frame(self):
+        self.controls.press('Left')
+        self.clock.advance(10)
+        # drawn before the tick made its move: not counted
+        self.controls.rendered()
+        self.assertEqual(self.controls.latency[0], 0)
+        self.tick(5)
+        self.clock.advance(3)
+        self.controls.rendered()
+        self.assertEqual(self.controls.latency[0], 1)
+        self.assertAlmostEqual(self.controls.mean_latency(), 18)
+        # repeats are not presses
+        self.hold('Left', 300)
+        self.controls.rendered()
+        self.assertEqual(self.controls.latency[0], 1)
+        self.controls.press('Up')
+        self.tick(25)
+        self.controls.rendered()
+        self.assertEqual(self.controls.latency[0], 2)
+        self.assertAlmostEqual(self.controls.latency[2], 25)
+        self.assertAlmostEqual(self.controls.mean_latency(), 21.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+''' Tests of the engine's rotation tables, against the rotation
+    arithmetic the shapes used before the tables, and of the zobrist
+    keys the boards keep, on both boards.
+
+        python -m unittest test_engine
+'''
+import random
+import unittest
+
+import ai
+import engine
+
+
+def old_rotated(cells, direction):
+    ''' Return value: type: list
+
+        cells rotated in direction around the block at index 1,
+        as Shape.rotate computed it
+    '''
+    centre_x, centre_y = cells[1]
+    return [(centre_x - direction * centre_y + direction * y,
+             centre_y + direction * centre_x - direction * x) for x, y in cells]
+
+
+class OldPiece():
+    ''' OldPiece class: the squares and rotation direction of a shape
+        as the shapes kept them before the tables
+    '''
+
+    def __init__(self, kind, x, y):
+        self.kind = kind
+        self.cells = [(x + dx, y + dy) for dx, dy in engine.SHAPE_OFFSETS[kind]]
+        self.direction = -1
+
+    def rotate(self, board):
+        ''' rotates the piece if every new square is free on board;
+            a shape that does not rotate stays as it is
+        '''
+        if not engine.SHAPE_ROTATES[self.kind]:
+            return True
+        cells = old_rotated(self.cells, self.direction)
+        if not all(board.can_move(x, y) for x, y in cells):
+            return False
+        self.cells = cells
+        if engine.SHAPE_SHIFTS[self.kind]:
+            self.direction *= -1
+        return True
+
+
+class RotationTest(unittest.TestCase):
+
+    def test_tables_match_old_rotation(self):
+        # every kind turned over and over in the middle of an empty board
+        for board_class in (engine.Board, engine.BitBoard):
+            board = board_class(10, 20)
+            for kind in range(len(engine.SHAPE_OFFSETS)):
+                piece = engine.Piece(kind, 5, 8)
+                old = OldPiece(kind, 5, 8)
+                self.assertEqual(piece.cells, old.cells)
+                for turn in range(2 * len(engine.ROTATIONS[kind]) + 1):
+                    self.assertEqual(piece.can_rotate(board), old.rotate(board))
+                    piece.rotate()
+                    self.assertEqual(piece.cells, old.cells, (board_class, kind, turn))
+                    self.assertEqual(piece.rotation_dir, old.direction)
+
+    def test_rotation_in_lockstep_on_both_boards(self):
+        # the same random moves, rotations and drops on a Board and a
+        # BitBoard game, every rotation checked against the old arithmetic
+        for seed in range(20):
+            rnd = random.Random(seed)
+            games = [engine.Game(10, 20, seed=seed, board_class=board_class)
+                     for board_class in (engine.Board, engine.BitBoard)]
+            old = None
+            for step in range(600):
+                if games[0].over:
+                    break
+                if old is None or old.piece is not games[0].current_piece:
+                    old = OldPiece(games[0].current_piece.kind, 0, 0)
+                    old.piece = games[0].current_piece
+                    old.cells = list(old.piece.cells)
+                action = rnd.choice(['Left', 'Right', 'Down', 'Up', 'Up', 'drop'])
+                if action == 'Up':
+                    rotated = old.rotate(games[0].board)
+                    self.assertEqual([game.do_rotate() for game in games], [rotated] * 2)
+                elif action == 'drop':
+                    for game in games:
+                        game.hard_drop()
+                else:
+                    moved = [game.do_move(action) for game in games]
+                    self.assertEqual(moved[0], moved[1])
+                    if moved[0]:
+                        dx, dy = engine.Game.DIRECTION[action]
+                        old.cells = [(x + dx, y + dy) for x, y in old.cells]
+                self.assertEqual(games[0].current_piece.cells, games[1].current_piece.cells)
+                self.assertEqual(games[0].board.rows, games[1].board.rows)
+                if old.piece is games[0].current_piece:
+                    self.assertEqual(old.piece.cells, old.cells)
+
+
+class ZobristTest(unittest.TestCase):
+
+    def check(self, boards):
+        for board in boards:
+            self.assertEqual(board.zobrist, engine.rows_key(board.keys, board.rows))
+        self.assertEqual(boards[0].rows, boards[1].rows)
+        self.assertEqual(boards[0].zobrist, boards[1].zobrist)
+
+    def test_keys_follow_played_games(self):
+        # moves, rotations, locks and line clears, checked after every step
+        player = ai.Player(lookahead=False)
+        cleared = 0
+        for seed in range(10):
+            rnd = random.Random(seed)
+            games = [engine.Game(8, 12, seed=seed, board_class=board_class)
+                     for board_class in (engine.Board, engine.BitBoard)]
+            for step in range(800):
+                if games[0].over:
+                    break
+                action = rnd.choice(['Left', 'Right', 'Down', 'Up', 'drop', 'play', 'play'])
+                for game in games:
+                    if action == 'play':
+                        player.play(game)
+                    elif action == 'Up':
+                        game.do_rotate()
+                    elif action == 'drop':
+                        game.hard_drop()
+                    else:
+                        game.do_move(action)
+                self.check([game.board for game in games])
+                if not games[0].over:
+                    self.assertEqual(games[0].zobrist, games[1].zobrist)
+            cleared += games[0].score.your_score
+        self.assertTrue(cleared > 0)
+
+    def test_keys_follow_the_row_methods(self):
+        rnd = random.Random(3)
+        width, height = 6, 10
+        boards = [board_class(width, height) for board_class in (engine.Board, engine.BitBoard)]
+        seen = {}
+        for step in range(2000):
+            action = rnd.randrange(5)
+            if action == 0:
+                kind = rnd.randrange(len(engine.SHAPE_OFFSETS))
+                piece = engine.Piece(kind, rnd.randrange(1, width - 2), rnd.randrange(1, height - 2))
+                if all(board.fits(piece.cells) for board in boards):
+                    for board in boards:
+                        board.add_shape(piece)
+            elif action == 1:
+                full = [y for y in range(height) if boards[0].is_row_complete(y)]
+                if full:
+                    y = rnd.choice(full)
+                    for board in boards:
+                        board.delete_row(y)
+            elif action == 2:
+                y = rnd.randrange(-1, height + 2)
+                for board in boards:
+                    board.move_down_rows(y)
+            elif action == 3:
+                for board in boards:
+                    board.remove_complete_rows()
+            else:
+                rows = [rnd.randrange(1 << width) if rnd.random() < 0.5 else 0
+                        for y in range(height)]
+                if rnd.random() < 0.3:
+                    rows[rnd.randrange(height)] = (1 << width) - 1
+                for board in boards:
+                    board.set_rows(rows)
+            self.check(boards)
+            # different boards have different keys
+            rows = tuple(boards[0].rows)
+            self.assertEqual(seen.setdefault(boards[0].zobrist, rows), rows)
+        self.assertTrue(len(seen) > 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
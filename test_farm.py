@@ -0,0 +1,29 @@
+''' Tests of the game farm.
+
+        python -m unittest test_farm
+'''
+import unittest
+
+import farm
+
+
+class FarmTest(unittest.TestCase):
+
+    def test_results_do_not_depend_on_the_workers(self):
+        alone = farm.run_farm(12, seed=5, workers=1, max_pieces=200)
+        pooled = farm.run_farm(12, seed=5, workers=3, max_pieces=200)
+        self.assertEqual(alone, pooled)
+        self.assertEqual([record.index for record in pooled], list(range(12)))
+        self.assertNotEqual(alone, farm.run_farm(12, seed=6, workers=1, max_pieces=200))
+
+    def test_game_seeds_do_not_collide(self):
+        self.assertNotEqual(farm.game_seed(0, 1000003), farm.game_seed(1, 0))
+        seeds = set(farm.game_seed(seed, index) for seed in range(20) for index in range(500))
+        self.assertEqual(len(seeds), 20 * 500)
+
+    def test_no_games(self):
+        self.assertEqual(farm.run_farm(0, workers=1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
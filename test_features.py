@@ -0,0 +1,91 @@
+''' Tests of the incremental feature tracker against the features
+    computed from scratch.
+
+        python -m unittest test_features
+'''
+import random
+import unittest
+
+import ai
+import engine
+import features
+
+
+def slow_features(rows, width):
+    ''' Return value: type: features.Features - of the board rows, square by square '''
+    height = len(rows)
+    filled = lambda x, y: x < 0 or x >= width or y >= height or bool(rows[y] >> x & 1)
+    heights = []
+    holes = 0
+    column_changes = 0
+    for x in range(width):
+        tops = [y for y in range(height) if filled(x, y)]
+        heights.append(height - tops[0] if tops else 0)
+        holes += sum(1 for y in range(height - heights[-1], height) if not filled(x, y))
+        column_changes += sum(1 for y in range(height) if filled(x, y) != filled(x, y + 1))
+    row_changes = sum(1 for y in range(height) if rows[y]
+                      for x in range(-1, width) if filled(x, y) != filled(x + 1, y))
+    walls = [height] + heights + [height]
+    wells = sum(max(0, min(walls[x], walls[x + 2]) - walls[x + 1]) for x in range(width))
+    bumpiness = sum(abs(heights[x] - heights[x + 1]) for x in range(width - 1))
+    return features.Features(sum(heights), max(heights), holes, wells,
+                             row_changes, column_changes, bumpiness)
+
+
+class FeaturesTest(unittest.TestCase):
+
+    def test_board_features_on_random_boards(self):
+        rnd = random.Random(1)
+        for trial in range(300):
+            width, height = rnd.choice([(4, 2), (10, 20), (7, 12)])
+            rows = [rnd.randrange(1 << width) if rnd.random() < 0.6 else 0
+                    for y in range(height)]
+            self.assertEqual(features.board_features(rows, width), slow_features(rows, width))
+
+    def test_tracker_follows_played_games(self):
+        # locks, line clears and the row methods on both boards
+        player = ai.Player(lookahead=False)
+        cleared = 0
+        for board_class in (engine.Board, engine.BitBoard):
+            for seed in range(4):
+                game = engine.Game(8, 14, seed=seed, board_class=board_class)
+                tracker = features.FeatureTracker(game.board)
+                rnd = random.Random(seed)
+                while not game.over and game.pieces < 100:
+                    if rnd.random() < 0.7:
+                        player.play(game)
+                    else:
+                        game.hard_drop()
+                    if rnd.random() < 0.05:
+                        game.board.move_down_rows(rnd.randrange(game.height))
+                    self.assertEqual(tracker.features(),
+                                     features.board_features(game.board.rows, game.width))
+                cleared += game.score.your_score
+        self.assertTrue(cleared > 0)
+
+    def test_tracker_after_set_rows_and_delete_row(self):
+        board = engine.BitBoard(6, 6)
+        tracker = features.FeatureTracker(board)
+        rows = [0, 0, 0b100100, 0b011111, 0b101101, 0b111110]
+        board.set_rows(rows)
+        self.assertEqual(tracker.features(), features.board_features(rows, 6))
+        board.delete_row(3)
+        self.assertEqual(tracker.features(), features.board_features(board.rows, 6))
+
+    def test_placed_features_match_scratch(self):
+        player = ai.Player()
+        game = engine.Game(seed=5)
+        tracker = features.tracker(game.board)
+        while not game.over and game.pieces < 100:
+            piece = game.current_piece
+            for moves, board, lines in ai.placements(game.board.rows, game.width, piece.kind,
+                                                     piece.orientation, piece.x, piece.y):
+                if not lines:
+                    found = features.board_features(board, game.width)
+                    self.assertEqual(player.placed_features(tracker, board),
+                                     (found.height, found.holes, found.bumpiness))
+            player.play(game)
+
+
+if __name__ == '__main__':
+    unittest.main()
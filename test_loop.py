@@ -0,0 +1,103 @@
+''' Tests of the fixed timestep loop, on a fake clock.
+
+        python -m unittest test_loop
+'''
+import unittest
+
+import loop
+
+
+class FakeClock():
+    ''' FakeClock class: a clock that only moves when told to '''
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, ms):
+        self.now += ms / 1000.0
+
+
+class FixedTimestepTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.timestep = loop.FixedTimestep(25, self.clock, max_ticks=40)
+
+    def test_ticks_follow_the_clock(self):
+        self.assertEqual(self.timestep.due(), 0)
+        self.clock.advance(24)
+        self.assertEqual(self.timestep.due(), 0)
+        self.assertEqual(self.timestep.wait(), 1)
+        self.clock.advance(1)
+        self.assertEqual(self.timestep.due(), 1)
+        self.assertEqual(self.timestep.wait(), 25)
+
+    def test_late_wake_ups_catch_up(self):
+        # a wake up 35 ms late runs the missed ticks, and the next tick
+        # is still due on the grid of the first
+        self.clock.advance(60)
+        self.assertEqual(self.timestep.due(), 2)
+        self.assertEqual(self.timestep.wait(), 15)
+        self.clock.advance(15)
+        self.assertEqual(self.timestep.due(), 1)
+
+    def test_lateness_does_not_drift(self):
+        # waking up 1 ms late every time loses no ticks
+        total = 0
+        for i in range(1000):
+            self.clock.advance(self.timestep.wait() + 1)
+            total += self.timestep.due()
+        self.assertEqual(total, self.timestep.ticks)
+        self.assertEqual(total, int((self.clock.now - self.timestep.start) * 1000 // 25))
+        self.assertEqual(self.timestep.skipped, 0)
+
+    def test_tick_cap_skips_the_backlog(self):
+        self.clock.advance(2000)
+        self.assertEqual(self.timestep.due(), 40)
+        self.assertEqual(self.timestep.skipped, 40)
+        # the skipped ticks are not run later
+        self.clock.advance(25)
+        self.assertEqual(self.timestep.due(), 1)
+        self.assertEqual(self.timestep.skipped, 40)
+
+    def test_reset_starts_from_now(self):
+        self.clock.advance(1000)
+        self.timestep.reset()
+        self.assertEqual(self.timestep.due(), 0)
+        self.clock.advance(50)
+        self.assertEqual(self.timestep.due(), 2)
+
+
+class GravityTest(unittest.TestCase):
+
+    def test_drops_every_delay(self):
+        gravity = loop.Gravity()
+        drops = sum(gravity.advance(25, 1000) for i in range(400))
+        self.assertEqual(drops, 10)
+        self.assertEqual(gravity.elapsed, 0)
+
+    def test_several_drops_in_one_advance(self):
+        gravity = loop.Gravity()
+        self.assertEqual(gravity.advance(1000, 400), 2)
+        self.assertEqual(gravity.elapsed, 200)
+
+    def test_delay_change_keeps_the_time_since_the_last_drop(self):
+        gravity = loop.Gravity()
+        self.assertEqual(gravity.advance(900, 1000), 0)
+        # a level up shortens the delay: the time already waited counts
+        self.assertEqual(gravity.advance(25, 750), 1)
+        self.assertEqual(gravity.elapsed, 175)
+        self.assertEqual(gravity.advance(550, 750), 0)
+        self.assertEqual(gravity.advance(25, 750), 1)
+        self.assertEqual(gravity.elapsed, 0)
+        # and a longer delay waits for the rest of it
+        self.assertEqual(gravity.advance(700, 750), 0)
+        self.assertEqual(gravity.advance(100, 1000), 0)
+        self.assertEqual(gravity.advance(200, 1000), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
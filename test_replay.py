@@ -0,0 +1,141 @@
+''' Tests of the replay logs: recorded games replay to the same
+    position, and logs cut anywhere replay to a prefix of the game.
+
+        python -m unittest test_replay
+'''
+import io
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import ai
+import engine
+import replay
+
+
+class FakeClock():
+    ''' FakeClock class: a clock that only moves when told to '''
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, ms):
+        self.now += ms / 1000.0
+
+
+class Log(io.BytesIO):
+    ''' Log class: an in memory log that keeps its bytes once closed '''
+
+    def close(self):
+        pass
+
+
+def record_game(seed, steps=400):
+    ''' Return value: type: tuple (bytearray, engine.Game, list)
+
+        the log of a seeded game of random inputs and gravity ticks,
+        the game, and the (log length, rows, score) after every event
+    '''
+    rnd = random.Random(seed)
+    clock = FakeClock()
+    log = Log()
+    recorder = replay.Recorder(log, 8, 14, seed, clock)
+    game = engine.Game(8, 14, generator=recorder)
+    player = ai.Player(lookahead=False)
+    states = [(len(log.getvalue()), list(game.board.rows), game.score.your_score)]
+    for step in range(steps):
+        if game.over:
+            break
+        clock.advance(rnd.choice([1, 25, 100, 300]))
+        if rnd.random() < 0.3:
+            moves = player.choose(game.board.rows, game.width, game.current_piece) or ()
+            opcodes = [replay.KEYS[move] for move in moves] + [replay.DROP]
+        else:
+            opcodes = [rnd.choice([replay.GRAVITY, replay.LEFT, replay.RIGHT,
+                                   replay.DOWN, replay.ROTATE, replay.DROP])]
+        for opcode in opcodes:
+            recorder.event(opcode)
+            replay.play(game, opcode)
+            states.append((len(log.getvalue()), list(game.board.rows), game.score.your_score))
+    return bytearray(log.getvalue()), game, states
+
+
+class ReplayTest(unittest.TestCase):
+
+    def test_varints(self):
+        for value in (0, 1, 127, 128, 300, 1 << 32, (1 << 64) - 1):
+            buf = bytearray()
+            replay.write_varint(buf, value)
+            self.assertEqual(replay.read_varint(buf, 0), (value, len(buf)))
+            self.assertRaises(EOFError, replay.read_varint, buf[:-1], 0)
+
+    def test_replay_matches_the_recorded_game(self):
+        for seed in range(6):
+            data, game, states = record_game(seed)
+            self.assertEqual(replay.read_header(data)[:3], (8, 14, seed))
+            for board_class in (engine.Board, engine.BitBoard):
+                replayed = replay.replay(data, board_class)
+                self.assertEqual(replayed.board.rows, game.board.rows)
+                self.assertEqual(replayed.score.your_score, game.score.your_score)
+                self.assertEqual(replayed.pieces, game.pieces)
+                self.assertEqual(replayed.over, game.over)
+                if not game.over:
+                    self.assertEqual(replayed.current_piece.cells, game.current_piece.cells)
+
+    def test_cut_logs_replay_a_prefix(self):
+        # a piece locks before the next one spawns, so a log cut
+        # between the two is at the position either side of the cut
+        data, game, states = record_game(7, steps=120)
+        header = replay.read_header(data)[3]
+        events = list(replay.read_events(data, header))
+        for cut in range(len(data) + 1):
+            if cut < header:
+                self.assertRaises(EOFError, replay.read_header, data[:cut])
+            else:
+                self.assertEqual(list(replay.read_events(data[:cut], header)),
+                                 [event for event in events if event[2] <= cut])
+            replayed = replay.replay(data[:cut])
+            if cut < states[0][0]:
+                self.assertEqual(replayed, None)
+                continue
+            before = max(i for i, state in enumerate(states) if state[0] <= cut)
+            found = (replayed.board.rows, replayed.score.your_score)
+            self.assertIn(found, [tuple(state[1:]) for state in states[before:before + 2]])
+
+    def test_wrong_logs(self):
+        self.assertRaises(ValueError, replay.read_header, bytearray(b'TTRX\x01'))
+        self.assertRaises(ValueError, replay.read_header, bytearray(b'TTRP\x09\x0a\x14\x00'))
+
+
+class RecordedTetrisTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_events_are_timed_on_the_game_clock(self):
+        import bench
+        clock = FakeClock()
+        path = os.path.join(self.dir, 'game.ttrp')
+        window = bench.VirtualWindow()
+        game = bench.virtual(bench.tetris.Tetris, window, record=path, clock=clock, seed=3,
+                             store=bench.scores.ScoreStore(':memory:', legacy=None))
+        for i in range(5):
+            clock.advance(1000)
+            game.animate_shape()
+        game.close()
+        data = replay.load(path)
+        gravity = [ms for opcode, ms, offset in replay.read_events(data, replay.read_header(data)[3])
+                   if opcode == replay.GRAVITY]
+        self.assertEqual(gravity, [1000, 2000, 3000, 4000, 5000])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+''' Tests of the sqlite high score store.
+
+        python -m unittest test_scores
+'''
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+import scores
+
+
+class ScoreStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'scores.db')
+        self.legacy = os.path.join(self.dir, 'highscore.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def store(self, legacy=None):
+        store = scores.ScoreStore(self.path, legacy=legacy)
+        self.addCleanup(store.close)
+        return store
+
+    def test_rank_counts_the_better_games(self):
+        rnd = random.Random(1)
+        store = self.store()
+        added = []
+        for i in range(300):
+            score = rnd.randrange(40)
+            store.add(score, player='p%d' % rnd.randrange(3), played=i)
+            added.append(score)
+            probe = rnd.randrange(-1, 42)
+            self.assertEqual(store.rank(probe), 1 + sum(1 for s in added if s > probe))
+        for score in range(-1, 42):
+            self.assertEqual(store.rank(score), 1 + sum(1 for s in added if s > score))
+        self.assertEqual(store.high_score(), max(added))
+
+    def test_top_of_a_player(self):
+        store = self.store()
+        self.assertEqual(store.top(), [])
+        self.assertEqual(store.high_score(), 0)
+        for i, (player, score) in enumerate([('ann', 3), ('bob', 9), ('ann', 7),
+                                             ('bob', 1), ('ann', 5)]):
+            store.add(score, level=score // 2 + 1, player=player, played=i)
+        self.assertEqual([row[1] for row in store.top(3)], [9, 7, 5])
+        self.assertEqual(store.top(2, player='ann'), [('ann', 7, 4, 2.0), ('ann', 5, 3, 4.0)])
+        self.assertEqual([row[1] for row in store.top(player='bob')], [9, 1])
+        self.assertEqual(store.top(player='cat'), [])
+
+    def test_old_high_score_is_imported_once(self):
+        with open(self.legacy, 'w') as f:
+            f.write('42\n')
+        self.store(self.legacy)
+        store = self.store(self.legacy)
+        self.assertEqual(store.high_score(), 42)
+        self.assertEqual(len(store.top()), 1)
+        # an empty or missing file imports nothing
+        other = os.path.join(self.dir, 'other.txt')
+        open(other, 'w').close()
+        store.import_file(other)
+        store.import_file(os.path.join(self.dir, 'missing.txt'))
+        self.assertEqual(len(store.top()), 1)
+
+    def test_counts_are_rebuilt_for_an_old_database(self):
+        store = self.store()
+        for score in (4, 8, 8, 2):
+            store.add(score, player='ann')
+        store.db.execute('DELETE FROM score_ranks')
+        store.close()
+        store = self.store()
+        self.assertEqual([store.rank(score) for score in (9, 8, 4, 2, 0)], [1, 1, 3, 4, 5])
+
+    def test_concurrent_adds(self):
+        # each thread writes through its own connection to one file
+        self.store()
+        errors = []
+        def play(player):
+            try:
+                store = scores.ScoreStore(self.path, legacy=None)
+                for i in range(40):
+                    store.add(i % 13, player=player, played=i)
+                store.close()
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=play, args=('p%d' % i,)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        store = self.store()
+        self.assertEqual(len(store.top(1000)), 80)
+        for score in range(14):
+            self.assertEqual(store.rank(score), 1 + 2 * sum(1 for i in range(40) if i % 13 > score))
+
+    def test_readers_do_not_wait_for_a_writer(self):
+        writer = self.store()
+        reader = self.store()
+        waiting = scores.ScoreStore(self.path, legacy=None, timeout=0.05)
+        self.addCleanup(waiting.close)
+        writer.add(5)
+        writer.db.execute('BEGIN IMMEDIATE')
+        writer.insert(writer.db.cursor(), 'ann', 9, 1, 0.0)
+        # the reader sees the last committed scores meanwhile
+        self.assertEqual(reader.high_score(), 5)
+        self.assertEqual(reader.rank(5), 1)
+        # and a second writer waits for the lock, then gives up
+        self.assertRaises(sqlite3.OperationalError, waiting.add, 7)
+        writer.db.execute('COMMIT')
+        self.assertEqual(reader.high_score(), 9)
+        self.assertEqual(reader.rank(5), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
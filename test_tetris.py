@@ -0,0 +1,179 @@
+''' Tests of the front end boards, on a canvas that keeps its items
+    instead of drawing them.
+
+        python -m unittest test_tetris
+'''
+import unittest
+
+import ai
+import bench
+import tetris
+
+
+class ItemCanvas():
+    ''' ItemCanvas class: stands in for a Tk canvas, keeping the
+        coordinates, tags and options of every item
+        Attributes:
+            items - type: dictionary - the options of each item id, with
+            its 'coords' and its set of 'tags'
+            created - type: int - the items created so far
+    '''
+
+    def __init__(self):
+        self.items = {}
+        self.created = 0
+
+    def find(self, tag):
+        ''' Return value: type: list - the ids of the items of tag, an id or a tag '''
+        if tag in self.items:
+            return [tag]
+        return [id for id, item in self.items.items() if tag in item['tags']]
+
+    def create(self, coords, options):
+        self.created += 1
+        item = dict(options)
+        item['coords'] = list(coords)
+        tags = options.get('tags', ())
+        item['tags'] = set([tags] if isinstance(tags, str) else tags)
+        self.items[self.created] = item
+        return self.created
+
+    def create_rectangle(self, x1, y1, x2, y2, options):
+        return self.create((x1, y1, x2, y2), options)
+
+    def create_text(self, x, y, options):
+        return self.create((x, y), options)
+
+    def coords(self, id, *coords):
+        self.items[id]['coords'] = list(coords)
+
+    def move(self, tag, dx, dy):
+        for id in self.find(tag):
+            coords = self.items[id]['coords']
+            self.items[id]['coords'] = [c + (dy if i % 2 else dx) for i, c in enumerate(coords)]
+
+    def itemconfig(self, tag, options=None, **kwargs):
+        for id in self.find(tag):
+            self.items[id].update(options or {}, **kwargs)
+
+    def addtag_withtag(self, tag, id):
+        self.items[id]['tags'].add(tag)
+
+    def delete(self, tag):
+        for id in self.find(tag):
+            del self.items[id]
+
+    def config(self, **options):
+        pass
+
+
+class ItemFrame(bench.VirtualFrame):
+    ''' ItemFrame class: a VirtualFrame drawing on an ItemCanvas '''
+
+    def __init__(self, parent, width=200, height=200):
+        bench.VirtualFrame.__init__(self, parent, width, height)
+        self.canvas = ItemCanvas()
+
+
+def item_game(board_class, seed, **kwargs):
+    ''' Return value: type: tuple (tetris.Tetris, bench.VirtualWindow)
+
+        a seeded game drawn by board_class on ItemCanvases
+    '''
+    window = bench.VirtualWindow()
+    real = tetris.CanvasFrame
+    tetris.CanvasFrame = ItemFrame
+    try:
+        game = tetris.Tetris(window, board_class=board_class, seed=seed,
+                             store=bench.scores.ScoreStore(':memory:', legacy=None), **kwargs)
+    finally:
+        tetris.CanvasFrame = real
+    window.run_idle()
+    return game, window
+
+
+def picture(canvas):
+    ''' Return value: type: set - the squares a filled block shows on '''
+    squares = set()
+    size = tetris.Block.BLOCK_SIZE
+    for item in canvas.items.values():
+        if len(item['coords']) == 4 and item.get('fill') and item.get('state') != 'hidden':
+            x1, y1 = item['coords'][:2]
+            x, y = (x1 - tetris.Block.OUTLINE_WIDTH, y1 - tetris.Block.OUTLINE_WIDTH)
+            if x % size == 0 and y % size == 0:
+                squares.add((x // size, y // size))
+    return squares
+
+
+def occupied(game):
+    ''' Return value: type: set - the squares of the board and the current piece '''
+    squares = set()
+    for y, row in enumerate(game.game.board.rows):
+        squares.update((x, y) for x in range(game.width) if row >> x & 1)
+    if not game.game.over:
+        squares.update(game.game.current_piece.cells)
+    return squares
+
+
+class BoardTest(unittest.TestCase):
+
+    def play(self, board_class, seed, pieces=80):
+        ''' plays a seeded game with the ai through the front end,
+            checking the board on screen after every frame
+        '''
+        game, window = item_game(board_class, seed)
+        canvas = game.board.canvas.canvas
+        items = len(canvas.items)
+        player = ai.Player(lookahead=False)
+        while not game.game.over and game.game.pieces < pieces:
+            for move in player.choose(game.game.board.rows, game.width,
+                                      game.game.current_piece) or ():
+                if move == 'Up':
+                    game.do_rotate()
+                else:
+                    game.do_move(move)
+                window.run_idle()
+                self.assertEqual(picture(canvas), occupied(game))
+            game.hard_drop()
+            window.run_idle()
+            self.assertEqual(picture(canvas), occupied(game))
+            if board_class is tetris.RetainedBoard and not game.game.over:
+                self.assertEqual(len(canvas.items), items)
+                self.assertEqual(canvas.created, items)
+        return game
+
+    def test_retained_board_keeps_its_items(self):
+        # the same items across spawns and line clears
+        cleared = 0
+        for seed in range(3):
+            cleared += self.play(tetris.RetainedBoard, seed).game.score.your_score
+        self.assertTrue(cleared > 0)
+
+    def test_board_shows_the_game(self):
+        self.assertTrue(self.play(tetris.Board, 1).game.score.your_score > 0)
+
+    def test_retained_board_is_the_default(self):
+        window = bench.VirtualWindow()
+        game = bench.virtual(tetris.Tetris, window,
+                             store=bench.scores.ScoreStore(':memory:', legacy=None))
+        self.assertTrue(isinstance(game.board, tetris.RetainedBoard))
+
+    def test_retained_move_down_rows(self):
+        # the squares of row y_start + 1 stay unless one lands on them,
+        # and the bottom row is lost, as on the engine boards
+        for y_start in (-1, 3, 8, 15, 17, 18, 19, 25):
+            game, window = item_game(tetris.RetainedBoard, 0)
+            canvas = game.board.canvas.canvas
+            for step in range(8):
+                game.hard_drop()
+            window.run_idle()
+            self.assertFalse(game.game.over)
+            for times in range(3):
+                game.board.move_down_rows(y_start)
+                game.game.board.move_down_rows(y_start)
+                window.run_idle()
+                self.assertEqual(picture(canvas), occupied(game), y_start)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,15 @@
 from graphics import *
-import random
+from graphics import _BBox
+import engine
+import ai
+import features
+import replay
+import scores
+import loop
+import controls
+import profiling
+import os
+import sys
 
 
 ############################################################
@@ -52,32 +62,58 @@ class Block(Rectangle):
             moves the block dx squares in the x direction
             and dy squares in the y direction
         '''
-        self.x += dx
-        self.y += dy
-
         Rectangle.move(self, dx*Block.BLOCK_SIZE, dy*Block.BLOCK_SIZE)
 
+    def place(self, x, y, color):
+        ''' Parameters: x - type: int
+                        y - type: int
+                        color - type: string
+
+            moves the block to square x, y and paints it color,
+            reusing its canvas item, and shows it if it was hidden
+        '''
+        self.put(x, y)
+        self.setOptions(fill=color, state='normal')
+
+    def put(self, x, y):
+        ''' Parameters: x - type: int
+                        y - type: int
+
+            moves the block to square x, y with one coords call
+        '''
+        self.x = x
+        self.y = y
+        p1 = Point(x*Block.BLOCK_SIZE + Block.OUTLINE_WIDTH,
+                   y*Block.BLOCK_SIZE + Block.OUTLINE_WIDTH)
+        self.setPoints(p1, Point(p1.x + Block.BLOCK_SIZE, p1.y + Block.BLOCK_SIZE))
+
+    def _move(self, dx, dy):
+        # keeps the square in step with the pixels, also when the
+        # block is moved as part of a Group
+        Rectangle._move(self, dx, dy)
+        self.x += dx // Block.BLOCK_SIZE
+        self.y += dy // Block.BLOCK_SIZE
+
 
 ############################################################
 # SHAPE CLASS
 ############################################################
 class Shape():
     ''' Shape class:
-        Base class for all the tetris shapes
-        Attributes: blocks - type: list - the list of blocks making up the shape
-                    rotation_dir - type: int - the current rotation direction of the shape
-                    shift_rotation_dir - type: Boolean - whether or not the shape rotates
+        Base class for all the tetris shapes, a view of an engine.Piece
+        Attributes: piece - type: engine.Piece - the logical state of the shape
+                    blocks - type: list - the list of blocks making up the shape
+                    group - type: Group - the blocks, moved with one canvas call
+        The subclasses set kind (the index into the engine shape tables)
+        and color. The blocks are only created when the shape is drawn.
     '''
+    kind = None
+    color = None
 
-    def __init__(self, coords, color):
+    def __init__(self, piece):
+        self.piece = piece
         self.blocks = []
-        self.rotation_dir = -1
-        ### A boolean to indicate if a shape shifts rotation direction or not.
-        ### Defaults to false since only 3 shapes shift rotation directions (I, S and Z)
-        self.shift_rotation_dir = False
-
-        for pos in coords:
-            self.blocks.append(Block(pos, color))
+        self.group = None
 
     def get_blocks(self):
         '''returns the list of blocks'''
@@ -87,21 +123,42 @@ class Shape():
         ''' Parameter: win - type: CanvasFrame
 
             Draws the shape:
-            i.e. draws each block
+            i.e. creates and draws each block, tagged with the shape's group
         '''
-        for block in self.blocks:
-            block.draw(win)
+        self.blocks = [Block(Point(x, y), self.color) for x, y in self.piece.cells]
+        self.group = Group(self.blocks)
+        self.group.draw(win)
 
     def move(self, dx, dy):
         ''' Parameters: dx - type: int
                         dy - type: int
 
             moves the shape dx squares in the x direction
-            and dy squares in the y direction, i.e.
-            moves each of the blocks
+            and dy squares in the y direction
+        '''
+        self.piece.move(dx, dy)
+        self.sync()
+
+    def sync(self):
+        ''' moves each of the blocks to the square of the piece it shows.
+            When the piece only slid, the whole group moves at once.
         '''
-        for block in self.blocks:
-            block.move(dx, dy)
+        if not self.blocks:
+            return
+        first = self.blocks[0]
+        x, y = self.piece.cells[0]
+        dx = x - first.x
+        dy = y - first.y
+        for block, (x, y) in zip(self.blocks, self.piece.cells):
+            if x - block.x != dx or y - block.y != dy:
+                break
+        else:
+            if dx or dy:
+                self.group.move(dx*Block.BLOCK_SIZE, dy*Block.BLOCK_SIZE)
+            return
+        for block, (x, y) in zip(self.blocks, self.piece.cells):
+            if x != block.x or y != block.y:
+                block.move(x - block.x, y - block.y)
 
     def can_move(self, board, dx, dy):
         ''' Parameters: dx - type: int
@@ -110,167 +167,70 @@ class Shape():
             Return value: type: bool
 
             checks if the shape can move dx squares in the x direction
-            and dy squares in the y direction, i.e.
-            check if each of the blocks can move
-            Returns True if all of them can, and False otherwise
-
+            and dy squares in the y direction
         '''
-        for block1 in self.blocks:
-            check = block1.can_move(board, dx, dy)
-            if check:
-                continue
-            else:
-                break
-        return check
+        return self.piece.can_move(board.state, dx, dy)
 
     def get_rotation_dir(self):
         ''' Return value: type: int
 
             returns the current rotation direction
         '''
-        return self.rotation_dir
+        return self.piece.rotation_dir
 
     def can_rotate(self, board):
         ''' Parameters: board - type: Board object
             Return value: type : bool
 
             Checks if the shape can be rotated.
-
-            1. Get the rotation direction using the get_rotation_dir method
-            2. Compute the position of each block after rotation and check if
-            the new position is valid
-            3. If any of the blocks cannot be moved to their new position,
-            return False
-
-            otherwise all is good, return True
-        '''
-        direction = self.get_rotation_dir()
-        # print 'Direction:', direction
-        for block in self.blocks:
-            old_x = block.x
-            old_y = block.y
-            centre = self.blocks[1]
-            # print block, 'Old Co-ordinates:', old_x, old_y
-            # print 'New Co-ordinates:', centre.x-direction*centre.y+direction*block.y, '   ', centre.y+direction*centre.x-direction*block.x
-            check = board.can_move(centre.x-direction*centre.y+direction*block.y, centre.y+direction*centre.x-direction*block.x)
-            # print 'check:', check
-            if check:
-               continue
-            else:
-               break
-        return check
+        '''
+        return self.piece.can_rotate(board.state)
 
     def rotate(self, board):
         ''' Parameters: board - type: Board object
 
-            rotates the shape:
-            1. Get the rotation direction using the get_rotation_dir method
-            2. Compute the position of each block after rotation
-            3. Move the block to the new position
-
-        '''
-        direction = self.get_rotation_dir()
-        centre = self.blocks[1]
-        for block in self.blocks:
-            old_x = block.x
-            old_y = block.y
-            # print block, 'Old Co-ordinates:', old_x, old_y
-            x = centre.x-direction*centre.y+direction*block.y
-            y = centre.y+direction*centre.x-direction*block.x
-            # print 'HAHA Co-ordinates:', x, '   ', y
-            # print 'Self Co-ordinates:', block.x,'   ', block.y
-            # Rectangle.__init__(block, block.x, block.y)
-            block.move(x-block.x,y-block.y)
-
-        ### This should be at the END of your rotate code.
-        ### DO NOT touch it. Default behavior is that a piece will only shift
-        ### rotation direciton after a successful rotation. This ensures that
-        ### pieces which switch rotations definitely remain within their
-        ### accepted rotation positions.
-        if self.shift_rotation_dir:
-            self.rotation_dir *= -1
+            rotates the shape and moves the blocks to their new position
+        '''
+        self.piece.rotate()
+        self.sync()
 
 
 ############################################################
 # ALL SHAPE CLASSES
 ############################################################
 class I_shape(Shape):
-    def __init__(self, center):
-        coords = [Point(center.x - 2, center.y),
-                  Point(center.x - 1, center.y),
-                  Point(center.x    , center.y),
-                  Point(center.x + 1, center.y)]
-        Shape.__init__(self, coords, 'blue')
-        self.shift_rotation_dir = True
-        self.center_block = self.blocks[2]
+    kind = 0
+    color = 'blue'
 
 
 class J_shape(Shape):
-    def __init__(self, center):
-        coords = [Point(center.x - 1, center.y),
-                  Point(center.x    , center.y),
-                  Point(center.x + 1, center.y),
-                  Point(center.x + 1, center.y + 1)]
-        Shape.__init__(self, coords, 'orange')
-        self.center_block = self.blocks[1]
+    kind = 1
+    color = 'orange'
 
 
 class L_shape(Shape):
-    def __init__(self, center):
-        coords = [Point(center.x - 1, center.y),
-                  Point(center.x    , center.y),
-                  Point(center.x + 1, center.y),
-                  Point(center.x - 1, center.y + 1)]
-        Shape.__init__(self, coords, 'cyan')
-        self.center_block = self.blocks[1]
+    kind = 2
+    color = 'cyan'
 
 
 class O_shape(Shape):
-    def __init__(self, center):
-        coords = [Point(center.x    , center.y),
-                  Point(center.x - 1, center.y),
-                  Point(center.x   , center.y + 1),
-                  Point(center.x - 1, center.y + 1)]
-        Shape.__init__(self, coords, 'red')
-        self.center_block = self.blocks[0]
-
-    def rotate(self, board):
-        # Override Shape's rotate method since O_Shape does not rotate
-        return
+    kind = 3
+    color = 'red'
 
 
 class S_shape(Shape):
-    def __init__(self, center):
-        coords = [Point(center.x    , center.y),
-                  Point(center.x    , center.y + 1),
-                  Point(center.x + 1, center.y),
-                  Point(center.x - 1, center.y + 1)]
-        Shape.__init__(self, coords, 'green')
-        self.center_block = self.blocks[0]
-        self.shift_rotation_dir = True
-        self.rotation_dir = -1
+    kind = 4
+    color = 'green'
 
 
 class T_shape(Shape):
-    def __init__(self, center):
-        coords = [Point(center.x - 1, center.y),
-                  Point(center.x    , center.y),
-                  Point(center.x + 1, center.y),
-                  Point(center.x    , center.y + 1)]
-        Shape.__init__(self, coords, 'yellow')
-        self.center_block = self.blocks[1]
+    kind = 5
+    color = 'yellow'
 
 
 class Z_shape(Shape):
-    def __init__(self, center):
-        coords = [Point(center.x - 1, center.y),
-                  Point(center.x    , center.y),
-                  Point(center.x    , center.y + 1),
-                  Point(center.x + 1, center.y + 1)]
-        Shape.__init__(self, coords, 'magenta')
-        self.center_block = self.blocks[1]
-        self.shift_rotation_dir = True
-        self.rotation_dir = -1
+    kind = 6
+    color = 'magenta'
 
 
 ############################################################
@@ -278,19 +238,21 @@ class Z_shape(Shape):
 ############################################################
 class ScoreBoard():
 
-        preview_blocks = []   # class variable for storing blocks of previous preview
+        MIN_WIDTH = 10   # squares needed for the labels and the preview
+        HEIGHT = 20 * Block.BLOCK_SIZE/7   # pixels, the labels and a two square preview
 
-        def __init__(self, win, width, height):
-            self.width = width
+        def __init__(self, win, width, height, score, store=None):
+            self.width = max(width, ScoreBoard.MIN_WIDTH)
             self.height = height
-            self.your_score = 0
-            self.level = 1
+            self.score = score   # the engine.Score shown on this board
+            # column of the preview shape, in squares
+            self.preview_x = int(self.width/1.3)
             # create a canvas to draw the score on
             self.canvas = CanvasFrame(win, self.width * Block.BLOCK_SIZE,
-                                        self.height * Block.BLOCK_SIZE/7)   # using 7 instead of 10
+                                        ScoreBoard.HEIGHT)
             self.canvas.setBackground('light green')
 
-            self.msg0 = Text(Point(210,10), "Next Block")
+            self.msg0 = Text(Point(self.preview_x * Block.BLOCK_SIZE, 10), "Next Block")
             self.msg0.setFace('times roman')
             self.msg0.setStyle('bold')
             self.msg0.setSize(10)
@@ -301,16 +263,27 @@ class ScoreBoard():
             self.msg2.setSize(10)
             self.msg2.draw(self.canvas)
 
-            self.msg = Text(Point(60, 10), "Your Score: " + str(self.your_score))
-            self.lvl_msg = Text(Point(60, 30), "Your Level: " + str(self.level))
+            # the score labels and the preview blocks are drawn once
+            # and only updated afterwards
+            self.msg = Text(Point(60, 10), "")
+            self.msg.setFace('times roman')
+            self.msg.setStyle('bold')
+            self.msg.setSize(10)
+            self.msg.draw(self.canvas)
+            self.lvl_msg = Text(Point(60, 30), "")
+            self.lvl_msg.setFace('times roman')
+            self.lvl_msg.setStyle('bold')
+            self.lvl_msg.setSize(10)
+            self.lvl_msg.draw(self.canvas)
             self.get_score()
-            # self.msg.setFace('times roman')
-            # self.msg.setStyle('bold')
-            # self.msg.setSize(10)
-            # self.msg.draw(self.canvas)
-            f2 = open('highscore.txt', 'a+')
-            self.old_high_score = f2.read()
-            f2.close()
+            self.preview_blocks = []
+            for i in range(4):
+                block = Block(Point(self.preview_x, 0), 'light green')
+                block.draw(self.canvas)
+                self.preview_blocks.append(block)
+            # the scores of every game are kept in the score store
+            self.store = store if store is not None else scores.ScoreStore()
+            self.old_high_score = self.store.high_score()
             self.msg1 = Text(Point(60, 50), "High Score: " + str(self.old_high_score))
             # self.getHighScore()
             self.msg1.setFace('times roman')
@@ -318,100 +291,49 @@ class ScoreBoard():
             self.msg1.setSize(10)
             self.msg1.draw(self.canvas)
 
-        def set_score(self):
-            self.your_score += 1
-            # print 'New score:', self.your_score
-            if self.your_score >= 0 and self.your_score < 25:
-                self.new_delay = 975
-                self.level = 1
-            elif self.your_score >= 25 and self.your_score < 50:
-                self.new_delay = 950
-                self.level = 2
-            elif self.your_score >= 50 and self.your_score < 100:
-                self.new_delay = 900
-                self.level = 3
-            elif self.your_score >= 100 and self.your_score < 150:
-                self.new_delay=850
-                self.level=4
-            elif self.your_score >= 150 and self.your_score < 200:
-                self.new_delay = 750
-                self.level = 5
-            else:
-                self.new_delay = 500
-                self.level = 6
-            return self.new_delay
-
         def get_score(self):
-            # print 'New score:', self.your_score
-            self.msg.undraw()
-            self.lvl_msg.undraw()
-            # a.undraw()
-
-            self.msg = Text(Point(60, 10), "Your Score: " + str(self.your_score))
-            self.msg.setFace('times roman')
-            self.msg.setStyle('bold')
-            self.msg.setSize(10)
-            self.msg.draw(self.canvas)
-            self.lvl_msg = Text(Point(60, 30), "Your Level: " + str(self.level))
-            self.lvl_msg.setFace('times roman')
-            self.lvl_msg.setStyle('bold')
-            self.lvl_msg.setSize(10)
-            self.lvl_msg.draw(self.canvas)
+            self.msg.setText("Your Score: " + str(self.score.your_score))
+            self.lvl_msg.setText("Your Level: " + str(self.score.level))
 
         def set_high_score(self):
-                # print'a:', a
-                # print 'old_high_score:', self.old_high_score
-                # strr = 200
-                b = self.old_high_score
-                if len(self.old_high_score) == 0:
-                    b = 0
-
-                if self.your_score >= int(b):
-                    # print 'New High Score:', self.your_score
-
-                    f1 = open('highscore.txt', 'w')
-                    f1.write(str(self.your_score))
-                    # print "printing write value:", f
-                    # print f1.read()
-                    f1.close()
-                # else:
-                    # print 'Not a high score'
+            ''' records the finished game in the score store '''
+            self.store.add(self.score.your_score, self.score.level)
 
         def draw_shape(self, shape):
             ''' Parameters: shape - type: Shape
-                draws the shape on the board if there is space for it
-                and returns True, otherwise it returns False
+                shows the shape in the preview by moving and
+                recoloring the preview blocks
             '''
-            # if shape.can_move(self, 0, 0):
-            shape.draw(self.canvas)
-            # print 'Drawing Preview'
-            for block in ScoreBoard.preview_blocks:
-                block.undraw()
-                # print 'undrawing'
-            # shape.draw(self.canvas)
-
-        @staticmethod
-        def undraw_shape(shape):
-            ScoreBoard.preview_blocks = shape.blocks
+            for block, (x, y) in zip(self.preview_blocks, shape.piece.cells):
+                block.place(x, y, shape.color)
 
 
 ############################################################
 # BOARD CLASS
 ############################################################
 class Board():
-    ''' Board class: it represents the Tetris board
+    ''' Board class: it represents the Tetris board on the screen
 
         Attributes: width - type:int - width of the board in squares
                     height - type:int - height of the board in squares
+                    state - type:engine.Board - the logical board the rules run on
                     canvas - type:CanvasFrame - where the pieces will be drawn
-                    grid - type:Dictionary - keeps track of the current state of
-                    the board; stores the blocks for a given position
+                    grid - type:Dictionary - stores the drawn blocks
+                    for a given position
+                    rows - type:Dictionary - a Group of the blocks of each row,
+                    so a row is moved or erased with one canvas call
+                    ghost - type:list - the four outlined blocks that show where
+                    the current shape would land
+                    ghost_color - type:string - the outline color of the ghost
     '''
     new_delay = 1000
 
-    def __init__(self, win, width, height):
+    def __init__(self, win, width, height, state=None):
         self.width = width
         self.height = height
+        if state is None:
+            state = engine.Board(width, height)
+        self.state = state
 
         # create a canvas to draw the tetris shapes on
         self.canvas = CanvasFrame(win, self.width * Block.BLOCK_SIZE,
@@ -421,6 +343,17 @@ class Board():
         # create an empty dictionary
         # currently we have no shapes on the board
         self.grid = {}
+        self.rows = {}
+        self.msg11 = None   # the pause message, drawn on the first pause
+
+        # the ghost blocks are drawn first, so every other block covers them
+        self.ghost = []
+        for i in range(4):
+            block = Block(Point(0, 0), '')
+            block.draw(self.canvas)
+            block.setOptions(state='hidden')
+            self.ghost.append(block)
+        self.ghost_color = None
 
     def draw_shape(self, shape):
         ''' Parameters: shape - type: Shape
@@ -434,121 +367,129 @@ class Board():
             return True
         return False
 
+    def update_shape(self, shape):
+        ''' Parameters: shape - type: Shape
+
+            shows the shape where its piece moved or rotated to
+        '''
+        shape.sync()
+
+    def draw_ghost(self, shape, cells):
+        ''' Parameters: shape - type: Shape
+                        cells - type: list - the squares the shape lands on
+
+            outlines the squares where the shape would land, moving
+            the ghost blocks with one coords call each
+        '''
+        if shape.color != self.ghost_color:
+            self.ghost_color = shape.color
+            for block in self.ghost:
+                block.setOptions(outline=shape.color, state='normal')
+        for block, (x, y) in zip(self.ghost, cells):
+            block.put(x, y)
+
     def can_move(self, x, y):
         ''' Parameters: x - type:int
                         y - type:int
             Return value: type: bool
 
-            1. check if it is ok to move to square x,y
-            if the position is outside of the board boundaries, can't move there
-            return False
-
-            2. if there is already a block at that postion, can't move there
-            return False
-
-            3. otherwise return True
-
+            checks with the logical board if it is ok to move to square x,y
         '''
-        # print 'Grid:', self.grid
-        if x < 0 or x > 9 or y < 0 or y > 19:
-            return False
-        elif (x,y) in self.grid:
-            return False
-        else:
-            return True
+        return self.state.can_move(x, y)
 
     def add_shape(self, shape):
         ''' Parameter: shape - type:Shape
 
-            add a shape to the grid, i.e.
-
-            add each block to the grid using its
-            (x, y) coordinates as a dictionary key
-
-            Hint: use the get_blocks method on Shape to
-            get the list of blocks
-
+            keeps the blocks of a locked shape in the grid, using
+            their (x, y) coordinates as a dictionary key,
+            and in the group of their row
         '''
-        # print shape.get_blocks()
         for block in shape.get_blocks():
             self.grid[block.x,block.y]=block
-        # print 'printing grid:', self.grid
+            if block.y not in self.rows:
+                self.rows[block.y] = Group()
+            self.rows[block.y].add(block)
 
     def delete_row(self, y):
         ''' Parameters: y - type:int
 
-            remove all the blocks in row y
-            to remove a block you must remove it from the grid
-            and erase it from the screen.
-            If you dont remember how to erase a graphics object
-            from the screen, take a look at the Graphics Library
-            handout
+            remove all the blocks in row y from the grid
+            and erase them from the screen
+        '''
+        row = self.rows.pop(y)
+        for block in row.objects:
+            del self.grid[block.x, block.y]
+        row.undraw()
+
+    def move_row(self, y, drop):
+        ''' Parameters: y - type:int
+                        drop - type:int
 
+            moves the blocks of row y down drop rows, with one canvas
+            move for the whole row. Row y + drop must be empty.
         '''
-        for x in range(0, self.width):
-            row_block = self.grid.pop((x, y))
-            # print 'row completed is:', row_block
-            row_block.undraw()
+        row = self.rows.pop(y, None)
+        if row is None:
+            return
+        for block in row.objects:
+            del self.grid[block.x, block.y]
+        row.move(0, drop*Block.BLOCK_SIZE)
+        for block in row.objects:
+            self.grid[block.x, block.y] = block
+        self.rows[y + drop] = row
 
     def is_row_complete(self, y):
         ''' Parameter: y - type: int
             Return value: type: bool
 
-            for each block in row y
-            check if there is a block in the grid (use the in operator)
-            if there is one square that is not occupied, return False
-            otherwise return True
-
+            checks with the logical board if row y is full
         '''
-        for x in range(0, self.width):
-            row_block = (x,y) in self.grid
-            if row_block:
-                continue
-            else:
-                break
-        return row_block
+        return self.state.is_row_complete(y)
 
     def move_down_rows(self, y_start):
         ''' Parameters: y_start - type:int
 
             for each row from y_start to the top
-                for each column
-                    check if there is a block in the grid
-                    if there is, remove it from the grid
-                    and move the block object down on the screen
-                    and then place it back in the grid in the new position
-
+                move the row one row down on the screen
+                and place its blocks back in the grid in the new position
         '''
         for y1 in range (y_start, -1, -1):
-            for x in range(0, self.width):
-                 row_block = (x,y1) in self.grid
-                 if row_block:
-                     removed_block = self.grid.pop((x, y1))
-                     removed_block.move(0,  1)
-                     self.grid[(x, y1+1)] = removed_block
-
-    def remove_complete_rows(self, scoreboard):
-        ''' removes all the complete rows
-            1. for each row, y,
-            2. check if the row is complete
-                if it is,
-                    delete the row
-                    move all rows down starting at row y - 1
-
-        '''
-        for y in range(0, self.height):
-            if self.is_row_complete(y):
+            self.move_row(y1, 1)
+
+    def remove_complete_rows(self, scoreboard, rows):
+        ''' Parameters: scoreboard - type: ScoreBoard
+                        rows - type: list - the rows the engine removed,
+                        top row first
+
+            removes the blocks of the removed rows from the screen and
+            moves every row above them once, by its total drop,
+            then shows the new score
+        '''
+        if not rows:
+            return
+        drops = engine.row_drops(self.height, rows)
+        # go bottom up so every row moves into a row already emptied
+        for y in range(rows[-1], -1, -1):
+            if drops[y] < 0:
                 self.delete_row(y)
-                self.move_down_rows(y-1)
+            elif drops[y] > 0:
+                self.move_row(y, drops[y])
+        self.new_delay = scoreboard.score.new_delay    # setting the level of game
+        scoreboard.get_score()
 
-                Board.new_delay = scoreboard.set_score()    # setting the level of game
-                scoreboard.get_score()
+    def message_point(self):
+        ''' Return value: type: Point
+
+            where the game over and pause messages are centered:
+            the middle of the board, a third of the way down
+        '''
+        return Point(self.width * Block.BLOCK_SIZE/2, self.height * Block.BLOCK_SIZE/3)
 
     def game_over(self, scoreboard):
         ''' display "Game Over !!!" message in the center of the board
             HINT: use the Text class from the graphics library
         '''
-        msg = Text(Point(150, 200), "Game Over")
+        msg = Text(self.message_point(), "Game Over")
         msg.setFace('times roman')
         msg.setStyle('bold')
         msg.setSize(40)
@@ -562,17 +503,209 @@ class Board():
         self.msg11.setSize(40)'''
 
         if pause%2 == 1:
-            self.msg11 = Text(Point(150, 200), "Game Paused\nPress P/p to resume")
-            self.msg11.setFace('times roman')
-            self.msg11.setStyle('bold')
-            self.msg11.setSize(20)
-            self.msg11.draw(self.canvas)
+            if self.msg11 is None:
+                self.msg11 = Text(self.message_point(), "Game Paused\nPress P/p to resume")
+                self.msg11.setFace('times roman')
+                self.msg11.setStyle('bold')
+                self.msg11.setSize(20)
+                self.msg11.draw(self.canvas)
+            else:
+                self.msg11.setOptions(state='normal')
             # print 'paused'
-        else:
-            self.msg11.undraw()
+        elif self.msg11 is not None:
+            self.msg11.setOptions(state='hidden')
             # print 'running'
 
 
+class RetainedBoard(Board):
+    ''' RetainedBoard class: a Board drawn with a fixed pool of canvas items
+
+        Every square of the board has one block, created up front and
+        hidden while the square is empty, and the falling shape has four
+        blocks of its own that every new shape reuses. Locked squares are
+        painted by recoloring the square blocks, with the changes of a
+        frame applied together when Tk is idle and a canvas call only for
+        the squares that look different. The falling shape moves as one
+        group, and when rows are removed the rows above move down with one
+        call each, as on a Board, while the blocks of the removed rows are
+        hidden and reused at the top. The number of canvas items stays the
+        same for the whole game.
+
+        Attributes: rows - type:Dictionary - the Group of the pooled blocks
+                    of each row, in x order
+                    drawn_at - type:list - the row the blocks of each row
+                    are drawn on. The rows move on the canvas by their tag
+                    alone, so their blocks keep the coordinates they were
+                    created with.
+                    colors - type:list - the color of every locked square,
+                    colors[y][x]
+                    shown - type:list - the color each square shows now,
+                    shown[y][x]
+                    shape_blocks - type:list - the blocks of the falling shape
+                    shape_group - type:Group - the shape blocks, moved with
+                    one canvas call
+                    dirty - type:set - the squares to repaint in the next frame
+    '''
+
+    def __init__(self, win, width, height, state=None):
+        Board.__init__(self, win, width, height, state)
+        for y in range(height):
+            self.rows[y] = Group([Block(Point(x, y), 'light gray') for x in range(width)])
+            self.rows[y].draw(self.canvas)
+            self.rows[y].setOptions(state='hidden')
+        self.drawn_at = list(range(height))
+        # drawn after the squares, so the falling shape covers them
+        self.shape_blocks = [Block(Point(0, 0), 'light gray') for i in range(4)]
+        self.shape_group = Group(self.shape_blocks)
+        self.shape_group.draw(self.canvas)
+        self.shape_group.setOptions(state='hidden')
+        self.colors = [{} for y in range(height)]
+        self.shown = [{} for y in range(height)]
+        self.dirty = set()
+        self.render_scheduled = False
+
+    def draw_shape(self, shape):
+        ''' shows shape with the shape blocks, put in place and
+            recolored with one call, instead of drawing new blocks
+        '''
+        if not shape.can_move(self, 0, 0):
+            return False
+        # the blocks get their squares afresh: a move of the last
+        # shape still waiting for idle time no longer applies
+        self.canvas.cancelTag(self.shape_group.tag)
+        for block, (x, y) in zip(self.shape_blocks, shape.piece.cells):
+            block.put(x, y)
+        if self.shape_blocks[0].config['fill'] != shape.color:
+            self.shape_group.setOptions(fill=shape.color, state='normal')
+        shape.blocks = self.shape_blocks
+        shape.group = self.shape_group
+        return True
+
+    def add_shape(self, shape):
+        ''' paints the squares of the locked shape; the shape blocks
+            show it until the next shape takes them
+        '''
+        for x, y in shape.piece.cells:
+            self.colors[y][x] = shape.color
+            self.dirty.add((x, y))
+        self.schedule_render()
+
+    def delete_row(self, y):
+        self.colors[y] = {}
+        self.hide_row(y)
+
+    def hide_row(self, y):
+        ''' hides every block of row y with one canvas call '''
+        if self.shown[y]:
+            self.rows[y].setOptions(state='hidden')
+            self.shown[y] = {}
+
+    def move_row(self, y, drop):
+        colors = self.colors[y]
+        self.colors[y] = {}
+        self.colors[y + drop].update(colors)
+        for x in colors:
+            self.dirty.add((x, y))
+            self.dirty.add((x, y + drop))
+        self.schedule_render()
+
+    def move_down_rows(self, y_start):
+        ''' moves every row from y_start to the top one row down.
+            Row y_start + 1 is taken out for the moved rows, its squares
+            that none lands on painted again, and the bottom row is lost.
+        '''
+        if y_start < 0:
+            return
+        below = min(y_start + 1, self.height - 1)
+        kept = self.colors[below]
+        self.shift_rows([below])
+        if below > y_start:
+            for x, color in kept.items():
+                if x not in self.colors[below]:
+                    self.colors[below][x] = color
+                    self.dirty.add((x, below))
+        self.schedule_render()
+
+    def remove_complete_rows(self, scoreboard, rows):
+        if not rows:
+            return
+        self.shift_rows(rows)
+        self.schedule_render()
+        self.new_delay = scoreboard.score.new_delay    # setting the level of game
+        scoreboard.get_score()
+
+    def shift_rows(self, removed):
+        ''' Parameters: removed - type: list - rows, top row first
+
+            takes the removed rows out and moves every row above them
+            down by the number of removed rows below it, as the engine
+            does. A row with squares showing moves with one canvas call,
+            and the blocks of a removed one are hidden with one call and
+            reused for a row at the top. Rows with nothing showing are
+            only moved into place once they have a square to show.
+        '''
+        for y in removed:
+            self.colors[y] = {}
+            self.hide_row(y)
+        drops = engine.row_drops(self.height, removed)
+        lowest = removed[-1]
+        # where every row down to the lowest removed one goes: the
+        # removed ones to the top, in order
+        to = [y + drops[y] if drops[y] >= 0 else removed.index(y) for y in range(lowest + 1)]
+        for squares in (self.drawn_at, self.colors, self.shown):
+            moved = squares[:lowest + 1]
+            for y in range(lowest + 1):
+                squares[to[y]] = moved[y]
+        moved = [self.rows[y] for y in range(lowest + 1)]
+        for y in range(lowest + 1):
+            self.rows[to[y]] = moved[y]
+        for y in range(lowest + 1):
+            if self.shown[y]:
+                self.place_row(y)
+        dirty = set()
+        for x, y in self.dirty:
+            if y > lowest:
+                dirty.add((x, y))
+            elif drops[y] >= 0:
+                dirty.add((x, to[y]))
+        self.dirty = dirty
+
+    def place_row(self, y):
+        ''' moves the blocks of row y onto it, if they are drawn on
+            another row, with one canvas call
+        '''
+        drawn_at = self.drawn_at[y]
+        if drawn_at != y:
+            self.canvas.moveTag(self.rows[y].tag, 0, (y - drawn_at)*Block.BLOCK_SIZE)
+            self.drawn_at[y] = y
+
+    def schedule_render(self):
+        if not self.render_scheduled:
+            self.render_scheduled = True
+            self.canvas.after_idle(self.render)
+
+    def render(self):
+        ''' repaints the squares that changed since the last frame,
+            with one canvas call for each square that looks different
+        '''
+        self.render_scheduled = False
+        for x, y in self.dirty:
+            color = self.colors[y].get(x)
+            shown = self.shown[y]
+            if color == shown.get(x):
+                continue
+            block = self.rows[y].objects[x]
+            if color is None:
+                del shown[x]
+                block.setOptions(state='hidden')
+                continue
+            # a row reused while nothing showed in it is put in place now
+            self.place_row(y)
+            shown[x] = color
+            block.setOptions(fill=color, state='normal')
+        self.dirty = set()
+
+
 ############################################################
 # TETRIS CLASS
 ############################################################
@@ -580,38 +713,72 @@ class Tetris():
     ''' Tetris class: Controls the game play
         Attributes:
             SHAPES - type: list (list of Shape classes)
-            DIRECTION - type: dictionary - converts string direction to (dx, dy)
-            BOARD_WIDTH - type:int - the width of the board
-            BOARD_HEIGHT - type:int - the height of the board
+            BOARD_WIDTH - type:int - the default width of the board
+            BOARD_HEIGHT - type:int - the default height of the board
+            width - type:int - the width of this game's board
+            height - type:int - the height of this game's board
+            game - type:engine.Game - the rules of the game being shown
             board - type:Board - the tetris board
             win - type:Window - the window for the tetris game
             delay - type:int - the speed in milliseconds for moving the shapes
             current_shapes - type: Shape - the current moving shape on the board
+            player - type: ai.BeamPlanner - plans the moves of the shapes
+            while autoplay is on, None otherwise
+            plan_after - type: str - the id of the after call of the next
+            planning slice, None when none is waiting
+            recorder - type: replay.Recorder - logs the game when a record
+            path is given, until it ends; None otherwise
+            timestep - type: loop.FixedTimestep - the logic ticks of the game
+            gravity - type: loop.Gravity - drops the shape every delay ms of ticks
+            controls - type: controls.Controls - the state of the game keys
+            ghost_key - type: tuple - the kind, orientation and column of the
+            piece and the pieces locked when the ghost was last placed
+        The board is drawn by board_class: RetainedBoard, the default,
+        recolors a fixed pool of items, Board moves a canvas item per
+        block. A seed deals the same pieces every game, and a store
+        replaces the scoreboard's scores.ScoreStore.
     '''
 
     SHAPES = [I_shape, J_shape, L_shape, O_shape, S_shape, T_shape, Z_shape]
-    DIRECTION = {'Left':Point(-1, 0), 'Right':Point(1, 0), 'Down':Point(0, 1)}
     BOARD_WIDTH = 10
     BOARD_HEIGHT = 20
-    b = random.randint(0, 6)   # O_shape(Point(int(BOARD_WIDTH/2),0))
+    TICK = 25   # ms per logic tick, every gravity delay is a whole number of ticks
+    SLICE = 5   # ms of planning between two turns of the event loop
     pause = 2
 
-    def __init__(self, win):
-        self.board = Board(win, self.BOARD_WIDTH, self.BOARD_HEIGHT)
-        self.scoreboard = ScoreBoard(win, self.BOARD_WIDTH, self.BOARD_HEIGHT)
+    def __init__(self, win, width=None, height=None, board_class=RetainedBoard, record=None,
+                 clock=loop.monotonic, seed=None, store=None):
+        self.width = width or self.BOARD_WIDTH
+        self.height = height or self.BOARD_HEIGHT
+        self.recorder = None
+        if record is not None:
+            self.recorder = replay.Recorder(open(record, 'wb'), self.width, self.height,
+                                            seed, clock)
+        self.game = engine.Game(self.width, self.height, seed=seed, generator=self.recorder)
+        self.board = board_class(win, self.width, self.height, self.game.board)
+        self.scoreboard = ScoreBoard(win, self.width, self.height, self.game.score, store)
         self.win = win
         self.delay = 1000   # delay is in ms
+        self.player = None
+        self.plan_after = None
+        self.timestep = loop.FixedTimestep(self.TICK, clock)
+        self.gravity = loop.Gravity()
+        self.controls = controls.Controls(clock=clock)
+        self.ghost_key = None
 
         # sets up the keyboard events
-        # when a key is called the method key_pressed will be called
-        self.win.bind_all('<Key>', self.key_pressed)
+        # when a key is pressed the method key_pressed will be called,
+        # and key_released when it is let go
+        self.win.bind_all('<KeyPress>', self.key_pressed)
+        self.win.bind_all('<KeyRelease>', self.key_released)
 
-        # set the current shape to a random new shape
+        # show the piece the game spawned as the current shape
         self.current_shape = self.create_new_shape()
 
         # Draw the current_shape oan the board (take a look at the
         # draw_shape method in the Board class)
         self.board.draw_shape(self.current_shape)
+        self.update_ghost()
 
         # For Step 9:  animate the shape!
         self.animate_shape()
@@ -619,114 +786,264 @@ class Tetris():
     def create_new_shape(self):
         ''' Return value: type: Shape
 
-            Create a random new shape that is centered
-             at y = 0 and x = int(self.BOARD_WIDTH/2)
-            return the shape
+            Wraps the current piece of the game in a new shape
+            and shows the kind of the next piece in the preview
         '''
-        # return self.SHAPES[random.randint(0,6)](Point(int(self.BOARD_WIDTH/2),0))
-
-        a = random.randint(0, 6)
-        # b = self.SHAPES[a](Point(int(self.BOARD_WIDTH/2), 0))
-        d = self.SHAPES[a](Point(int(self.BOARD_WIDTH/1.3), 0.7))
+        kind = self.game.next_kind
+        d = self.SHAPES[kind](engine.Piece(kind, self.scoreboard.preview_x, 0.7))
         self.scoreboard.draw_shape(d)
-        self.scoreboard.undraw_shape(d)
 
-        c = self.SHAPES[Tetris.b](Point(int(self.BOARD_WIDTH/2), 0))
-        Tetris.b = a  # self.SHAPES[a](Point(int(self.BOARD_WIDTH/2), 0))
-        return c
+        piece = self.game.current_piece
+        return self.SHAPES[piece.kind](piece)
 
     def animate_shape(self):
-        ''' animate the shape - move down at equal intervals
-            specified by the delay attribute
+        ''' animate the shape - runs the logic ticks that are due on
+            the clock and moves the shape down once every delay ms of
+            them, then wakes up again for the next tick. The ticks
+            keep to the clock however long a tick took, and stop when
+            the game is over.
         '''
+        ticks = self.timestep.due()
         if Tetris.pause%2 == 0:
-            self.do_move('Down')
-        self.delay = Board.new_delay
-        self.win.after(self.delay, self.animate_shape)
+            if self.apply_input(ticks * self.TICK):
+                # measured once the moves are on the screen
+                self.win.after_idle(self.controls.rendered)
+            self.delay = self.board.new_delay
+            for i in range(self.gravity.advance(ticks * self.TICK, self.delay)):
+                if self.player is not None:
+                    self.autoplay()
+                else:
+                    self.record(replay.GRAVITY)
+                    self.do_move('Down')
+        if not self.game.over:
+            self.win.after(self.timestep.wait(), self.animate_shape)
 
     def do_move(self, direction):
         ''' Parameters: direction - type: string
             Return value: type: bool
 
-            Move the current shape in the direction specified by the parameter:
-            First check if the shape can move. If it can, move it and return True
-            Otherwise if the direction we tried to move was 'Down',
-            1. add the current shape to the board
-            2. remove the completed rows if any
-            3. create a new random shape and set current_shape attribute
-            4. If the shape cannot be drawn on the board, display a
-               game over message
-
-            return False
+            Moves the current piece of the game in the direction specified
+            by the parameter and moves the shape with it.
+            If the game locked the piece instead,
+            1. keep the current shape on the board
+            2. remove the completed rows from the screen
+            3. show the new piece as the current shape
+            4. If the game is over, display a game over message
 
+            return False if the shape did not move
         '''
-        # print self.DIRECTION[direction]
-        a = self.DIRECTION[direction]
-        b = self.current_shape.can_move(self.board, a.x, a.y)
-        # print 'Printing b:', b
-        if b:
-            self.current_shape.move(a.x, a.y)
-            return True
-        else:
-            if direction == 'Down':
-                self.board.add_shape(self.current_shape)
-                self.board.remove_complete_rows(self.scoreboard)
-                # self.scoreboard.set_high_score()
-                self.current_shape = self.create_new_shape()
-                if self.board.draw_shape(self.current_shape):
-                    pass
-                else:
-                    self.board.game_over(self.scoreboard)
-            return False
+        moved = self.game.do_move(direction)
+        if moved:
+            self.board.update_shape(self.current_shape)
+        elif self.game.current_piece is not self.current_shape.piece:
+            self.board.add_shape(self.current_shape)
+            self.board.remove_complete_rows(self.scoreboard, self.game.cleared)
+            self.current_shape = self.create_new_shape()
+            if self.game.over:
+                self.board.game_over(self.scoreboard)
+                self.close()
+            else:
+                self.board.draw_shape(self.current_shape)
+        self.update_ghost()
+        return moved
+
+    def hard_drop(self):
+        ''' moves the current shape straight to where the board's
+            column tops say it lands, with one move of its blocks,
+            and locks it there
+        '''
+        if self.game.over:
+            return
+        distance = self.game.drop_distance()
+        if distance:
+            self.game.current_piece.move(0, distance)
+            self.board.update_shape(self.current_shape)
+        self.do_move('Down')
 
     def do_rotate(self):
         ''' Checks if the current_shape can be rotated and
             rotates if it can
         '''
-        a = self.current_shape.can_rotate(self.board)
-        # print 'Upper Upper:',a
-        if a:
-            self.current_shape.rotate(self.board)
+        if self.game.do_rotate():
+            self.board.update_shape(self.current_shape)
+            self.update_ghost()
+
+    def update_ghost(self):
+        ''' shows where the current shape would land. Falling does not
+            change that, so the drop distance is only computed again
+            when the piece turns or changes column, or a lock changed
+            the board.
+        '''
+        piece = self.game.current_piece
+        key = (piece.kind, piece.orientation, piece.x, self.game.pieces)
+        if key == self.ghost_key or self.game.over:
+            return
+        self.ghost_key = key
+        distance = self.game.drop_distance()
+        self.board.draw_ghost(self.current_shape,
+                              [(x, y + distance) for x, y in piece.cells])
+
+    def autoplay(self):
+        ''' rotates and moves the current shape to the best spot the
+            player has planned so far, drops it and starts the plan
+            for the next shape. A shape without a plan, or moved since
+            it was planned, waits a gravity step for a new one.
+        '''
+        if self.game.over:
+            return
+        if self.player.key != self.plan_key():
+            self.plan()
+            return
+        for key in self.player.best or ():
+            self.record(replay.KEYS[key])
+            if key == 'Up':
+                self.do_rotate()
+            else:
+                self.do_move(key)
+        self.record(replay.DROP)
+        self.hard_drop()
+        self.plan()
 
-    def key_pressed(self, event):
-        ''' this function is called when a key is pressed on the keyboard
-            it currently just prints the value of the key
+    def plan_key(self):
+        ''' Return value: type: tuple - the piece count and the position
+            of the current piece, which a plan is for
+        '''
+        piece = self.game.current_piece
+        return (self.game.pieces, piece.orientation, piece.x, piece.y)
 
-            Modify the function so that if the user presses the arrow keys
-            'Left', 'Right' or 'Down', the current_shape will move in
-            the appropriate direction
+    def plan(self):
+        ''' starts the player's plan for the current shape, with the
+            previewed one as the next level, in a share of the gravity
+            delay of the level
+        '''
+        self.cancel_plan()
+        if self.game.over or self.player is None:
+            return
+        self.player.start(self.game.board.rows, self.width, self.game.current_piece,
+                          [self.game.next_kind], self.player.budget(self.board.new_delay),
+                          self.plan_key(), features.tracker(self.game.board))
+        self.plan_slice()
+
+    def plan_slice(self):
+        ''' plans for SLICE ms and, if the plan is not finished, comes
+            back on the next turn of the event loop, so that keys and
+            frames are handled in between
+        '''
+        self.plan_after = None
+        player = self.player
+        if player is None or player.done:
+            return
+        if not player.step(player.clock() + self.SLICE / 1000.0):
+            self.plan_after = self.win.after(1, self.plan_slice)
+
+    def cancel_plan(self):
+        ''' stops the planning slice that is waiting, if there is one,
+            so that only one chain of slices steps the player
+        '''
+        if self.plan_after is not None:
+            self.win.after_cancel(self.plan_after)
+            self.plan_after = None
+
+    def record(self, opcode):
+        ''' logs opcode if the game is being recorded '''
+        if self.recorder is not None:
+            self.recorder.event(opcode)
+
+    def close(self):
+        ''' stops recording the game and closes its log, once the game
+            is over or its window is closed
+        '''
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
 
-            if the user presses the space bar 'space', the shape will move
-            down until it can no longer move and is added to the board
+    def apply_input(self, ms):
+        ''' Parameters: ms - type: int - game time since the last tick
+            Return value: type: list - the moves made
 
-            if the user presses the 'Up' arrow key ,
-                the shape should rotate.
+            makes the moves the held keys are due this tick: Left, Right
+            and Down move the shape, Up rotates it and space drops it
+        '''
+        moves = self.controls.update(ms)
+        for key, count in moves:
+            if key == 'Up':
+                self.record(replay.ROTATE)
+                self.do_rotate()
+            elif key == 'space':
+                self.record(replay.DROP)
+                self.hard_drop()
+            else:
+                for i in range(count):
+                    self.record(replay.KEYS[key])
+                    if not self.do_move(key):
+                        break
+        return moves
 
+    def key_pressed(self, event):
+        ''' this function is called when a key is pressed on the keyboard
+
+            the arrow keys 'Left', 'Right', 'Down' and 'Up' and the
+            space bar 'space' are passed to the controls, which move
+            the current_shape on the next tick (see apply_input)
+
+            'P' pauses the game and 'A' turns autoplay on and off
         '''
         key = event.keysym
         # print key
-        if Tetris.pause%2 == 0:
-            if key == 'Left' or key == 'Right' or key == 'Down':
-                self.do_move(key)
-            elif key == 'space':
-                bool = True
-                while bool:
-                    bool = self.do_move('Down')
-            elif key == 'Up':
-                self.do_rotate()
-        else:
-            pass
+        if Tetris.pause%2 == 0 and key in controls.KEYS:
+            self.controls.press(key)
         if key == 'P' or key == 'p':
             Tetris.pause += 1
             # print 'pause:', Tetris.pause
             self.board.pause(Tetris.pause)
+        elif key == 'A' or key == 'a':
+            if self.player is None:
+                self.player = ai.BeamPlanner(clock=self.timestep.clock)
+                self.plan()
+            else:
+                self.cancel_plan()
+                self.player = None
         else:
             pass
 
+    def key_released(self, event):
+        ''' this function is called when a key is let go '''
+        if event.keysym in controls.KEYS:
+            self.controls.release(event.keysym)
+
+# the methods profiling.enable times when the game is started with
+# TETRIS_PROFILE set to the file the numbers are written to
+PROFILED = [(Tetris, 'do_move'), (Tetris, 'do_rotate'), (Tetris, 'animate_shape'),
+            (Shape, 'can_move'), (Shape, 'rotate'), (Shape, 'sync'),
+            (Board, 'remove_complete_rows'), (RetainedBoard, 'remove_complete_rows'),
+            (RetainedBoard, 'render'), (ScoreBoard, 'get_score'),
+            (GraphicsObject, 'draw'), (GraphicsObject, 'move'), (GraphicsObject, 'undraw'),
+            (Group, 'move'), (Group, 'undraw'),
+            # the methods that make the Tk calls of the ones above
+            (CanvasFrame, 'flushMoves'), (GraphicsObject, 'setOptions'), (_BBox, 'setPoints')]
+
 ################################################################
 # Start the game
 ################################################################
 
-win = Window("Tetris")
-game = Tetris(win)
-win.mainloop()
\ No newline at end of file
+def main():
+    ''' opens the game window and plays until it is closed. Only
+        here is Tk loaded: importing this module opens no window, so
+        the engine, the AI and the tests can use its classes headless.
+    '''
+    if os.environ.get('TETRIS_PROFILE'):
+        profiling.enable(PROFILED, os.environ['TETRIS_PROFILE'])
+    win = Window("Tetris")
+    # the board size can be given as: python tetris.py WIDTH HEIGHT
+    game = Tetris(win, *[int(arg) for arg in sys.argv[1:3]])
+    if profiling.WRAPPED:
+        profiling.Overlay(game.board.canvas)
+    try:
+        win.mainloop()
+    finally:
+        # the window was closed
+        game.close()
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file